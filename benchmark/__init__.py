@@ -0,0 +1,14 @@
+"""urbs benchmarks: synthetic input data and scaling measurements
+
+generate: synthetic urbs input data dicts of configurable size
+run: end-to-end benchmark of the urbs workflow over a grid of sizes
+micro: micro-benchmarks of helper functions, compared to stored baselines
+
+Usage (from the repository root):
+
+    python -m benchmark.run --size tiny small --output benchmark.json
+    python -m benchmark.micro
+
+"""
+
+from .generate import synthetic_data, write_excel
@@ -0,0 +1,264 @@
+"""Synthetic urbs input data of configurable size
+
+synthetic_data returns an input dict like urbs.read_excel, with a given
+number of sites, input commodities, processes, transmission links,
+storages, DSM sites and timesteps. All sites share the same technologies;
+their parameters and timeseries are drawn from a seeded random generator,
+so that the same arguments always yield the same data.
+
+"""
+
+import numpy as np
+import pandas as pd
+import urbs
+
+# names of the first input commodities, further ones are numbered
+SUPIM_NAMES = ['Wind', 'Solar', 'Hydro']
+STOCK_NAMES = ['Gas', 'Coal', 'Lignite', 'Biomass']
+
+
+def _names(base, number):
+    """Return number names, starting with base and numbered afterwards."""
+    names = list(base[:number])
+    names.extend('{}{}'.format(base[k % len(base)], k // len(base) + 1)
+                 for k in range(len(base), number))
+    return names
+
+
+def synthetic_data(sites=3, commodities=4, processes=4, transmissions=3,
+                   storages=1, dsm=1, buy_sell=0, timesteps=168, seed=0):
+    """Create a synthetic urbs input data dict.
+
+    Each site has one demand commodity 'Elec', the environmental commodity
+    'CO2', the given number of input commodities (half of them intermittent
+    supplies, half of them stock commodities) and processes converting them
+    to electricity. A 'Slack powerplant' in each site keeps every instance
+    feasible. Sites with buy/sell commodities trade electricity at prices of
+    the Buy-Sell-Price timeseries with the processes 'Purchase' and
+    'Feed-in'.
+
+    Args:
+        sites: number of sites
+        commodities: number of input commodities per site
+        processes: number of processes per site (besides the slack plant);
+            processes are spread over the input commodities
+        transmissions: number of undirected transmission links, at most
+            sites * (sites - 1) / 2
+        storages: number of storage technologies per site
+        dsm: number of sites with demand side management
+        buy_sell: number of sites with buy/sell commodities
+        timesteps: number of modelled timesteps (the data has an additional
+            initial timestep 0)
+        seed: seed of the random generator
+
+    Returns:
+        a dict of DataFrames like urbs.read_excel
+    """
+    rand = np.random.RandomState(seed)
+    site_names = ['Site{}'.format(k) for k in range(sites)]
+    supims = _names(SUPIM_NAMES, (commodities + 1) // 2)
+    stocks = _names(STOCK_NAMES, commodities // 2)
+
+    # processes are assigned to input commodities in turn
+    inputs = (supims + stocks) or ['Slack']
+    converters = []
+    for k in range(processes):
+        com = inputs[k % len(inputs)]
+        name = '{} {}'.format(com, 'park' if com in supims else 'plant')
+        if k >= len(inputs):
+            name = '{} {}'.format(name, k // len(inputs) + 1)
+        converters.append((name, com))
+    converters.append(('Slack powerplant', 'Slack'))
+
+    # Commodity
+    rows = []
+    for sit in site_names:
+        rows.append((sit, 'Elec', 'Demand', np.nan, np.nan, np.nan))
+        rows.append((sit, 'CO2', 'Env', np.nan, np.inf, np.inf))
+        rows.extend((sit, com, 'SupIm', np.nan, np.nan, np.nan)
+                    for com in supims)
+        rows.extend((sit, com, 'Stock', rand.uniform(4, 30), np.inf, np.inf)
+                    for com in stocks)
+        rows.append((sit, 'Slack', 'Stock', 999, np.inf, np.inf))
+    for sit in site_names[:buy_sell]:
+        rows.append((sit, 'Elec buy', 'Buy', '1xBuy', np.inf, np.inf))
+        rows.append((sit, 'Elec sell', 'Sell', '1xSell', np.inf, np.inf))
+    commodity = pd.DataFrame(
+        rows, columns=['Site', 'Commodity', 'Type', 'price', 'max',
+                       'maxperstep']).set_index(['Site', 'Commodity', 'Type'])
+
+    # Process
+    rows = []
+    for sit in site_names:
+        for pro, com in converters:
+            if pro == 'Slack powerplant':
+                rows.append((sit, pro, 999999, 999999, 999999, np.inf, 0,
+                             0, 0, 999, 0, 0.07, 1))
+            elif com in supims:
+                rows.append((sit, pro, 0, 0, rand.uniform(1e3, 1e5), np.inf,
+                             0, rand.uniform(6e5, 1.6e6),
+                             rand.uniform(2e4, 3e4), 0, 0, 0.07, 25))
+            else:
+                rows.append((sit, pro, 0, 0, rand.uniform(1e4, 1e5),
+                             rand.uniform(0.5, 5), 0,
+                             rand.uniform(4e5, 9e5), rand.uniform(6e3, 3e4),
+                             rand.uniform(0.5, 2), rand.uniform(0, 20), 0.07,
+                             30))
+    for sit in site_names[:buy_sell]:
+        for pro in ('Purchase', 'Feed-in'):
+            rows.append((sit, pro, 0, 0, rand.uniform(1e3, 1e4), np.inf, 0,
+                         0, 0, 0, 0, 0.07, 1))
+    process = pd.DataFrame(
+        rows, columns=['Site', 'Process', 'inst-cap', 'cap-lo', 'cap-up',
+                       'max-grad', 'min-fraction', 'inv-cost', 'fix-cost',
+                       'var-cost', 'startup-cost', 'wacc', 'depreciation']
+        ).set_index(['Site', 'Process'])
+
+    # Process-Commodity
+    rows = []
+    for pro, com in converters:
+        rows.append((pro, com, 'In', 1, np.nan))
+        if com in supims:
+            rows.append((pro, 'Elec', 'Out', 1, np.nan))
+        else:
+            rows.append((pro, 'Elec', 'Out', rand.uniform(0.35, 0.6),
+                         np.nan))
+            rows.append((pro, 'CO2', 'Out', rand.uniform(0, 0.4), np.nan))
+    if buy_sell:
+        rows.append(('Purchase', 'Elec buy', 'In', 1, np.nan))
+        rows.append(('Purchase', 'Elec', 'Out', 1, np.nan))
+        rows.append(('Feed-in', 'Elec', 'In', 1, np.nan))
+        rows.append(('Feed-in', 'Elec sell', 'Out', 1, np.nan))
+    process_commodity = pd.DataFrame(
+        rows, columns=['Process', 'Commodity', 'Direction', 'ratio',
+                       'ratio-min']
+        ).set_index(['Process', 'Commodity', 'Direction'])
+
+    # Transmission: a chain through all sites first, then further pairs
+    pairs = [(a, b) for a in range(sites) for b in range(a + 1, sites)]
+    chain = [(a, a + 1) for a in range(sites - 1)]
+    others = [p for p in pairs if p not in chain]
+    others = [others[k] for k in rand.permutation(len(others))]
+    rows = []
+    for a, b in (chain + others)[:transmissions]:
+        eff = rand.uniform(0.85, 0.95)
+        inv_cost = rand.uniform(1.5e6, 3e6)
+        for sin, sout in ((a, b), (b, a)):
+            rows.append((site_names[sin], site_names[sout], 'hvac', 'Elec',
+                         eff, inv_cost, inv_cost / 100, 0, 0, 0, np.inf, 0.07,
+                         40))
+    transmission = pd.DataFrame(
+        rows, columns=['Site In', 'Site Out', 'Transmission', 'Commodity',
+                       'eff', 'inv-cost', 'fix-cost', 'var-cost', 'inst-cap',
+                       'cap-lo', 'cap-up', 'wacc', 'depreciation']
+        ).set_index(['Site In', 'Site Out', 'Transmission', 'Commodity'])
+
+    # Storage
+    rows = []
+    for sit in site_names:
+        for k in range(storages):
+            eff = rand.uniform(0.4, 0.9)
+            rows.append((sit, 'Storage{}'.format(k), 'Elec', 0, 0, np.inf,
+                         0, 0, np.inf, eff, eff, rand.uniform(4e4, 1e5),
+                         rand.uniform(0, 10), 0, 0.3, 0.02, 0, 50, 0.07, 0.5))
+    storage = pd.DataFrame(
+        rows, columns=['Site', 'Storage', 'Commodity', 'inst-cap-c',
+                       'cap-lo-c', 'cap-up-c', 'inst-cap-p', 'cap-lo-p',
+                       'cap-up-p', 'eff-in', 'eff-out', 'inv-cost-p',
+                       'inv-cost-c', 'fix-cost-p', 'fix-cost-c', 'var-cost-p',
+                       'var-cost-c', 'depreciation', 'wacc', 'init']
+        ).set_index(['Site', 'Storage', 'Commodity'])
+
+    # Demand and SupIm: daily profiles with noise; timestep 0 is all zeros
+    t = np.arange(timesteps + 1)
+    daily = np.sin(2 * np.pi * (t % 24) / 24 - np.pi / 2)
+    demand = pd.DataFrame(
+        dict(((sit, 'Elec'),
+              rand.uniform(5e3, 5e4) * (1 + 0.2 * daily +
+                                        0.05 * rand.randn(len(t))))
+             for sit in site_names), index=t)
+    supim = {}
+    for sit in site_names:
+        for k, com in enumerate(supims):
+            if k % 3 == 1:
+                # solar: daylight bell curve
+                profile = np.clip(daily, 0, None) * rand.uniform(0.6, 1)
+            else:
+                # wind and hydro: bounded random walk
+                profile = np.clip(rand.uniform(0.2, 0.6) +
+                                  np.cumsum(rand.randn(len(t))) * 0.02, 0, 1)
+            supim[(sit, com)] = profile
+    supim = pd.DataFrame(supim, index=t)
+    for df in (demand, supim):
+        df.iloc[0] = 0
+        df.index.name = 't'
+        if len(df.columns):
+            df.columns = pd.MultiIndex.from_tuples(list(df.columns))
+
+    # Buy-Sell-Price: one-level column MultiIndex, like split_columns yields
+    buy_sell_price = pd.DataFrame(index=pd.Index(t, name='t'))
+    if buy_sell:
+        buy = rand.uniform(0.02, 0.2, len(t))
+        buy[0] = 0
+        buy_sell_price = pd.DataFrame(
+            np.column_stack([buy, 0.5 * buy]), index=buy_sell_price.index,
+            columns=pd.MultiIndex.from_tuples([('Elec buy',),
+                                               ('Elec sell',)]))
+
+    # DSM
+    rows = [(sit, 'Elec', rand.randint(1, 16), 1, 1, 500, 500)
+            for sit in site_names[:dsm]]
+    dsm = pd.DataFrame(
+        rows, columns=['Site', 'Commodity', 'delay', 'eff', 'recov',
+                       'cap-max-do', 'cap-max-up']
+        ).set_index(['Site', 'Commodity'])
+
+    # derived columns, as in read_excel
+    commodity['price-factor'] = commodity['price'].apply(urbs.price_factor)
+    for df in (process, transmission, storage):
+        df['annuity-factor'] = urbs.annuity_factor(
+            df['depreciation'], df['wacc'])
+
+    data = {
+        'commodity': commodity,
+        'process': process,
+        'process_commodity': process_commodity,
+        'transmission': transmission,
+        'storage': storage,
+        'demand': demand,
+        'supim': supim,
+        'buy_sell_price': buy_sell_price,
+        'dsm': dsm}
+    for key in data:
+        if isinstance(data[key].index, pd.MultiIndex):
+            data[key].sort_index(inplace=True)
+    return data
+
+
+def write_excel(data, filename):
+    """Write an input data dict to a spreadsheet readable by read_excel.
+
+    Args:
+        data: a dict of DataFrames like urbs.read_excel
+        filename: Excel spreadsheet filename
+
+    Returns:
+        Nothing
+    """
+    sheets = [('Commodity', 'commodity'), ('Process', 'process'),
+              ('Process-Commodity', 'process_commodity'),
+              ('Transmission', 'transmission'), ('Storage', 'storage'),
+              ('Demand', 'demand'), ('SupIm', 'supim'),
+              ('Buy-Sell-Price', 'buy_sell_price'), ('DSM', 'dsm')]
+    derived = ['price-factor', 'annuity-factor']
+    with pd.ExcelWriter(filename) as writer:
+        for sheet, key in sheets:
+            df = data[key].drop([c for c in derived if c in data[key]],
+                                axis=1)
+            # spreadsheets can't store infinity; like in mimo-example.xlsx,
+            # the string 'inf' is parsed as infinity by read_excel
+            df = df.replace(np.inf, 'inf')
+            if isinstance(df.columns, pd.MultiIndex):
+                # join MultiIndex columns to 'Site.Commodity' titles
+                df.columns = ['.'.join(c) for c in df.columns]
+            df.reset_index().to_excel(writer, sheet, index=False)
@@ -0,0 +1,240 @@
+"""Micro-benchmarks of urbs hot-path helpers, compared to stored baselines
+
+Each benchmark times one helper function (e.g. commodity_balance or
+get_entity) on synthetic fixtures of several sizes. Models are only
+created, not solved, so no solver is needed; variables get dummy values.
+Timings are compared to a baseline file, and slowdowns beyond a tolerance
+are reported as regressions (exit code 1). A missing baseline file is an
+error (exit code 2) unless a new baseline is recorded.
+
+Usage (from the repository root):
+
+    python -m benchmark.micro --save-baseline   # record a new baseline
+    python -m benchmark.micro                   # compare against it
+    python -m benchmark.micro --size small --filter get_entity
+
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+import pyomo.core as pyomo
+
+import urbs
+from .generate import synthetic_data
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline-micro.json')
+
+# fixture sizes (arguments of synthetic_data)
+FIXTURES = {
+    'small': dict(sites=2, commodities=2, processes=2, transmissions=1,
+                  storages=1, dsm=1, buy_sell=1, timesteps=24),
+    'medium': dict(sites=4, commodities=4, processes=4, transmissions=4,
+                   storages=1, dsm=2, buy_sell=2, timesteps=168),
+    'large': dict(sites=8, commodities=6, processes=8, transmissions=12,
+                  storages=2, dsm=4, buy_sell=4, timesteps=720)}
+
+
+def fixture(size):
+    """Create the input data and an unsolved model of the given size.
+
+    All variables are set to a dummy value, so that value extraction takes
+    the same path as for a solved model.
+
+    Returns:
+        a dict with keys 'data' and 'model'
+    """
+    data = synthetic_data(**FIXTURES[size])
+    model = urbs.create_model(data)
+    for var in model.component_data_objects(pyomo.Var):
+        var.value = 1.0
+    return {'data': data, 'model': model}
+
+
+# Benchmarks: each function takes a fixture and returns a callable without
+# arguments that performs the timed work
+
+def bench_commodity_balance(fix):
+    m = fix['model']
+    args = [(tm, sit, com) for tm in m.tm
+            for (sit, com, com_type) in m.com_tuples
+            if com_type in ('Demand', 'Env')]
+    return lambda: [urbs.commodity_balance(m, *a) for a in args]
+
+
+def bench_dsm_down_time_tuples(fix):
+    m = fix['model']
+    return lambda: urbs.dsm_down_time_tuples(
+        m.timesteps[1:], m.dsm_site_tuples, m)
+
+
+def bench_get_com_price(fix):
+    m = fix['model']
+    tuples = [c for c in m.com_tuples if c[2] in ('Buy', 'Sell')]
+    return lambda: urbs.get_com_price(m, tuples)
+
+
+def bench_search_sell_buy_tuple(fix):
+    m = fix['model']
+    args = [(sit, pro, com) for (sit, pro, com) in m.pro_input_tuples
+            if com in m.com_buy]
+    return lambda: [urbs.search_sell_buy_tuple(m, *a) for a in args]
+
+
+def bench_get_entity(fix):
+    m = fix['model']
+    return lambda: urbs.get_entity(m, 'e_pro_out')
+
+
+def bench_get_entities(fix):
+    m = fix['model']
+    return lambda: urbs.get_entities(m, ['e_pro_in', 'e_pro_out'])
+
+
+def bench_split_columns(fix):
+    columns = ['{}.{}'.format(sit, com)
+               for sit, com in fix['data']['supim'].columns] * 100
+    return lambda: urbs.split_columns(columns)
+
+
+def bench_sort_plot_elements(fix):
+    m = fix['model']
+    rand = np.random.RandomState(0)
+    elements = pd.DataFrame(
+        rand.rand(len(m.tm), len(m.pro)) * rand.rand(len(m.pro)),
+        index=list(m.tm), columns=sorted(m.pro))
+    return lambda: urbs.sort_plot_elements(elements)
+
+
+BENCHMARKS = dict((name[len('bench_'):], func)
+                  for name, func in list(globals().items())
+                  if name.startswith('bench_'))
+
+
+def time_call(func, min_time=0.05, repeat=5):
+    """Return the best time per call of func in seconds.
+
+    The number of calls per measurement is increased until a measurement
+    takes at least min_time; the best of repeat measurements is returned.
+    """
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 10**6:
+            break
+        number *= 10
+    return min([elapsed] + timer.repeat(repeat - 1, number)) / number
+
+
+def run(sizes=None, names=None):
+    """Run benchmarks on fixtures.
+
+    Args:
+        sizes: list of fixture sizes; default: all
+        names: list of benchmark names; default: all
+
+    Returns:
+        a dict {'benchmark/size': seconds per call}
+    """
+    timings = {}
+    for size in sizes or sorted(FIXTURES):
+        fix = fixture(size)
+        for name in names or sorted(BENCHMARKS):
+            timings['{}/{}'.format(name, size)] = time_call(
+                BENCHMARKS[name](fix))
+    return timings
+
+
+def compare(timings, baseline, tolerance=0.25):
+    """Compare timings to baseline timings.
+
+    Args:
+        timings: dict of timings as returned by run
+        baseline: dict of baseline timings; entries may also be dicts with
+            keys 'time' and 'tolerance' to override the tolerance
+        tolerance: allowed relative slowdown, e.g. 0.25 for 25%
+
+    Returns:
+        a DataFrame with columns time, baseline, ratio and status, which is
+        one of 'ok', 'faster', 'REGRESSION' or 'new'
+    """
+    rows = []
+    for key in sorted(timings):
+        entry = baseline.get(key)
+        if isinstance(entry, dict):
+            limit = entry.get('tolerance', tolerance)
+            entry = entry['time']
+        else:
+            limit = tolerance
+        if entry is None:
+            rows.append((key, timings[key], np.nan, np.nan, 'new'))
+            continue
+        ratio = timings[key] / entry
+        if ratio > 1 + limit:
+            status = 'REGRESSION'
+        elif ratio < 1 / (1 + limit):
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((key, timings[key], entry, ratio, status))
+    return pd.DataFrame(
+        rows, columns=['benchmark', 'time', 'baseline', 'ratio', 'status']
+        ).set_index('benchmark')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmarks of urbs helper functions.')
+    parser.add_argument('--size', nargs='*', choices=sorted(FIXTURES),
+                        help='fixture sizes, default: all')
+    parser.add_argument('--filter', nargs='*', choices=sorted(BENCHMARKS),
+                        help='benchmarks to run, default: all')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown, default: 0.25')
+    parser.add_argument('--save-baseline', '--update-baseline',
+                        action='store_true',
+                        help='store the timings as new baseline')
+    args = parser.parse_args(argv)
+
+    # without a baseline every benchmark would pass as 'new'
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        print('No baseline {}; run with --save-baseline first.'.format(
+            args.baseline))
+        return 2
+
+    timings = run(args.size, args.filter)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file_handle:
+                baseline = json.load(file_handle)
+        baseline.update(timings)
+        with open(args.baseline, 'w') as file_handle:
+            json.dump(baseline, file_handle, indent=2, sort_keys=True)
+        print('Stored {} timings in {}'.format(len(timings), args.baseline))
+        return 0
+
+    with open(args.baseline) as file_handle:
+        baseline = json.load(file_handle)
+
+    result = compare(timings, baseline, args.tolerance)
+    with pd.option_context('display.width', 120):
+        print(result)
+    regressions = result.index[result['status'] == 'REGRESSION']
+    if len(regressions):
+        print('Regressions: {}'.format(', '.join(regressions)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
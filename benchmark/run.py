@@ -0,0 +1,267 @@
+"""End-to-end benchmark of the urbs workflow over a grid of model sizes
+
+For each size, synthetic input data (see generate) is written to a
+spreadsheet and passed through the stages read_excel, create_model, LP file
+writing, solving, get_timeseries, report and result_figures. Wall time, CPU
+time and memory of each stage are written to a JSON file, to track scaling
+curves across versions.
+
+Usage (from the repository root):
+
+    python -m benchmark.run --size tiny small medium --output bench.json
+    python -m benchmark.run --sites 2 4 8 --timesteps 24 168 --memory
+
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyomo.environ
+from pyomo.opt.base import SolverFactory
+
+import urbs
+from .generate import synthetic_data, write_excel
+
+# predefined model sizes (arguments of synthetic_data)
+SIZES = {
+    'tiny': dict(sites=2, commodities=2, processes=2, transmissions=1,
+                 storages=1, dsm=1, timesteps=24),
+    'small': dict(sites=3, commodities=4, processes=4, transmissions=3,
+                  storages=1, dsm=1, timesteps=168),
+    'medium': dict(sites=6, commodities=6, processes=8, transmissions=8,
+                   storages=2, dsm=3, timesteps=672),
+    'large': dict(sites=10, commodities=8, processes=12, transmissions=20,
+                  storages=2, dsm=5, timesteps=8760)}
+
+STAGES = ('read_excel', 'create_model', 'write_lp', 'solve',
+          'get_timeseries', 'report', 'result_figures')
+
+# wall clock and CPU time of this process, python 2 and 3 compatible
+try:
+    process_time, perf_counter = time.process_time, time.perf_counter
+except AttributeError:
+    process_time, perf_counter = time.clock, time.time
+
+
+class StageError(Exception):
+    """A benchmark stage failed; later stages of that size are skipped."""
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in MB.
+
+    Returns:
+        peak RSS, or None on platforms without the resource module
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024.0 ** (2 if sys.platform == 'darwin' else 1)
+
+
+def measure(func, *args, **kwargs):
+    """Call func(*args, **kwargs) and measure its time and memory.
+
+    Args:
+        func: function to call
+        *args, **kwargs: arguments of func; the keyword argument memory=True
+            additionally traces the peak of allocated memory (Python 3 only,
+            slows down the call)
+
+    Returns:
+        (result, record) tuple of the return value of func and a dict with
+        wall time 'wall' and CPU time 'cpu' in seconds, peak RSS 'peak_rss'
+        and, if traced, peak allocated memory 'traced_peak' in MB
+    """
+    memory = kwargs.pop('memory', False)
+    tracemalloc = None
+    if memory:
+        try:
+            import tracemalloc
+            tracemalloc.start()
+        except ImportError:
+            tracemalloc = None
+
+    wall, cpu = perf_counter(), process_time()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        record = {'wall': perf_counter() - wall,
+                  'cpu': process_time() - cpu}
+        if tracemalloc is not None:
+            record['traced_peak'] = tracemalloc.get_traced_memory()[1] / 2.0**20
+            tracemalloc.stop()
+        record['peak_rss'] = peak_rss()
+    return result, record
+
+
+def run_size(name, params, solver='glpk', stages=STAGES, memory=False,
+             workdir=None):
+    """Benchmark the urbs workflow for one model size.
+
+    Stages not contained in stages are skipped where possible: without
+    read_excel, the generated data is used directly; without solve, the
+    result stages are skipped. create_model always runs.
+
+    Args:
+        name: name of the size
+        params: dict of arguments for synthetic_data
+        solver: solver name for SolverFactory
+        stages: list of stages to measure
+        memory: trace allocated memory (see measure)
+        workdir: directory for temporary files; default: a new temp dir
+
+    Returns:
+        a list of records, one per stage (see measure), with entries 'size',
+        'stage', 'status' ('ok' or 'error') and the size parameters
+    """
+    records = []
+    cleanup = workdir is None
+    if workdir is None:
+        workdir = tempfile.mkdtemp(prefix='urbs-benchmark-')
+
+    def stage(stage_name, func, *args, **kwargs):
+        kwargs['memory'] = memory
+        record = dict(params, size=name, stage=stage_name, status='ok')
+        try:
+            result, stats = measure(func, *args, **kwargs)
+            record.update(stats)
+        except Exception as exc:
+            record.update(status='error', error=repr(exc))
+            traceback.print_exc()
+            result = None
+        records.append(record)
+        print('{size:>10} {stage:>15} {status:>6} {wall:9.3f} s'.format(
+            **dict({'wall': np.nan}, **record)))
+        if record['status'] == 'error':
+            raise StageError(stage_name)
+        return result, record
+
+    try:
+        data = synthetic_data(**params)
+        if 'read_excel' in stages:
+            filename = os.path.join(workdir, '{}.xlsx'.format(name))
+            write_excel(data, filename)
+            data, _ = stage('read_excel', urbs.read_excel, filename)
+
+        prob, record = stage('create_model', urbs.create_model, data)
+        record['variables'] = prob.nvariables()
+        record['constraints'] = prob.nconstraints()
+        if 'create_model' not in stages:
+            records.remove(record)
+
+        if 'write_lp' in stages:
+            filename = os.path.join(workdir, '{}.lp'.format(name))
+            stage('write_lp', prob.write, filename,
+                  io_options={'symbolic_solver_labels': False})
+
+        if 'solve' not in stages:
+            return records
+        optim = SolverFactory(solver)
+        stage('solve', optim.solve, prob)
+
+        commodities = sorted(prob.com_demand)
+        sites = sorted(prob.sit)
+        if 'get_timeseries' in stages:
+            stage('get_timeseries', urbs.get_timeseries_batch, prob,
+                  commodities, sites)
+        if 'report' in stages:
+            stage('report', urbs.report, prob,
+                  os.path.join(workdir, '{}-report.xlsx'.format(name)),
+                  commodities, sites)
+        if 'result_figures' in stages:
+            stage('result_figures', urbs.result_figures, prob,
+                  os.path.join(workdir, name), formats=('png',))
+    except StageError:
+        pass
+    finally:
+        if cleanup:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return records
+
+
+def size_grid(sizes=(), **ranges):
+    """Return predefined sizes and a product grid of size parameters.
+
+    Args:
+        sizes: names of predefined sizes (see SIZES)
+        **ranges: lists of values for arguments of synthetic_data; all
+            combinations form the grid, other arguments keep the defaults
+
+    Returns:
+        an ordered list of (name, params) tuples
+    """
+    grid = [(size, SIZES[size]) for size in sizes]
+    ranges = dict((key, values) for key, values in ranges.items() if values)
+    if ranges:
+        keys = sorted(ranges)
+        for values in itertools.product(*(ranges[key] for key in keys)):
+            params = dict(SIZES['small'], **dict(zip(keys, values)))
+            name = '-'.join('{}{}'.format(key[:3], value)
+                            for key, value in zip(keys, values))
+            grid.append((name, params))
+    return grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the urbs workflow over a grid of model sizes.')
+    parser.add_argument('--size', nargs='*', default=[],
+                        choices=sorted(SIZES), help='predefined sizes')
+    for key in ('sites', 'commodities', 'processes', 'transmissions',
+                'storages', 'dsm', 'timesteps'):
+        parser.add_argument('--' + key, nargs='*', type=int, default=[],
+                            help='grid values of {}'.format(key))
+    parser.add_argument('--stages', nargs='*', default=list(STAGES),
+                        choices=STAGES, help='stages to measure')
+    parser.add_argument('--solver', default='glpk')
+    parser.add_argument('--memory', action='store_true',
+                        help='trace allocated memory (slower)')
+    parser.add_argument('--output', default='benchmark.json',
+                        help='JSON result file')
+    args = parser.parse_args(argv)
+
+    grid = size_grid(args.size, **dict(
+        (key, getattr(args, key)) for key in ('sites', 'commodities',
+        'processes', 'transmissions', 'storages', 'dsm', 'timesteps')))
+    if not grid:
+        grid = size_grid(['tiny', 'small'])
+
+    records = []
+    for name, params in grid:
+        records.extend(run_size(name, params, solver=args.solver,
+                                stages=args.stages, memory=args.memory))
+
+    result = {
+        'meta': {
+            'time': datetime.now().strftime('%Y%m%dT%H%M%S'),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'pyomo': pyomo.version.version,
+            'solver': args.solver,
+            'memory': args.memory},
+        'records': records}
+    with open(args.output, 'w') as file_handle:
+        json.dump(result, file_handle, indent=2, sort_keys=True)
+    print('Wrote {} records to {}'.format(len(records), args.output))
+    return 1 if any(r['status'] == 'error' for r in records) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -25,37 +25,78 @@ def get_most_recent_entry(search_dir):
     return entries[-1]
 
 def glob_result_files(folder_name):
-    """ Glob result spreadsheets from specified folder. 
+    """ Glob result stores or spreadsheets from specified folder. 
     
     Args:
         folder_name: an absolute or relative path to a directory
         
     Returns:
-        list of filenames that match the pattern 'scenario_*.xlsx'
+        list of result store directories (written by urbs.report_store) that
+        match the pattern 'scenario_*'; if there are none, list of
+        spreadsheet filenames that match the pattern 'scenario_*.xlsx'
     """
+    glob_pattern = os.path.join(folder_name, 'scenario_*')
+    result_stores = sorted(d for d in glob.glob(glob_pattern)
+                           if os.path.isdir(d))
+    if result_stores:
+        return result_stores
+
     glob_pattern = os.path.join(folder_name, 'scenario_*.xlsx')
     result_files = sorted(glob.glob(glob_pattern))
     return result_files
 
+def read_result(result_file):
+    """ Read costs and created energy sums of one scenario.
+
+    Args:
+        result_file: a result store directory (urbs.report_store) or a
+                     spreadsheet filename (urbs.report)
+
+    Returns:
+        (costs, created) tuple of Series: costs by cost type and created
+        energy by process/commodity, summed over all sites and commodities
+    """
+    if os.path.isdir(result_file):
+        cost = urbs.read_store_table(result_file, 'costs')
+        cost = cost.set_index(cost.columns[0])[cost.columns[1]]
+        try:
+            esum = urbs.read_store_table(result_file, 'commodity_sums')
+            esum = esum[esum['group'] == 'Created']
+            created = esum.groupby('name')['value'].sum()
+        except IOError:
+            created = pd.Series()
+    else:
+        with pd.ExcelFile(result_file) as xls:
+            cost = xls.parse('Costs',index_col=[0]).iloc[:, 0]
+            esum = xls.parse('Commodity sums')
+
+            # repair broken MultiIndex in the first column
+            esum.reset_index(inplace=True)
+            esum.fillna(method='ffill', inplace=True)
+            esum.set_index(['level_0', 'level_1'], inplace=True)
+            created = esum.loc['Created'].sum(axis=1)
+    return cost, created
+
 def compare_scenarios(result_files, output_filename):
-    """ Create report sheet and plots for given report spreadsheets.
+    """ Create report sheet and plots for given scenario results.
     
+    Scenario results are read one after another and reduced to their cost
+    and energy sums immediately, so memory use stays flat even for large
+    scenario sweeps.
+
     Args:
-        result_files: a list of spreadsheet filenames generated by urbs.report
+        result_files: a list of result store directories generated by
+                      urbs.report_store or spreadsheet filenames generated by
+                      urbs.report
         output_filename: a spreadsheet filename that the comparison is to be 
                          written to
                          
      Returns:
         Nothing
-    
-    To do: 
-        Don't use report spreadsheets, instead load pickled problem 
-        instances. This would make this function less fragile and dependent
-        on the output format of urbs.report().
     """
         
     # derive list of scenario names for column labels/figure captions
-    scenario_names = [os.path.basename(rf) # drop folder names, keep filename
+    scenario_names = [os.path.basename(rf.rstrip(os.sep)) # keep filename
                       .replace('_', ' ') # replace _ with spaces
                       .replace('.xlsx', '') # drop file extension
                       .replace('scenario ', '') # drop 'scenario ' prefix
@@ -71,44 +112,34 @@ def compare_scenarios(result_files, output_filename):
     except ValueError:
         pass # do nothing if no base scenario is found
     
-    costs = []  # total costs by type and scenario
-    esums = []  # sum of energy produced by scenario
+    costs = {}  # total costs by type and scenario
+    esums = {}  # sum of energy produced by scenario
     
     # READ
     
-    for rf in result_files:
-        with pd.ExcelFile(rf) as xls:
-            cost = xls.parse('Costs',index_col=[0])
-            esum = xls.parse('Commodity sums')
-    
-            # repair broken MultiIndex in the first column
-            esum.reset_index(inplace=True)
-            esum.fillna(method='ffill', inplace=True)
-            esum.set_index(['level_0', 'level_1'], inplace=True)
-    
-            costs.append(cost)
-            esums.append(esum)
+    # only keep the (small) cost and energy sums of each scenario
+    for scenario_name, rf in zip(scenario_names, result_files):
+        costs[scenario_name], esums[scenario_name] = read_result(rf)
     
     # merge everything into one DataFrame each
-    costs = pd.concat(costs, axis=1, keys=scenario_names)
-    esums = pd.concat(esums, axis=1, keys=scenario_names)
+    costs = pd.concat([costs[s] for s in scenario_names], axis=1,
+                      keys=scenario_names)
+    esums = pd.concat([esums[s] for s in scenario_names], axis=1,
+                      keys=scenario_names).fillna(0)
     
     # ANALYSE
     
-    # drop redundant 'costs' column label
     # make index name nicer for plot
     # sort/transpose frame
     # convert EUR/a to 1e9 EUR/a
-    costs.columns = costs.columns.droplevel(1)
     costs.index.name = 'Cost type'
     costs = costs.sort_index().transpose()
     costs = costs / 1e9
     
-    # sum up created energy over all locations, but keeping scenarios (level=0)
+    # created energy is already summed up over all locations
     # make index name 'Commodity' nicer for plot
     # drop all unused commodities and sort/transpose
     # convert MWh to GWh
-    esums = esums.loc['Created'].sum(axis=1, level=0)
     esums.index.name = 'Commodity'
     used_commodities = (esums.sum(axis=1) > 0)
     esums = esums[used_commodities].sort_index().transpose()
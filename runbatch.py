@@ -0,0 +1,392 @@
+"""Run a batch of urbs scenarios described by a job manifest
+
+Instead of editing runme.py, a manifest file (JSON, YAML or TOML) lists the
+input files, timestep ranges, scenario deltas, solver options, outputs and
+the number of parallel jobs. Every combination of input, timestep range and
+scenario is one job. Output stages that are not listed are skipped.
+
+Usage:
+
+    python runbatch.py manifest.json
+    python runbatch.py manifest.yaml --result-dir result/batch  # resume
+
+Example manifest (JSON):
+
+    {
+        "inputs": ["mimo-example.xlsx"],
+        "timesteps": [{"offset": 5000, "length": 240}],
+        "scenarios": {
+            "base": [],
+            "stock_prices": [{"sheet": "commodity", "column": "price",
+                              "where": {"Type": "Stock"}, "scale": 1.5}],
+            "co2_limit": [{"sheet": "hacks", "index": "Global CO2 limit",
+                           "column": "Value", "scale": 0.05}]
+        },
+        "model": {"dual": false, "scale": false},
+        "solver": {"name": "glpk", "time_limit": 3600,
+                   "options": {"mipgap": 0.0005}},
+        "outputs": ["report", "kpis", "archive"],
+        "plot_periods": {"aut": [5000, 5168]},
+        "parallel": 2
+    }
+
+Exit codes: 0 if all jobs completed, 1 if a job failed, 2 if the manifest
+is invalid.
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import traceback
+
+import numpy as np
+import pyomo.environ
+import urbs
+from runme import (prepare_result_directory, write_checkpoint, is_completed,
+                   setup_solver, get_solver, write_solver_metrics)
+
+OUTPUTS = ('report', 'report_store', 'figures', 'kpis', 'archive', 'trace')
+
+# default values of optional manifest entries
+DEFAULTS = {
+    'timesteps': [None],
+    'scenarios': {'base': []},
+    'model': {},
+    'solver': {'name': 'glpk'},
+    'outputs': ['report', 'archive'],
+    'plot_periods': {},
+    'parallel': 1}
+
+EXIT_OK, EXIT_FAILED, EXIT_INVALID = 0, 1, 2
+
+
+class ManifestError(Exception):
+    """The job manifest is invalid."""
+
+
+def read_manifest(filename):
+    """ read a job manifest from a JSON, YAML or TOML file
+
+    YAML requires PyYAML, TOML requires Python 3.11 (or the toml package).
+
+    Returns:
+        manifest dict, completed with DEFAULTS
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    try:
+        if extension in ('.yaml', '.yml'):
+            import yaml
+            with open(filename) as file_handle:
+                manifest = yaml.safe_load(file_handle)
+        elif extension == '.toml':
+            try:
+                import tomllib
+                with open(filename, 'rb') as file_handle:
+                    manifest = tomllib.load(file_handle)
+            except ImportError:
+                import toml
+                manifest = toml.load(filename)
+        else:
+            with open(filename) as file_handle:
+                manifest = json.load(file_handle)
+    except ImportError as exc:
+        raise ManifestError("Cannot read {}: {}".format(filename, exc))
+    except (IOError, OSError, ValueError) as exc:
+        raise ManifestError("Cannot read {}: {}".format(filename, exc))
+    return validate_manifest(manifest)
+
+
+def validate_manifest(manifest):
+    """ check a manifest dict and fill in defaults
+
+    Raises:
+        ManifestError if entries are missing, unknown or malformed
+    """
+    if not isinstance(manifest, dict):
+        raise ManifestError("Manifest must be a mapping")
+    manifest = dict(manifest)
+    if 'input' in manifest:
+        manifest.setdefault('inputs', [manifest.pop('input')])
+    if not manifest.get('inputs'):
+        raise ManifestError("Manifest lists no 'inputs'")
+    for key, value in DEFAULTS.items():
+        manifest.setdefault(key, value)
+
+    known = set(DEFAULTS) | set(['inputs', 'result_dir'])
+    unknown = set(manifest) - known
+    if unknown:
+        raise ManifestError("Unknown manifest entries: {}".format(
+            ', '.join(sorted(unknown))))
+
+    for input_file in manifest['inputs']:
+        if not os.path.exists(input_file):
+            raise ManifestError("Input file {} not found".format(input_file))
+    for output in manifest['outputs']:
+        if output not in OUTPUTS:
+            raise ManifestError("Unknown output '{}', choose from {}".format(
+                output, ', '.join(OUTPUTS)))
+    if isinstance(manifest['timesteps'], dict):
+        manifest['timesteps'] = [manifest['timesteps']]
+    for timesteps in manifest['timesteps']:
+        timestep_range(timesteps)
+    for name, deltas in manifest['scenarios'].items():
+        for delta in deltas or []:
+            if 'sheet' not in delta or 'column' not in delta or \
+                    not any(op in delta for op in ('set', 'scale', 'add')):
+                raise ManifestError(
+                    "Scenario '{}': each delta needs 'sheet', 'column' and "
+                    "one of 'set', 'scale' or 'add'".format(name))
+    if 'name' not in manifest['solver']:
+        raise ManifestError("Solver entry lacks a 'name'")
+    if int(manifest['parallel']) < 1:
+        raise ManifestError("'parallel' must be at least 1")
+    return manifest
+
+
+def timestep_range(timesteps):
+    """ return a list of timesteps from a manifest timestep entry
+
+    Args:
+        timesteps: None (all timesteps of the input), a dict with keys
+            'offset' and 'length' (like in runme.py) or a list [start, stop]
+
+    The dict form yields the initial timestep offset and the length modelled
+    timesteps after it, i.e. offset to offset + length inclusive. The list
+    form is half-open like range(start, stop) and the plot_periods entries:
+    stop is not included.
+
+    Returns:
+        list of timesteps (including the initial timestep), or None
+    """
+    if timesteps is None:
+        return None
+    if isinstance(timesteps, dict) and set(timesteps) == set(['offset',
+                                                             'length']):
+        offset, length = int(timesteps['offset']), int(timesteps['length'])
+        return list(range(offset, offset + length + 1))
+    if isinstance(timesteps, (list, tuple)) and len(timesteps) == 2:
+        return list(range(int(timesteps[0]), int(timesteps[1])))
+    raise ManifestError("Invalid timesteps entry {!r}".format(timesteps))
+
+
+def apply_delta(data, delta):
+    """ apply one scenario delta to the input data dict (in place)
+
+    Args:
+        data: urbs input dict, as returned by urbs.read_excel
+        delta: dict with keys 'sheet' (e.g. 'commodity'), 'column' and one
+            of 'set' (new value), 'scale' (factor) or 'add' (summand). Rows
+            are selected by 'index' (a row label, e.g. ['North', 'Hydro
+            plant']) or 'where' (a dict of index level values, e.g.
+            {'Type': 'Stock'}); default: all rows
+
+    Returns:
+        data
+    """
+    df = data[delta['sheet']]
+    if 'index' in delta:
+        label = delta['index']
+        rows = tuple(label) if isinstance(label, list) else label
+    else:
+        rows = np.ones(len(df), dtype=bool)
+        for level, value in (delta.get('where') or {}).items():
+            rows &= (df.index.get_level_values(level) == value)
+    column = delta['column']
+
+    if 'set' in delta:
+        df.loc[rows, column] = delta['set']
+    elif 'scale' in delta:
+        df.loc[rows, column] *= delta['scale']
+    else:
+        df.loc[rows, column] += delta['add']
+    return data
+
+
+def jobs(manifest):
+    """ return the list of jobs (name, input_file, timesteps, deltas)
+
+    Job names are the scenario names, prefixed by the input file name and
+    the timestep range if the manifest lists several of them.
+    """
+    job_list = []
+    several_inputs = len(manifest['inputs']) > 1
+    several_ranges = len(manifest['timesteps']) > 1
+    for input_file in manifest['inputs']:
+        for timesteps in manifest['timesteps']:
+            timesteps = timestep_range(timesteps)
+            for sce in sorted(manifest['scenarios']):
+                parts = []
+                if several_inputs:
+                    parts.append(os.path.splitext(
+                        os.path.basename(input_file))[0])
+                if several_ranges:
+                    parts.append('t{}-{}'.format(timesteps[0], timesteps[-1])
+                                 if timesteps else 'all')
+                parts.append(sce)
+                job_list.append(('_'.join(parts), input_file, timesteps,
+                                 manifest['scenarios'][sce] or []))
+    return job_list
+
+
+def run_job(job, manifest, result_dir, processes=None):
+    """ run one job: read, modify, solve and write the requested outputs
+
+    Args:
+        job: tuple (name, input_file, timesteps, deltas), see jobs
+        manifest: validated manifest dict
+        result_dir: directory for all outputs
+        processes: worker processes for result_figures
+
+    Returns:
+        dict of solver metrics (see urbs.solve)
+    """
+    name, input_file, timesteps, deltas = job
+    outputs = manifest['outputs']
+    if 'trace' in outputs:
+        urbs.start_tracing()
+
+    basename = os.path.join(result_dir, name)
+    try:
+        data = urbs.read_excel(input_file)
+        for delta in deltas:
+            apply_delta(data, delta)
+        prob = urbs.create_model(data, timesteps, **manifest['model'])
+
+        # solver with options
+        solver = dict(manifest['solver'])
+        log_filename = os.path.join(result_dir, '{}.log'.format(name))
+        optim = get_solver(solver['name'])
+        optim = setup_solver(optim, logfile=log_filename,
+                             threads=solver.get('threads'),
+                             time_limit=solver.get('time_limit'))
+        for key, value in sorted((solver.get('options') or {}).items()):
+            optim.set_options('{}={}'.format(key, value))
+        result, metrics = urbs.solve(prob, optim, logfile=log_filename)
+        if str(result.solver.termination_condition) != 'optimal':
+            raise RuntimeError('Solver terminated with {}'.format(
+                result.solver.termination_condition))
+
+        if 'report' in outputs:
+            urbs.report(prob, basename + '.xlsx', prob.com_demand, prob.sit)
+        if 'report_store' in outputs:
+            urbs.report_store(prob, basename, prob.com_demand, prob.sit)
+        if 'figures' in outputs:
+            periods = dict((period, list(range(*span))) for period, span in
+                           manifest['plot_periods'].items())
+            urbs.result_figures(
+                prob, basename,
+                plot_title_prefix=name.replace('_', ' ').title(),
+                periods=periods, processes=processes)
+        if 'kpis' in outputs:
+            urbs.get_kpis(prob).to_csv(basename + '-kpis.csv', index=False)
+        if 'archive' in outputs:
+            urbs.save(prob, basename + '.npz')
+
+        write_checkpoint(
+            result_dir, name, 'completed',
+            termination=str(result.solver.termination_condition),
+            objective=float(urbs.get_entity(prob, 'costs').sum()),
+            solver=metrics)
+    finally:
+        # also record the stages of a failed job
+        if 'trace' in outputs:
+            urbs.export_trace(urbs.stop_tracing(),
+                              basename + '-trace.json')
+    return metrics
+
+
+def _run_job_safe(args):
+    """ run_job for a worker process; checkpoints failures
+
+    Returns:
+        (name, error) tuple, error is None on success
+    """
+    job, manifest, result_dir, processes = args
+    try:
+        run_job(job, manifest, result_dir, processes)
+        return job[0], None
+    except Exception as exc:
+        traceback.print_exc()
+        write_checkpoint(result_dir, job[0], 'failed', error=repr(exc))
+        return job[0], repr(exc)
+
+
+def run_batch(manifest, result_dir):
+    """ run all jobs of a manifest not yet completed in result_dir
+
+    Jobs with a 'completed' checkpoint are skipped, so that rerunning a
+    manifest on the same result directory resumes the batch. Up to
+    manifest['parallel'] jobs run in parallel worker processes.
+
+    Returns:
+        dict {job name: error} of failed jobs
+    """
+    todo = []
+    for job in jobs(manifest):
+        if is_completed(result_dir, job[0]):
+            print("Skipping completed job '{}'".format(job[0]))
+        else:
+            todo.append(job)
+
+    parallel = min(int(manifest['parallel']), len(todo))
+    # worker processes may not start further processes for plotting
+    args = [(job, manifest, result_dir, 1 if parallel > 1 else None)
+            for job in todo]
+    if parallel > 1:
+        pool = multiprocessing.Pool(parallel)
+        try:
+            results = pool.map(_run_job_safe, args, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_run_job_safe(arg) for arg in args]
+    return dict((name, error) for name, error in results if error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run a batch of urbs scenarios from a job manifest.')
+    parser.add_argument('manifest', help='manifest file (.json, .yaml, .toml)')
+    parser.add_argument('--result-dir',
+                        help='result directory; reuse one to resume a batch')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only validate the manifest and list the jobs')
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = read_manifest(args.manifest)
+    except ManifestError as exc:
+        print('Invalid manifest: {}'.format(exc), file=sys.stderr)
+        return EXIT_INVALID
+    job_list = jobs(manifest)
+    if args.dry_run:
+        for name, input_file, timesteps, deltas in job_list:
+            print('{} ({}, {} timesteps, {} deltas)'.format(
+                name, input_file, len(timesteps) if timesteps else 'all',
+                len(deltas)))
+        return EXIT_OK
+
+    result_name = os.path.splitext(os.path.basename(args.manifest))[0]
+    result_dir = prepare_result_directory(
+        result_name, args.result_dir or manifest.get('result_dir'))
+    shutil.copyfile(args.manifest, os.path.join(
+        result_dir, os.path.basename(args.manifest)))
+
+    failed = run_batch(manifest, result_dir)
+    print(write_solver_metrics(result_dir, [job[0] for job in job_list]))
+    if failed:
+        print("Failed jobs (rerun with --result-dir {} to resume): {}".format(
+            result_dir, ', '.join(sorted(failed))), file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,6 +9,7 @@ prob = urbs.create_model(data, timesteps=range(1,8), dual=True)
 optim = SolverFactory('glpk')
 result = optim.solve(prob, tee=True)
 
-res_vertex_duals = urbs.get_entity(prob, 'res_vertex')
-marg_costs = res_vertex_duals.xs(('Elec', 'Demand'), level=('com', 'com_type'))
-print(marg_costs)
\ No newline at end of file
+# marginal costs per timestep and (site, commodity), shadow prices of limits
+prices, limits = urbs.get_marginal_costs(prob)
+print(prices.xs('Elec', axis=1, level='com'))
+print(limits)
\ No newline at end of file
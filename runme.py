@@ -1,7 +1,11 @@
+import json
 import os
 import pyomo.environ
 import shutil
+import sys
+import traceback
 import urbs
+import warnings
 from datetime import datetime
 from pyomo.opt.base import SolverFactory
 
@@ -42,39 +46,104 @@ def scenario_all_together(data):
     return data
 
 
-def prepare_result_directory(result_name):
-    """ create a time stamped directory within the result folder """
-    # timestamp for result directory
-    now = datetime.now().strftime('%Y%m%dT%H%M')
+def prepare_result_directory(result_name, result_dir=None):
+    """ create a time stamped directory within the result folder
+
+    If result_dir is given, that directory is (re)used instead, e.g. to resume
+    an interrupted batch run.
+    """
+    if result_dir is None:
+        # timestamp for result directory
+        now = datetime.now().strftime('%Y%m%dT%H%M')
+        result_dir = os.path.join('result', '{}-{}'.format(result_name, now))
 
     # create result directory if not existent
-    result_dir = os.path.join('result', '{}-{}'.format(result_name, now))
     if not os.path.exists(result_dir):
         os.makedirs(result_dir)
 
     return result_dir
 
 
-def setup_solver(optim, logfile='solver.log'):
-    """ """
+def checkpoint_file(result_dir, sce):
+    """ filename of the checkpoint of scenario sce in result_dir """
+    return os.path.join(result_dir, '{}.status.json'.format(sce))
+
+
+def read_checkpoint(result_dir, sce):
+    """ return the checkpoint dict of scenario sce, or None if missing """
+    try:
+        with open(checkpoint_file(result_dir, sce)) as file_handle:
+            return json.load(file_handle)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def write_checkpoint(result_dir, sce, status, **info):
+    """ atomically write the checkpoint of scenario sce to result_dir
+
+    The checkpoint is written to a temporary file first and then renamed, so
+    that an interrupted run never leaves a partial checkpoint behind.
+
+    Args:
+        result_dir: result directory
+        sce: scenario name
+        status: 'completed' or 'failed'
+        **info: further JSON-able entries, e.g. termination condition
+    """
+    checkpoint = dict(info, scenario=sce, status=status,
+                      time=datetime.now().strftime('%Y%m%dT%H%M%S'))
+    filename = checkpoint_file(result_dir, sce)
+    with open(filename + '.tmp', 'w') as file_handle:
+        json.dump(checkpoint, file_handle, indent=2, sort_keys=True)
+    replace = getattr(os, 'replace', os.rename)  # Python 2 compat
+    replace(filename + '.tmp', filename)
+
+
+def is_completed(result_dir, sce):
+    """ True if scenario sce has a 'completed' checkpoint in result_dir """
+    checkpoint = read_checkpoint(result_dir, sce)
+    return checkpoint is not None and checkpoint['status'] == 'completed'
+
+
+def setup_solver(optim, logfile='solver.log', threads=None, time_limit=None):
+    """ set solver options: log file, number of threads, time limit (s) """
     if optim.name == 'gurobi':
         # reference with list of option names
         # http://www.gurobi.com/documentation/5.6/reference-manual/parameters
         optim.set_options("logfile={}".format(logfile)) 
-        # optim.set_options("timelimit=7200")  # seconds
+        if threads:
+            optim.set_options("threads={}".format(threads))
+        if time_limit:
+            optim.set_options("timelimit={}".format(time_limit))  # seconds
         # optim.set_options("mipgap=5e-4")  # default = 1e-4
     elif optim.name == 'glpk':
         # reference with list of options
         # execute 'glpsol --help'
-        optim.set_options("log={}".format(logfile))
-        # optim.set_options("tmlim=7200")  # seconds
+        # (the solver output is logged by urbs.solve)
+        if time_limit:
+            optim.set_options("tmlim={}".format(int(time_limit)))  # seconds
         # optim.set_options("mipgap=.0005")
+    elif optim.name == 'highs_direct':
+        # in-memory HiGHS (urbs.HighsDirect), list of options:
+        # https://ergo-code.github.io/HiGHS/dev/options/definitions/
+        if threads:
+            optim.set_options("threads={}".format(threads))
+        if time_limit:
+            optim.set_options("time_limit={}".format(time_limit))  # seconds
     else:
         print("Warning from setup_solver: no options set for solver "
               "'{}'!".format(optim.name))
     return optim
 
-def run_scenario(input_file, timesteps, scenario, result_dir, plot_periods={}):
+
+def get_solver(name):
+    """ return a solver object; 'highs_direct' solves in memory via highspy """
+    if name == 'highs_direct':
+        return urbs.HighsDirect()
+    return SolverFactory(name)
+
+def run_scenario(input_file, timesteps, scenario, result_dir, plot_periods={},
+                 show_ranges=False):
     """ run an urbs model for given input, time steps and scenario
 
     Args:
@@ -82,48 +151,143 @@ def run_scenario(input_file, timesteps, scenario, result_dir, plot_periods={}):
         timesteps: a list of timesteps, e.g. range(0,8761)
         scenario: a scenario function that modifies the input data dict
         result_dir: directory name for result spreadsheet and plots
+        plot_periods: (optional) dict of plotting periods, see result_figures
+        show_ranges: (optional) print the coefficient ranges of the model
 
     Returns:
         the urbs model instance
     """
 
-    # scenario name, read and modify data for scenario
+    # record time and memory of all stages (see urbs.trace_span)
+    urbs.start_tracing()
+
+    # scenario name
     sce = scenario.__name__
-    data = urbs.read_excel(input_file)
-    data = scenario(data)
-
-    # create model
-    prob = urbs.create_model(data, timesteps)
-
-    # refresh time stamp string and create filename for logfile
-    now = prob.created
-    log_filename = os.path.join(result_dir, '{}.log').format(sce)
-
-    # solve model and read results
-    optim = SolverFactory('glpk')  # cplex, glpk, gurobi, ...
-    optim = setup_solver(optim, logfile=log_filename)
-    result = optim.solve(prob, tee=True)
-
-    # copy input file to result directory
-    shutil.copyfile(input_file, os.path.join(result_dir, input_file))
-	
-	# write report to spreadsheet
-    urbs.report(
-        prob,
-        os.path.join(result_dir, '{}.xlsx').format(sce),
-        prob.com_demand, prob.sit)
-
-    urbs.result_figures(
-        prob, 
-        os.path.join(result_dir, '{}'.format(sce)),
-        plot_title_prefix=sce.replace('_', ' ').title(),
-        periods=plot_periods)
+    try:
+        # read and modify data for scenario
+        data = urbs.read_excel(input_file)
+        data = scenario(data)
+
+        # create model
+        prob = urbs.create_model(data, timesteps)
+
+        # refresh time stamp string and create filename for logfile
+        now = prob.created
+        log_filename = os.path.join(result_dir, '{}.log').format(sce)
+
+        # summarise coefficient ranges; if they span too many orders of
+        # magnitude, try create_model(..., scale=True)
+        if show_ranges:
+            print(urbs.coefficient_ranges(prob))
+
+        # solve model and read results
+        optim = get_solver('glpk')  # cplex, glpk, gurobi, highs_direct, ...
+        optim = setup_solver(optim, logfile=log_filename)
+        # the solver log is parsed for solver metrics
+        result, metrics = urbs.solve(prob, optim, logfile=log_filename,
+                                     tee=True)
+
+        # copy input file to result directory
+        shutil.copyfile(input_file, os.path.join(result_dir, input_file))
+
+        # write report to spreadsheet
+        urbs.report(
+            prob,
+            os.path.join(result_dir, '{}.xlsx').format(sce),
+            prob.com_demand, prob.sit)
+
+        # write result store for scenario comparison (comp.py); it needs
+        # pyarrow, without it comp.py falls back to the spreadsheets
+        try:
+            urbs.report_store(
+                prob,
+                os.path.join(result_dir, sce),
+                prob.com_demand, prob.sit)
+        except ImportError as exc:
+            warnings.warn("Skipping result store of scenario '{}': {}"
+                          .format(sce, exc))
+
+        urbs.result_figures(
+            prob, 
+            os.path.join(result_dir, '{}'.format(sce)),
+            plot_title_prefix=sce.replace('_', ' ').title(),
+            periods=plot_periods)
+
+        # key performance indicators (full-load hours, costs, ...)
+        urbs.get_kpis(prob).to_csv(
+            os.path.join(result_dir, '{}-kpis.csv'.format(sce)), index=False)
+
+        # store results and mark scenario as completed
+        urbs.save(prob, os.path.join(result_dir, '{}.npz'.format(sce)))
+        write_checkpoint(
+            result_dir, sce, 'completed',
+            termination=str(result.solver.termination_condition),
+            objective=float(urbs.get_entity(prob, 'costs').sum()),
+            results='{}.npz'.format(sce),
+            solver=metrics)
+    finally:
+        # write stage timings, also for chrome://tracing and failed runs
+        spans = urbs.stop_tracing()
+        urbs.export_trace(
+            spans, os.path.join(result_dir, '{}-trace.json'.format(sce)))
+        urbs.export_trace(
+            spans,
+            os.path.join(result_dir, '{}-trace.chrome.json'.format(sce)),
+            fmt='chrome')
     return prob
 
+
+def run_scenarios(input_file, timesteps, scenarios, result_dir,
+                  plot_periods={}):
+    """ run all scenarios not yet completed in result_dir
+
+    Scenarios with a 'completed' checkpoint in result_dir are skipped, so
+    that rerunning an interrupted batch on the same result directory resumes
+    it. A failing scenario is checkpointed as 'failed' and the batch goes on.
+
+    Returns:
+        list of names of failed scenarios
+    """
+    failed = []
+    for scenario in scenarios:
+        sce = scenario.__name__
+        if is_completed(result_dir, sce):
+            print("Skipping completed scenario '{}'".format(sce))
+            continue
+        try:
+            run_scenario(input_file, timesteps, scenario, result_dir,
+                         plot_periods=plot_periods)
+        except Exception as exc:
+            traceback.print_exc()
+            write_checkpoint(result_dir, sce, 'failed', error=repr(exc))
+            failed.append(sce)
+    return failed
+
+
+def write_solver_metrics(result_dir, scenarios):
+    """ collect solver metrics of all checkpointed scenarios in one table
+
+    Scenarios can be given as scenario functions or by name (e.g. the job
+    names of runbatch.py). Writes solver-metrics.csv to result_dir and
+    returns the table (see urbs.solver_metrics_table).
+    """
+    records = {}
+    for scenario in scenarios:
+        sce = getattr(scenario, '__name__', scenario)
+        checkpoint = read_checkpoint(result_dir, sce)
+        if checkpoint and 'solver' in checkpoint:
+            records[sce] = checkpoint['solver']
+    table = urbs.solver_metrics_table(records)
+    table.to_csv(os.path.join(result_dir, 'solver-metrics.csv'))
+    return table
+
 if __name__ == '__main__':
     input_file = 'mimo-example.xlsx'
     result_name = os.path.splitext(input_file)[0]  # cut away file extension
-    result_dir = prepare_result_directory(result_name)  # name + time stamp
+
+    # name + time stamp, or resume an earlier run: python runme.py result_dir
+    result_dir = prepare_result_directory(
+        result_name, sys.argv[1] if len(sys.argv) > 1 else None)
 
     # simulation timesteps
     (offset, length) = (5000, 10*24)  # time step selection
@@ -153,6 +317,9 @@ if __name__ == '__main__':
         scenario_north_process_caps,
         scenario_all_together]
 
-    for scenario in scenarios:
-        prob = run_scenario(input_file, timesteps, scenario, 
-                            result_dir, plot_periods=periods)
+    failed = run_scenarios(input_file, timesteps, scenarios, result_dir,
+                           plot_periods=periods)
+    print(write_solver_metrics(result_dir, scenarios))
+    if failed:
+        sys.exit("Failed scenarios (rerun with 'python runme.py {}' to "
+                 "resume): {}".format(result_dir, ', '.join(failed)))
@@ -0,0 +1,129 @@
+"""Tests of the bulk value extraction of get_entity
+
+The reference baseline_get_entity is the element-wise get_entity for Vars and
+Constraints from before the bulk extraction; both must return identical
+Series.
+
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+import pyomo.core as pyomo
+
+import urbs
+from urbs.pyomoio import _get_onset_names
+
+
+def baseline_get_entity(instance, name):
+    """Element-wise get_entity for Vars and Constraints (reference)."""
+    entity = instance.__getattribute__(name)
+    labels = _get_onset_names(entity)
+
+    if isinstance(entity, pyomo.Constraint):
+        if entity.dim() > 1:
+            results = pd.DataFrame(
+                [v[0] + (instance.dual[v[1]],) for v in entity.items()])
+        elif entity.dim() == 1:
+            results = pd.DataFrame(
+                [(v[0], instance.dual[v[1]]) for v in entity.items()])
+        else:
+            results = pd.DataFrame(
+                [(v[0], instance.dual[v[1]]) for v in entity.items()])
+            labels = ['None']
+    else:
+        if entity.dim() > 1:
+            results = pd.DataFrame(
+                [v[0] + (v[1].value,) for v in entity.items()])
+        elif entity.dim() == 1:
+            results = pd.DataFrame(
+                [(v[0], v[1].value) for v in entity.items()])
+        else:
+            results = pd.DataFrame(
+                [(v[0], v[1].value) for v in entity.items()])
+            labels = ['None']
+
+    for k, label in enumerate(labels):
+        if label in labels[:k]:
+            labels[k] = labels[k] + "_"
+
+    if not results.empty:
+        results.columns = labels + [name]
+        results.set_index(labels, inplace=True)
+        results = results[name]
+    else:
+        results = pd.Series(name=name)
+    return results
+
+
+def small_model():
+    """A model with 0-, 1- and 2-dimensional Vars and Constraints."""
+    m = pyomo.ConcreteModel()
+    m.t = pyomo.Set(initialize=[1, 2, 3], ordered=True)
+    m.sit = pyomo.Set(initialize=['Mid', 'North'], ordered=True)
+    m.flow = pyomo.Var(m.t, m.sit, within=pyomo.NonNegativeReals)
+    m.cap = pyomo.Var(m.sit, within=pyomo.NonNegativeReals)
+    m.total = pyomo.Var(within=pyomo.NonNegativeReals)
+    m.res_flow = pyomo.Constraint(
+        m.t, m.sit, rule=lambda m, t, sit: m.flow[t, sit] <= m.cap[sit])
+    m.def_total = pyomo.Constraint(
+        rule=lambda m: m.total == pyomo.summation(m.cap))
+    m.dual = pyomo.Suffix(direction=pyomo.Suffix.IMPORT)
+
+    for k, var in enumerate(m.flow.values()):
+        var.value = 0.5 * k
+    m.flow[2, 'North'].value = None  # unset values become NaN
+    m.cap['Mid'].value = 3.0
+    m.cap['North'].value = 4.0
+    m.total.value = 7.0
+    for k, con in enumerate(m.res_flow.values()):
+        m.dual[con] = -1.5 * k
+    m.dual[m.def_total] = 2.0
+    return m
+
+
+class GetEntityTest(unittest.TestCase):
+
+    names = ['flow', 'cap', 'total', 'res_flow', 'def_total']
+
+    def assert_identical(self, instance):
+        for name in self.names:
+            pd.testing.assert_series_equal(
+                urbs.get_entity(instance, name),
+                baseline_get_entity(instance, name))
+
+    def test_values_and_duals(self):
+        self.assert_identical(small_model())
+
+    def test_missing_dual_raises_key_error(self):
+        m = small_model()
+        del m.dual[m.res_flow[3, 'Mid']]
+        with self.assertRaises(KeyError):
+            baseline_get_entity(m, 'res_flow')
+        with self.assertRaises(KeyError):
+            urbs.get_entity(m, 'res_flow')
+
+    def test_loaded_solution_arrays(self):
+        m = small_model()
+        # all members except m.total are part of the model matrix
+        variables = list(m.flow.values()) + list(m.cap.values())
+        constraints = list(m.res_flow.values()) + [m.def_total]
+        m.solution_arrays = {
+            'primal': np.array([v.value if v.value is not None else np.nan
+                                for v in variables]),
+            'dual': np.array([m.dual[c] for c in constraints]),
+            'objective': 0.0,
+            'variables': variables,
+            'constraints': constraints,
+            'loaded': True}
+        self.assert_identical(m)
+
+        # outdated solution arrays are ignored
+        m.solution_arrays['loaded'] = False
+        m.solution_arrays['primal'] = m.solution_arrays['primal'] + 1
+        self.assert_identical(m)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Tests of result archives written by save
+
+The array encoding of input DataFrames must survive a round trip, and a
+loaded Result must give the same key performance indicators as the model.
+
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import pyomo.core as pyomo
+
+import urbs
+from urbs.result import _arrays_to_frame
+from urbs.saveload import _frame_to_arrays, _result_arrays
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), '..', 'mimo-example.xlsx')
+
+
+def round_trip(df):
+    """Encode df like save, write and read it as .npz and decode it."""
+    arrays, meta = _frame_to_arrays(df, 'frame.commodity')
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    buffer.seek(0)
+    return _arrays_to_frame(np.load(buffer), 'frame.commodity', meta)
+
+
+class FrameRoundTripTest(unittest.TestCase):
+
+    def commodity(self):
+        index = pd.MultiIndex.from_tuples(
+            [('Mid', 'Coal', 'Stock'), ('Mid', 'Elec buy', 'Buy'),
+             ('Mid', 'Elec sell', 'Sell'), ('North', 'Gas', 'Stock')],
+            names=['Site', 'Commodity', 'Type'])
+        return pd.DataFrame({
+            'price': [7.0, '1.25xBuy', '0.8xSell', 0.0],
+            'max': [np.inf, 1e3, np.inf, 50.0],
+            'unit': ['MWh', 'MWh', 'MWh', 'MWh']}, index=index)
+
+    def test_mixed_price_column(self):
+        df = self.commodity()
+        loaded = round_trip(df)
+        self.assertEqual(list(loaded['price']),
+                         [7.0, '1.25xBuy', '0.8xSell', 0.0])
+        self.assertIsInstance(loaded['price'].iloc[0], float)
+        pd.testing.assert_frame_equal(loaded, df)
+
+    def test_numeric_frame(self):
+        df = self.commodity()
+        df['price'] = [7.0, 2.5, 1.0, 0.0]
+        pd.testing.assert_frame_equal(round_trip(df), df)
+
+
+class ResultKpiTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # the model is not solved; all variables get a dummy value instead
+        data = urbs.read_excel(EXAMPLE)
+        cls.prob = urbs.create_model(data, timesteps=range(0, 25), dt=2)
+        for var in cls.prob.component_data_objects(pyomo.Var):
+            var.value = 1.0
+        cls.directory = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_kpis_of_loaded_result(self):
+        filename = os.path.join(self.directory, 'result.npz')
+        urbs.save(self.prob, filename)
+        result = urbs.load(filename)
+        self.assertEqual(result.weight, pyomo.value(self.prob.weight))
+        pd.testing.assert_frame_equal(urbs.get_kpis(result),
+                                      urbs.get_kpis(self.prob))
+
+    def test_weight_of_old_archive(self):
+        names = ['tm', 'cap_pro', 'cap_pro_new', 'tau_pro']
+        arrays, meta = _result_arrays(self.prob, names)
+        del meta['weight']
+        arrays['meta'] = np.array(json.dumps(meta))
+        result = urbs.Result(arrays)
+        self.assertEqual(result.weight, pyomo.value(self.prob.weight))
+
+
+if __name__ == '__main__':
+    unittest.main()
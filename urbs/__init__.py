@@ -0,0 +1,69 @@
+"""urbs: A linear optimisation model for distributed energy systems
+
+urbs minimises total cost for providing energy in form of desired commodities
+(usually electricity) to satisfy a given demand in form of timeseries. The
+model contains commodities (electricity, fossil fuels, renewable energy
+sources, greenhouse gases), processes that convert one commodity to another
+(while emitting greenhouse gases as a secondary output), transmission for
+transporting commodities between sites and storage for saving/retrieving
+commodities.
+
+The package is split into modules for input (input), model building (model,
+modelhelper), solving (solver), result retrieval (pyomoio, output, result),
+reporting (report, saveload) and plotting (plot). All public functions are
+available directly from the package, e.g. urbs.create_model.
+
+"""
+
+from .tracing import (start_tracing, stop_tracing, add_trace_callback,
+                      remove_trace_callback, trace_span, export_trace)
+from .input import read_excel, scaling_factors, scale_data, split_columns
+from .modelhelper import (cost_coefficients, price_coefficients, linear_sum,
+                          annuity_factor, link_tuple, transmission_links,
+                          commodity_balance, dsm_down_time_tuples,
+                          dsm_time_tuples, commodity_subset, price_factor,
+                          com_price_matrix, get_com_price, extract_number_str,
+                          sell_buy_pairs, search_sell_buy_tuple)
+from .model import (create_model, lazy_index, find_violated_constraints,
+                    add_violated_constraints, solve_lazy, find_islands,
+                    split_data, solve_islands, LAZY_CONSTRAINTS, add_hacks)
+# constraint rules, referenced by model instances pickled by earlier versions
+# (see load)
+from .model import (res_vertex_rule, def_dsm_variables_rule,
+                    res_dsm_upward_rule, res_dsm_downward_rule,
+                    res_dsm_maximum_rule, res_dsm_recovery_rule,
+                    res_stock_step_rule, res_stock_total_rule,
+                    res_sell_step_rule, res_sell_total_rule, res_buy_step_rule,
+                    res_buy_total_rule, res_env_step_rule, res_env_total_rule,
+                    def_process_capacity_rule, def_process_input_rule,
+                    def_process_output_rule, def_intermittent_supply_rule,
+                    res_process_throughput_by_capacity_rule,
+                    res_process_throughput_gradient_rule,
+                    res_throughput_by_online_capacity_min_rule,
+                    res_throughput_by_online_capacity_max_rule,
+                    def_partial_process_input_rule,
+                    res_cap_online_by_cap_pro_rule, def_startup_capacity_rule,
+                    res_process_capacity_rule, res_sell_buy_symmetry_rule,
+                    def_transmission_capacity_rule,
+                    def_transmission_output_rule,
+                    res_transmission_input_by_capacity_rule,
+                    res_transmission_capacity_rule, def_storage_state_rule,
+                    def_storage_power_rule, def_storage_capacity_rule,
+                    res_storage_input_by_power_rule,
+                    res_storage_output_by_power_rule,
+                    res_storage_state_by_capacity_rule, res_storage_power_rule,
+                    res_storage_capacity_rule,
+                    res_initial_and_final_storage_state_rule, def_costs_rule,
+                    obj_rule, res_global_co2_limit_rule)
+from .solver import (parse_solver_log, solver_metrics, solve,
+                     solver_metrics_table, model_matrix, HighsDirect,
+                     coefficient_ranges)
+from .result import Result
+from .pyomoio import get_entity, get_entities, list_entities
+from .output import (get_constants, get_timeseries, get_timeseries_batch,
+                     MARGINAL_COST_LIMITS, get_marginal_costs, KPI_UNITS,
+                     get_kpis)
+from .report import get_report_tables, report, report_store, read_store_table
+from .plot import (COLORS, sort_plot_elements, downsample, plot, get_plot_data,
+                   plot_data, result_figures, to_color)
+from .saveload import solution_index, solution_result, save, load
@@ -0,0 +1,222 @@
+"""urbs input: read and rescale input data
+
+read_excel reads an input spreadsheet into a dict of DataFrames;
+scaling_factors and scale_data rescale it to other power and cost units.
+
+"""
+
+import math
+import numpy as np
+import pandas as pd
+from xlrd import XLRDError
+
+from .tracing import _traced
+from .modelhelper import annuity_factor, price_factor
+
+
+@_traced('read_excel')
+def read_excel(filename):
+    """Read Excel input file and prepare URBS input dict.
+
+    Reads an Excel spreadsheet that adheres to the structure shown in
+    mimo-example.xlsx. Two preprocessing steps happen here:
+    1. Column titles in 'Demand' and 'SupIm' are split, so that
+    'Site.Commodity' becomes the MultiIndex column ('Site', 'Commodity').
+    2. The attribute 'annuity-factor' is derived here from the columns 'wacc'
+    and 'depreciation' for 'Process', 'Transmission' and 'Storage'.
+
+    Args:
+        filename: filename to an Excel spreadsheet with the required sheets
+            'Commodity', 'Process', 'Transmission', 'Storage', 'Demand' and
+            'SupIm'.
+
+    Returns:
+        a dict of 6 DataFrames
+
+    Example:
+        >>> data = read_excel('mimo-example.xlsx')
+        >>> data['hacks'].loc['Global CO2 limit', 'Value']
+        150000000
+    """
+    with pd.ExcelFile(filename) as xls:
+        commodity = (
+            xls.parse('Commodity').set_index(['Site', 'Commodity', 'Type']))
+        process = xls.parse('Process').set_index(['Site', 'Process'])
+        process_commodity = (
+            xls.parse('Process-Commodity')
+               .set_index(['Process', 'Commodity', 'Direction']))
+        transmission = (
+            xls.parse('Transmission')
+               .set_index(['Site In', 'Site Out', 'Transmission','Commodity']))
+        storage = (
+            xls.parse('Storage').set_index(['Site', 'Storage', 'Commodity']))
+        demand = xls.parse('Demand').set_index(['t'])
+        supim = xls.parse('SupIm').set_index(['t'])
+        buy_sell_price = xls.parse('Buy-Sell-Price').set_index(['t'])
+        dsm = xls.parse('DSM').set_index(['Site', 'Commodity']) #Demand Side Management
+        try:
+            hacks = xls.parse('Hacks').set_index(['Name'])
+        except XLRDError:
+            hacks = None
+
+    # prepare input data
+    # split columns by dots '.', so that 'DE.Elec' becomes the two-level
+    # column index ('DE', 'Elec')
+    demand.columns = split_columns(demand.columns, '.')
+    supim.columns = split_columns(supim.columns, '.')
+    buy_sell_price.columns = split_columns(buy_sell_price.columns, '.')
+
+    # parse price factors of timeseries-based commodity prices once, so that
+    # e.g. '1.25xBuy' yields the factor 1.25 (NaN for fixed prices)
+    commodity['price-factor'] = commodity['price'].apply(price_factor)
+
+    # derive annuity factor from WACC and depreciation periods
+    process['annuity-factor'] = annuity_factor(
+        process['depreciation'], process['wacc'])
+    transmission['annuity-factor'] = annuity_factor(
+        transmission['depreciation'], transmission['wacc'])
+    storage['annuity-factor'] = annuity_factor(
+        storage['depreciation'], storage['wacc'])
+
+    data = {
+        'commodity': commodity,
+        'process': process,
+        'process_commodity': process_commodity,
+        'transmission': transmission,
+        'storage': storage,
+        'demand': demand,
+        'supim': supim,
+        'buy_sell_price': buy_sell_price,
+        'dsm': dsm}
+    if hacks is not None:
+        data['hacks'] = hacks
+
+    # sort nested indexes to make direct assignments work, cf
+    # http://pandas.pydata.org/pandas-docs/stable/indexing.html#the-need-for-sortedness-with-multiindex
+    for key in data:
+        if isinstance(data[key].index, pd.core.index.MultiIndex):
+            data[key].sortlevel(inplace=True)
+    return data
+
+# Scaling
+
+# input columns by unit: 'power' columns hold absolute power/energy amounts
+# (MW, MWh, t) and are divided by the power unit; 'cost' columns hold costs
+# per power/energy amount (EUR/MW, EUR/MWh) and are multiplied by the power
+# unit and divided by the cost unit
+_SCALED_COLUMNS = {
+    'commodity': {
+        'power': ['max', 'maxperstep'],
+        'cost': ['price']},
+    'process': {
+        'power': ['inst-cap', 'cap-lo', 'cap-up'],
+        'cost': ['inv-cost', 'fix-cost', 'var-cost', 'startup-cost']},
+    'transmission': {
+        'power': ['inst-cap', 'cap-lo', 'cap-up'],
+        'cost': ['inv-cost', 'fix-cost', 'var-cost']},
+    'storage': {
+        'power': ['inst-cap-c', 'cap-lo-c', 'cap-up-c',
+                  'inst-cap-p', 'cap-lo-p', 'cap-up-p'],
+        'cost': ['inv-cost-p', 'inv-cost-c', 'fix-cost-p', 'fix-cost-c',
+                 'var-cost-p', 'var-cost-c']},
+    'dsm': {
+        'power': ['cap-max-up', 'cap-max-do'],
+        'cost': []}}
+
+
+def _engineering_unit(values):
+    """Return the power of 1000 closest below the median of values."""
+    values = np.abs(np.asarray(values, dtype=float))
+    values = values[np.isfinite(values) & (values > 0)]
+    if not len(values):
+        return 1.0
+    return 10.0 ** (3 * math.floor(math.log10(np.median(values)) / 3))
+
+
+def scaling_factors(data):
+    """Derive power and cost units for rescaling from the input data.
+
+    The power unit is chosen as a power of 1000 (e.g. 1e3 to switch from MW
+    to GW) so that typical demands and capacities become numbers around 1 to
+    1000. The cost unit is chosen likewise (e.g. 1e3 for kEUR) for the cost
+    coefficients per rescaled power unit.
+
+    Args:
+        data: urbs input dict, as returned by read_excel
+
+    Returns:
+        a dict {'power': power unit, 'cost': cost unit}
+    """
+    def columns(unit):
+        for key, units in _SCALED_COLUMNS.items():
+            for column in units[unit]:
+                if column in data[key].columns:
+                    yield pd.to_numeric(data[key][column], errors='coerce')
+
+    power = _engineering_unit(np.concatenate(
+        [data['demand'].values.ravel()] +
+        [col.values for col in columns('power')]))
+    cost = _engineering_unit(np.concatenate(
+        [col.values * power for col in columns('cost')] +
+        [data['buy_sell_price'].values.ravel() * power]))
+    return {'power': power, 'cost': cost}
+
+
+def scale_data(data, power, cost):
+    """Return a copy of the input data, rescaled to new power and cost units.
+
+    Args:
+        data: urbs input dict, as returned by read_excel
+        power: power unit, e.g. 1e3 to rescale MW to GW
+        cost: cost unit, e.g. 1e3 to rescale EUR to kEUR
+
+    Returns:
+        a rescaled copy of the input dict
+    """
+    scaled = dict((key, df.copy()) for key, df in data.items())
+
+    for key, units in _SCALED_COLUMNS.items():
+        df = scaled[key]
+        for column in units['power']:
+            if column in df.columns:
+                df[column] = df[column] / power
+        for column in units['cost']:
+            if column in df.columns:
+                # leave timeseries-based prices (e.g. '1.25xBuy') untouched;
+                # their timeseries are scaled below
+                df[column] = df[column].apply(
+                    lambda x: x * power / cost
+                    if isinstance(x, (float, int, np.number)) else x)
+
+    scaled['demand'] = scaled['demand'] / power
+    scaled['buy_sell_price'] = scaled['buy_sell_price'] * power / cost
+    if 'hacks' in scaled:
+        hacks = scaled['hacks']
+        if 'Global CO2 limit' in hacks.index:
+            hacks.loc['Global CO2 limit', 'Value'] /= power
+    return scaled
+
+
+def split_columns(columns, sep='.'):
+    """Split columns by separator into MultiIndex.
+
+    Given a list of column labels containing a separator string (default: '.'),
+    derive a MulitIndex that is split at the separator string.
+
+    Args:
+        columns: list of column labels, containing the separator string
+        sep: the separator string (default: '.')
+
+    Returns:
+        a MultiIndex corresponding to input, with levels split at separator
+
+    Example:
+        >>> split_columns(['DE.Elec', 'MA.Elec', 'NO.Wind'])
+        MultiIndex(levels=[['DE', 'MA', 'NO'], ['Elec', 'Wind']],
+                   labels=[[0, 1, 2], [0, 0, 1]])
+
+    """
+    if len(columns) == 0:
+        return columns
+    column_tuples = [tuple(col.split('.')) for col in columns]
+    return pd.MultiIndex.from_tuples(column_tuples)
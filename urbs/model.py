@@ -0,0 +1,1503 @@
+"""urbs model builder: create_model and its constraint rules
+
+Also contains the iterative solution with lazy constraints (solve_lazy) and
+the decomposition into independent network islands (solve_islands).
+
+"""
+
+import math
+import numpy as np
+import pyomo.core as pyomo
+import warnings
+from datetime import datetime
+from itertools import chain
+
+from .tracing import _traced, trace_span
+from .input import scale_data, scaling_factors
+from .modelhelper import (com_price_matrix, commodity_balance,
+                          commodity_subset, cost_coefficients,
+                          dsm_down_time_tuples, dsm_time_tuples, linear_sum,
+                          link_tuple, price_coefficients, sell_buy_pairs,
+                          transmission_links)
+from .pyomoio import _entity_values
+
+
+@_traced('create_model')
+def create_model(data, timesteps=None, dt=1, dual=False, scale=False,
+                 lazy=()):
+    """Create a pyomo ConcreteModel URBS object from given input data.
+
+    Args:
+        data: a dict of 6 DataFrames with the keys 'commodity', 'process',
+            'transmission', 'storage', 'demand' and 'supim'.
+        timesteps: optional list of timesteps, default: demand timeseries
+        dt: timestep duration in hours (default: 1)
+        dual: set True to add dual variables to model (slower); default: False
+        scale: set True to rescale power and cost units (e.g. to GW and kEUR)
+            automatically, or pass a dict {'power': ..., 'cost': ...} of
+            explicit unit factors; default: False (no scaling). Results and
+            duals are unscaled transparently by get_entity.
+        lazy: optional list of constraint names (see LAZY_CONSTRAINTS) that
+            are created without rows; violated rows are added iteratively by
+            solve_lazy; default: () (all rows are created)
+        
+    Returns:
+        a pyomo ConcreteModel object
+    """
+    m = pyomo.ConcreteModel()    
+    m.name = 'URBS'
+    m.created = datetime.now().strftime('%Y%m%dT%H%M')
+    
+    # Optional
+    if not timesteps:
+        timesteps = data['demand'].index.tolist()
+
+    # Scaling
+    # =======
+    # all power/energy quantities are divided by scale['power'], all costs by
+    # scale['cost']; the model then operates on the rescaled input data
+    if scale is True:
+        scale = scaling_factors(data)
+    elif not scale:
+        scale = {'power': 1.0, 'cost': 1.0}
+    if scale['power'] != 1 or scale['cost'] != 1:
+        data = scale_data(data, scale['power'], scale['cost'])
+    m.scale = scale
+
+    # lazily generated constraint families
+    unknown = set(lazy) - set(LAZY_CONSTRAINTS)
+    if unknown:
+        raise ValueError("Unknown lazy constraints {}".format(sorted(unknown)))
+    m.lazy_constraints = list(lazy)
+
+    # Preparations
+    # ============
+    # Data import. Syntax to access a value within equation definitions looks
+    # like this:
+    #
+    #     m.storage.loc[site, storage, commodity][attribute]
+    #
+    m.commodity = data['commodity']
+    m.process = data['process']
+    m.process_commodity = data['process_commodity']
+    m.transmission = data['transmission']
+    m.storage = data['storage']
+    m.demand = data['demand']
+    m.supim = data['supim']
+    m.buy_sell_price = data['buy_sell_price']
+    m.timesteps = timesteps
+    m.dsm = data['dsm']  #Demand Side Management
+
+    # undirected transmission links: both directions of a line share one
+    # capacity, derived from the (directed) Transmission sheet
+    m.transmission_link = transmission_links(m.transmission)
+
+    # process input/output ratios
+    m.r_in = m.process_commodity.xs('In', level='Direction')['ratio']
+    m.r_out = m.process_commodity.xs('Out', level='Direction')['ratio']
+    
+    # input ratios for partial efficiencies
+    # only keep those entries whose values are
+    # a) positive and 
+    # b) numeric (implicitely, as NaN or NV compare false against 0) 
+    m.r_in_min_fraction = m.process_commodity.xs('In', level='Direction')['ratio-min']
+    m.r_in_min_fraction = m.r_in_min_fraction[m.r_in_min_fraction > 0]
+
+    # commodity prices of buy/sell commodities as a (timestep x tuple) matrix,
+    # shared by the Revenue and Purchase costs and reporting
+    m.com_price, m.com_price_tm, m.com_price_tuples = com_price_matrix(
+        m.commodity, m.buy_sell_price, m.timesteps[1:])
+    
+	# Sets
+    # ====
+    # Syntax: m.{name} = Set({domain}, initialize={values})
+    # where name: set name
+    #       domain: set domain for tuple sets, a cartesian set product
+    #       values: set values, a list or array of element tuples
+
+    # generate ordered time step sets
+    m.t = pyomo.Set(
+        initialize=m.timesteps,
+        ordered=True,
+        doc='Set of timesteps')
+
+    # modelled (i.e. excluding init time step for storage) time steps
+    m.tm = pyomo.Set(
+        within=m.t,
+        initialize=m.timesteps[1:],
+        ordered=True,
+        doc='Set of modelled timesteps')
+
+    # modelled Demand Side Management time steps (downshift):
+    # downshift effective in tt to compensate for upshift in t
+    m.tt = pyomo.Set(
+        within=m.t, 
+        initialize=m.timesteps[1:],
+        ordered=True,
+        doc='Set of additional DSM time steps')
+
+    # site (e.g. north, middle, south...)
+    m.sit = pyomo.Set(
+        initialize=m.commodity.index.get_level_values('Site').unique(),
+        doc='Set of sites')
+
+    # commodity (e.g. solar, wind, coal...)
+    m.com = pyomo.Set(
+        initialize=m.commodity.index.get_level_values('Commodity').unique(),
+        doc='Set of commodities')
+
+    # commodity type (i.e. SupIm, Demand, Stock, Env)
+    m.com_type = pyomo.Set(
+        initialize=m.commodity.index.get_level_values('Type').unique(),
+        doc='Set of commodity types')
+
+    # process (e.g. Wind turbine, Gas plant, Photovoltaics...)
+    m.pro = pyomo.Set(
+        initialize=m.process.index.get_level_values('Process').unique(),
+        doc='Set of conversion processes')
+
+    # tranmission (e.g. hvac, hvdc, pipeline...)
+    m.tra = pyomo.Set(
+        initialize=m.transmission.index.get_level_values('Transmission').unique(),
+        doc='Set of transmission technologies')
+
+    # storage (e.g. hydrogen, pump storage)
+    m.sto = pyomo.Set(
+        initialize=m.storage.index.get_level_values('Storage').unique(),
+        doc='Set of storage technologies')
+
+    # cost_type
+    m.cost_type = pyomo.Set(
+        initialize=['Inv', 'Fix', 'Var', 'Fuel','Revenue','Purchase','Startup'],
+        doc='Set of cost types (hard-coded)')
+
+    # tuple sets
+    m.com_tuples = pyomo.Set(
+        within=m.sit*m.com*m.com_type,
+        initialize=m.commodity.index,
+        doc='Combinations of defined commodities, e.g. (Mid,Elec,Demand)')
+    m.pro_tuples = pyomo.Set(
+        within=m.sit*m.pro,
+        initialize=m.process.index,
+        doc='Combinations of possible processes, e.g. (North,Coal plant)')
+    m.tra_tuples = pyomo.Set(
+        within=m.sit*m.sit*m.tra*m.com,
+        initialize=m.transmission.index,
+        doc='Combinations of possible transmission, e.g. (South,Mid,hvac,Elec)')
+    m.tra_link_tuples = pyomo.Set(
+        within=m.sit*m.sit*m.tra*m.com,
+        initialize=m.transmission_link.index,
+        doc='Undirected transmission links, e.g. (Mid,South,hvac,Elec)')
+    m.sto_tuples = pyomo.Set(
+        within=m.sit*m.sto*m.com,
+        initialize=m.storage.index,
+        doc='Combinations of possible storage by site, e.g. (Mid,Bat,Elec)')
+    m.dsm_site_tuples = pyomo.Set(
+        within=m.sit*m.com,
+        initialize=m.dsm.index,
+        doc='Combinations of possible dsm by site, e.g. (Mid, Elec)')
+    m.dsm_down_tuples = pyomo.Set(
+        within=m.tm*m.tm*m.sit*m.com,
+        initialize=[(t, tt, site, commodity)
+                    for (t,tt, site, commodity) in dsm_down_time_tuples(m.timesteps[1:], m.dsm_site_tuples, m)],
+        doc='Combinations of possible dsm_down combinations, e.g. (5001,5003,Mid,Elec)')
+
+
+    # process input/output
+    m.pro_input_tuples = pyomo.Set(
+        within=m.sit*m.pro*m.com,
+        initialize=[(site, process, commodity)
+                    for (site, process) in m.pro_tuples
+                    for (pro, commodity) in m.r_in.index
+                    if process == pro],
+        doc='Commodities consumed by process by site, e.g. (Mid,PV,Solar)')
+    m.pro_output_tuples = pyomo.Set(
+        within=m.sit*m.pro*m.com,
+        initialize=[(site, process, commodity)
+                    for (site, process) in m.pro_tuples
+                    for (pro, commodity) in m.r_out.index
+                    if process == pro],
+        doc='Commodities produced by process by site, e.g. (Mid,PV,Elec)')
+    
+    # process tuples for startup & partial feature
+    m.pro_partial_tuples = pyomo.Set(
+        within=m.sit*m.pro,
+        initialize=[(site, process)
+                    for (site, process) in m.pro_tuples
+                    for (pro, _) in m.r_in_min_fraction.index
+                    if process == pro],
+        doc='Processes with partial input')
+    
+    m.pro_partial_input_tuples = pyomo.Set(
+        within=m.sit*m.pro*m.com,
+        initialize=[(site, process, commodity)
+                    for (site, process) in m.pro_partial_tuples
+                    for (pro, commodity) in m.r_in_min_fraction.index
+                    if process == pro],
+        doc='Commodities with partial input ratio, e.g. (Mid,Coal PP,Coal)')
+
+    # process pairs for buy/sell symmetry
+    m.pro_sell_buy_tuples = pyomo.Set(
+        within=m.sit*m.pro*m.pro,
+        initialize=sell_buy_pairs(
+            m.process, m.process_commodity,
+            commodity_subset(m.com_tuples, 'Buy'),
+            commodity_subset(m.com_tuples, 'Sell')),
+        doc='Buy process with its complementary sell process by site, '
+            'e.g. (Mid,Elec buy,Elec sell)')
+
+    # commodity type subsets
+    m.com_supim = pyomo.Set(
+        within=m.com,
+        initialize=commodity_subset(m.com_tuples, 'SupIm'),
+        doc='Commodities that have intermittent (timeseries) input')
+    m.com_stock = pyomo.Set(
+        within=m.com,
+        initialize=commodity_subset(m.com_tuples, 'Stock'),
+        doc='Commodities that can be purchased at some site(s)')
+    m.com_sell = pyomo.Set(
+       within=m.com,
+       initialize=commodity_subset(m.com_tuples, 'Sell'),
+       doc='Commodities that can be sold')
+    m.com_buy = pyomo.Set(
+        within=m.com,
+        initialize=commodity_subset(m.com_tuples, 'Buy'),
+        doc='Commodities that can be purchased')
+    m.com_demand = pyomo.Set(
+        within=m.com,
+        initialize=commodity_subset(m.com_tuples, 'Demand'),
+        doc='Commodities that have a demand (implies timeseries)')
+    m.com_env = pyomo.Set(
+        within=m.com,
+        initialize=commodity_subset(m.com_tuples, 'Env'),
+        doc='Commodities that (might) have a maximum creation limit')
+
+    # Parameters
+
+    # weight = length of year (hours) / length of simulation (hours)
+    # weight scales costs and emissions from length of simulation to a full
+    # year, making comparisons among cost types (invest is annualized, fixed
+    # costs are annual by default, variable costs are scaled by weight) and
+    # among different simulation durations meaningful.
+    m.weight = pyomo.Param(
+        initialize=float(8760) / (len(m.tm) * dt),
+        doc='Pre-factor for variable costs and emissions for an annual result')
+
+    # dt = spacing between timesteps. Required for storage equation that
+    # converts between energy (storage content, e_sto_con) and power (all other
+    # quantities that start with "e_")
+    m.dt = pyomo.Param(
+        initialize=dt,
+        doc='Time step duration (in hours), default: 1')
+
+    # Variables
+
+    # costs
+    m.costs = pyomo.Var(
+        m.cost_type,
+        within=pyomo.Reals,
+        doc='Costs by type (EUR/a)')
+
+    # commodity
+    m.e_co_stock = pyomo.Var(
+        m.tm, m.com_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Use of stock commodity source (MW) per timestep')
+    m.e_co_sell = pyomo.Var(
+        m.tm, m.com_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Use of sell commodity source (MW) per timestep')
+    m.e_co_buy = pyomo.Var(
+       m.tm, m.com_tuples,
+       within=pyomo.NonNegativeReals,
+       doc='Use of buy commodity source (MW) per timestep')
+
+    # process
+    m.cap_pro = pyomo.Var(
+        m.pro_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Total process capacity (MW)')
+    m.cap_pro_new = pyomo.Var(
+        m.pro_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='New process capacity (MW)')
+    m.tau_pro = pyomo.Var(
+        m.t, m.pro_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Power flow (MW) through process')
+    m.e_pro_in = pyomo.Var(
+        m.tm, m.pro_tuples, m.com,
+        within=pyomo.NonNegativeReals,
+        doc='Power flow of commodity into process (MW) per timestep')
+    m.e_pro_out = pyomo.Var(
+        m.tm, m.pro_tuples, m.com,
+        within=pyomo.NonNegativeReals,
+        doc='Power flow out of process (MW) per timestep')
+        
+    m.cap_online = pyomo.Var(
+        m.t, m.pro_partial_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Online capacity (MW) of process per timestep')
+    m.startup_pro = pyomo.Var(
+        m.tm, m.pro_partial_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Started capacity (MW) of process per timestep')
+
+    # transmission
+    m.cap_tra = pyomo.Var(
+        m.tra_link_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Total transmission capacity (MW)')
+    m.cap_tra_new = pyomo.Var(
+        m.tra_link_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='New transmission capacity (MW)')
+    m.e_tra_in = pyomo.Var(
+        m.tm, m.tra_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Power flow into transmission line (MW) per timestep')
+    m.e_tra_out = pyomo.Var(
+        m.tm, m.tra_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Power flow out of transmission line (MW) per timestep')
+        
+    # storage
+    m.cap_sto_c = pyomo.Var(
+        m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Total storage size (MWh)')
+    m.cap_sto_c_new = pyomo.Var(
+        m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='New storage size (MWh)')
+    m.cap_sto_p = pyomo.Var(
+        m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Total storage power (MW)')
+    m.cap_sto_p_new = pyomo.Var(
+        m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='New  storage power (MW)')
+    m.e_sto_in = pyomo.Var(
+        m.tm, m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Power flow into storage (MW) per timestep')
+    m.e_sto_out = pyomo.Var(
+        m.tm, m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Power flow out of storage (MW) per timestep')
+    m.e_sto_con = pyomo.Var(
+        m.t, m.sto_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='Energy content of storage (MWh) in timestep')
+        
+    # demand side management
+    m.dsm_up = pyomo.Var(
+        m.tm, m.dsm_site_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='DSM upshift')
+    m.dsm_down = pyomo.Var(
+        m.dsm_down_tuples,
+        within=pyomo.NonNegativeReals,
+        doc='DSM downshift')
+
+    # Equation declarations
+    # equation bodies are defined in separate functions, referred to here by 
+    # their name in the "rule" keyword.
+    
+    # commodity
+    m.res_vertex = pyomo.Constraint(
+        m.tm, m.com_tuples,
+        rule=res_vertex_rule,
+        doc='storage + transmission + process + source + buy - sell == demand')
+    m.res_stock_step = pyomo.Constraint(
+        m.tm, m.com_tuples,
+        rule=res_stock_step_rule,
+        doc='stock commodity input per step <= commodity.maxperstep')
+    m.res_stock_total = pyomo.Constraint(
+        m.com_tuples,
+        rule=res_stock_total_rule,
+        doc='total stock commodity input <= commodity.max')
+    m.res_sell_step = pyomo.Constraint(
+       m.tm, m.com_tuples,
+       rule=res_sell_step_rule,
+       doc='sell commodity output per step <= commodity.maxperstep')
+    m.res_sell_total = pyomo.Constraint(
+        m.com_tuples,
+        rule=res_sell_total_rule,
+        doc='total sell commodity output <= commodity.max')
+    m.res_buy_step = pyomo.Constraint(
+        m.tm, m.com_tuples,
+        rule=res_buy_step_rule,
+        doc='buy commodity output per step <= commodity.maxperstep')
+    m.res_buy_total = pyomo.Constraint(
+       m.com_tuples,
+       rule=res_buy_total_rule,
+       doc='total buy commodity output <= commodity.max')
+    m.res_env_step = pyomo.Constraint(
+        m.tm, m.com_tuples,
+        rule=res_env_step_rule,
+        doc='environmental output per step <= commodity.maxperstep')
+    m.res_env_total = pyomo.Constraint(
+        m.com_tuples,
+        rule=res_env_total_rule,
+        doc='total environmental commodity output <= commodity.max')
+
+    # process
+    m.def_process_capacity = pyomo.Constraint(
+        m.pro_tuples,
+        rule=def_process_capacity_rule,
+        doc='total process capacity = inst-cap + new capacity')
+    m.def_process_input = pyomo.Constraint(
+        m.tm, m.pro_input_tuples - m.pro_partial_input_tuples,
+        rule=def_process_input_rule,
+        doc='process input = process throughput * input ratio')
+    m.def_process_output = pyomo.Constraint(
+        m.tm, m.pro_output_tuples,
+        rule=def_process_output_rule,
+        doc='process output = process throughput * output ratio')
+    m.def_intermittent_supply = pyomo.Constraint(
+        m.tm, m.pro_input_tuples,
+        rule=def_intermittent_supply_rule,
+        doc='process output = process capacity * supim timeseries')
+    m.res_process_throughput_by_capacity = pyomo.Constraint(
+        *lazy_index(m, 'res_process_throughput_by_capacity', m.tm, m.pro_tuples),
+        rule=res_process_throughput_by_capacity_rule,
+        doc='process throughput <= total process capacity')
+    m.res_process_throughput_gradient = pyomo.Constraint(
+        m.tm, m.pro_tuples,
+        rule=res_process_throughput_gradient_rule,
+        doc='absolut process throughput gradient <= maximal gradient')
+    m.res_process_capacity = pyomo.Constraint(
+        m.pro_tuples,
+        rule=res_process_capacity_rule,
+        doc='process.cap-lo <= total process capacity <= process.cap-up')
+    m.res_sell_buy_symmetry = pyomo.Constraint(
+        m.pro_sell_buy_tuples,
+        rule=res_sell_buy_symmetry_rule,
+        doc='total power connection capacity must be symmetric in both directions')
+
+    m.res_throughput_by_online_capacity_min = pyomo.Constraint(
+        m.tm, m.pro_partial_tuples,
+        rule=res_throughput_by_online_capacity_min_rule,
+        doc='cap_online * min-fraction <= tau_pro')
+    m.res_throughput_by_online_capacity_max = pyomo.Constraint(
+        m.tm, m.pro_partial_tuples,
+        rule=res_throughput_by_online_capacity_max_rule,
+        doc='tau_pro <= cap_online')
+    m.def_partial_process_input = pyomo.Constraint(
+        m.tm, m.pro_partial_input_tuples,
+        rule=def_partial_process_input_rule,
+        doc='e_pro_in = cap_online * min_fraction * (r - R) / (1 - min_fraction)'
+                        '+ tau_pro * (R - min_fraction * r) / (1 - min_fraction)')
+    m.res_cap_online_by_cap_pro = pyomo.Constraint(
+        m.tm, m.pro_partial_tuples,
+        rule=res_cap_online_by_cap_pro_rule,
+        doc='online capacity <= process capacity')
+    m.def_startup_capacity = pyomo.Constraint(
+        m.tm, m.pro_partial_tuples,
+        rule=def_startup_capacity_rule,
+        doc='startup_capacity[t] >= cap_online[t] - cap_online[t-1]')
+
+    # transmission
+    m.def_transmission_capacity = pyomo.Constraint(
+        m.tra_link_tuples,
+        rule=def_transmission_capacity_rule,
+        doc='total transmission capacity = inst-cap + new capacity')
+    m.def_transmission_output = pyomo.Constraint(
+        m.tm, m.tra_tuples,
+        rule=def_transmission_output_rule,
+        doc='transmission output = transmission input * efficiency')
+    m.res_transmission_input_by_capacity = pyomo.Constraint(
+        *lazy_index(m, 'res_transmission_input_by_capacity',
+                    m.tm, m.tra_tuples),
+        rule=res_transmission_input_by_capacity_rule,
+        doc='transmission input <= total transmission capacity')
+    m.res_transmission_capacity = pyomo.Constraint(
+        m.tra_link_tuples,
+        rule=res_transmission_capacity_rule,
+        doc='transmission.cap-lo <= total transmission capacity <= '
+            'transmission.cap-up')
+
+    # storage
+    m.def_storage_state = pyomo.Constraint(
+        m.tm, m.sto_tuples,
+        rule=def_storage_state_rule,
+        doc='storage[t] = storage[t-1] + input - output')
+    m.def_storage_power = pyomo.Constraint(
+        m.sto_tuples,
+        rule=def_storage_power_rule,
+        doc='storage power = inst-cap + new power')
+    m.def_storage_capacity = pyomo.Constraint(
+        m.sto_tuples,
+        rule=def_storage_capacity_rule,
+        doc='storage capacity = inst-cap + new capacity')
+    m.res_storage_input_by_power = pyomo.Constraint(
+        *lazy_index(m, 'res_storage_input_by_power', m.tm, m.sto_tuples),
+        rule=res_storage_input_by_power_rule,
+        doc='storage input <= storage power')
+    m.res_storage_output_by_power = pyomo.Constraint(
+        *lazy_index(m, 'res_storage_output_by_power', m.tm, m.sto_tuples),
+        rule=res_storage_output_by_power_rule,
+        doc='storage output <= storage power')
+    m.res_storage_state_by_capacity = pyomo.Constraint(
+        *lazy_index(m, 'res_storage_state_by_capacity', m.t, m.sto_tuples),
+        rule=res_storage_state_by_capacity_rule,
+        doc='storage content <= storage capacity')
+    m.res_storage_power = pyomo.Constraint(
+        m.sto_tuples,
+        rule=res_storage_power_rule,
+        doc='storage.cap-lo-p <= storage power <= storage.cap-up-p')
+    m.res_storage_capacity = pyomo.Constraint(
+        m.sto_tuples,
+        rule=res_storage_capacity_rule,
+        doc='storage.cap-lo-c <= storage capacity <= storage.cap-up-c')
+    m.res_initial_and_final_storage_state = pyomo.Constraint(
+        m.t, m.sto_tuples,
+        rule=res_initial_and_final_storage_state_rule,
+        doc='storage content initial == and final >= storage.init * capacity')
+
+    # costs
+    m.def_costs = pyomo.Constraint(
+        m.cost_type,
+        rule=def_costs_rule,
+        doc='main cost function by cost type')
+    m.obj = pyomo.Objective(
+        rule=obj_rule,
+        sense=pyomo.minimize,
+        doc='minimize(cost = sum of all cost types)')
+
+    # demand side management
+    m.def_dsm_variables = pyomo.Constraint(
+        m.tm, m.dsm_site_tuples, 
+        rule=def_dsm_variables_rule,
+        doc='DSMup * efficiency factor n == DSMdo')	
+
+    m.res_dsm_upward = pyomo.Constraint(
+        m.tm, m.dsm_site_tuples, 
+        rule=res_dsm_upward_rule,
+        doc='DSMup <= Cup (threshold capacity of DSMup)')
+
+    m.res_dsm_downward = pyomo.Constraint(
+        m.tm, m.dsm_site_tuples, 
+        rule=res_dsm_downward_rule,
+        doc='DSMdo <= Cdo (threshold capacity of DSMdo)')
+
+    m.res_dsm_maximum = pyomo.Constraint(
+        m.tm, m.dsm_site_tuples, 
+        rule=res_dsm_maximum_rule,
+        doc='DSMup + DSMdo <= max(Cup,Cdo)')
+
+    m.res_dsm_recovery = pyomo.Constraint(
+        m.tm, m.dsm_site_tuples, 
+        rule=res_dsm_recovery_rule,
+        doc='DSMup(t, t + recovery time R) <= Cup * delay time L')
+
+    # possibly: add hack features
+    if 'hacks' in data:
+        m = add_hacks(m, data['hacks'])
+
+    if dual:
+        m.dual = pyomo.Suffix(direction=pyomo.Suffix.IMPORT)
+    return m
+
+
+def lazy_index(m, name, *sets):
+    """Return the index sets for a constraint that is possibly lazy.
+
+    For constraints not listed in m.lazy_constraints, the given sets are
+    returned unchanged. Otherwise, an initially empty subset of their product
+    is added to the model (as component name + '_tuples') and returned, so
+    that the constraint starts without rows.
+
+    Args:
+        m: the model object
+        name: constraint name
+        *sets: index sets of the full constraint, e.g. m.tm, m.sto_tuples
+
+    Returns:
+        a tuple of index sets
+    """
+    if name not in m.lazy_constraints:
+        return sets
+    domain = sets[0]
+    for other in sets[1:]:
+        domain = domain * other
+    index = pyomo.Set(
+        within=domain,
+        dimen=sum(s.dimen for s in sets),
+        initialize=[],
+        doc='Generated rows of {}'.format(name))
+    m.add_component(name + '_tuples', index)
+    return (index,)
+
+
+def _lazy_rows(instance, name):
+    """Return the candidate rows of a lazy constraint and their variables.
+
+    Candidate rows are all flow variable indices within the constraint
+    domain. For each of them, the positions of the flow and capacity
+    variables in flow.values() and cap.values() are stored. The result is
+    cached on the instance, as the variables don't change between solves.
+
+    Args:
+        instance: a urbs model instance
+        name: constraint name (see LAZY_CONSTRAINTS)
+
+    Returns:
+        (rows, flow_positions, cap_positions) tuple of a list of index tuples
+        and two integer arrays
+    """
+    cache = getattr(instance, '_lazy_row_cache', None)
+    if cache is None:
+        cache = instance._lazy_row_cache = {}
+    if name not in cache:
+        flow_name, cap_name, _ = LAZY_CONSTRAINTS[name]
+        flow = getattr(instance, flow_name)
+        cap_positions = dict(
+            (key, position) for position, key in
+            enumerate(getattr(instance, cap_name).keys()))
+        time_set = set(instance.t if name == 'res_storage_state_by_capacity'
+                       else instance.tm)
+
+        rows, flow_positions, cap_index = [], [], []
+        for position, idx in enumerate(flow.keys()):
+            if idx[0] not in time_set:
+                continue
+            cap_key = idx[1:]
+            if cap_name == 'cap_tra':
+                cap_key = link_tuple(*cap_key)
+            rows.append(idx)
+            flow_positions.append(position)
+            cap_index.append(cap_positions[cap_key])
+        cache[name] = (rows, np.array(flow_positions, dtype=int),
+                       np.array(cap_index, dtype=int))
+    return cache[name]
+
+
+def find_violated_constraints(instance, name, tol=1e-6):
+    """Find violated rows of a lazy constraint in a solved model instance.
+
+    The check compares the whole value arrays of the flow and capacity
+    variables (see _lazy_rows) instead of going row by row; only the
+    violated rows are checked for already being generated.
+
+    Args:
+        instance: a solved urbs model instance
+        name: constraint name (see LAZY_CONSTRAINTS)
+        tol: relative tolerance for a violation
+
+    Returns:
+        a list of index tuples of violated, not yet generated rows
+    """
+    flow_name, cap_name, _ = LAZY_CONSTRAINTS[name]
+    rows, flow_positions, cap_positions = _lazy_rows(instance, name)
+    if not rows:
+        return []
+
+    flow = _entity_values(instance, getattr(instance, flow_name))
+    cap = _entity_values(instance, getattr(instance, cap_name))
+    flow = flow[flow_positions]
+    capacity = cap[cap_positions]
+
+    # unset values (NaN) count as violations, so that rows without a valid
+    # solution value are never taken as satisfied
+    violated = ~(flow - capacity <= tol * np.maximum(1, np.abs(capacity)))
+
+    constraint = getattr(instance, name)
+    return [rows[k] for k in np.flatnonzero(violated)
+            if rows[k] not in constraint]
+
+
+def add_violated_constraints(instance, tol=1e-6):
+    """Add violated rows of all lazy constraints to a solved model instance.
+
+    Args:
+        instance: a solved urbs model instance
+        tol: relative tolerance for a violation
+
+    Returns:
+        number of added rows
+    """
+    added = 0
+    for name in instance.lazy_constraints:
+        constraint = getattr(instance, name)
+        index = getattr(instance, name + '_tuples')
+        rule = LAZY_CONSTRAINTS[name][2]
+        for idx in find_violated_constraints(instance, name, tol):
+            index.add(idx)
+            constraint.add(idx, rule(instance, *idx))
+            added += 1
+    return added
+
+
+def solve_lazy(instance, optim, max_iterations=50, tol=1e-6, verbose=False,
+               **kwds):
+    """Solve a model instance with lazy constraints iteratively.
+
+    Solves the reduced model, adds all violated rows of the lazy constraint
+    families and repeats until no row is violated. If a solve does not end
+    optimal (e.g. infeasible, unbounded or at a time limit), its result is
+    returned at once with a warning, as its values are no valid solution;
+    check result.solver.termination_condition like after optim.solve.
+
+    Args:
+        instance: a urbs model instance, created with argument lazy
+        optim: a Pyomo solver object, e.g. SolverFactory('glpk')
+        max_iterations: maximum number of solves (default: 50)
+        tol: relative tolerance for a violation
+        verbose: print the number of added rows after each solve
+        **kwds: keyword arguments are forwarded to optim.solve
+
+    Returns:
+        the solver result of the last solve
+    """
+    for iteration in range(max_iterations):
+        # solution arrays of an earlier HighsDirect solve become outdated
+        if hasattr(instance, 'solution_arrays'):
+            instance.solution_arrays['loaded'] = False
+        with trace_span('solve', iteration=iteration + 1):
+            result = optim.solve(instance, **kwds)
+        termination = str(result.solver.termination_condition)
+        if termination != 'optimal':
+            warnings.warn("solve_lazy: iteration {} terminated with status "
+                          "'{}'".format(iteration + 1, termination))
+            return result
+        added = add_violated_constraints(instance, tol)
+        if verbose:
+            print('Lazy iteration {}: {} violated rows added'.format(
+                iteration + 1, added))
+        if not added:
+            return result
+    warnings.warn("solve_lazy: violated rows left after {} iterations"
+                  .format(max_iterations))
+    return result
+
+
+# Islands
+
+def find_islands(data):
+    """Find groups of sites that can be optimised independently.
+
+    Sites are connected if a transmission tuple links them. Hacks that
+    couple all sites (i.e. a finite 'Global CO2 limit') merge everything
+    into one island.
+
+    Args:
+        data: urbs input dict, as returned by read_excel
+
+    Returns:
+        a list of sorted site lists, one per island
+    """
+    sites = set(data['commodity'].index.get_level_values('Site'))
+    sites.update(data['process'].index.get_level_values('Site'))
+    sites.update(data['storage'].index.get_level_values('Site'))
+
+    # union-find over the transmission graph
+    parent = dict((site, site) for site in sites)
+
+    def root(site):
+        while parent[site] != site:
+            parent[site] = parent[parent[site]]
+            site = parent[site]
+        return site
+
+    for (sin, sout, tra, com) in data['transmission'].index:
+        parent.setdefault(sin, sin)
+        parent.setdefault(sout, sout)
+        parent[root(sin)] = root(sout)
+
+    # shared constraints couple all sites
+    hacks = data.get('hacks')
+    if hacks is not None and 'Global CO2 limit' in hacks.index:
+        if not math.isinf(hacks.loc['Global CO2 limit', 'Value']):
+            return [sorted(parent)]
+
+    islands = {}
+    for site in parent:
+        islands.setdefault(root(site), []).append(site)
+    return sorted(sorted(island) for island in islands.values())
+
+
+def split_data(data, sites):
+    """Return the part of the input data that belongs to the given sites.
+
+    Args:
+        data: urbs input dict, as returned by read_excel
+        sites: list of site names, e.g. an island from find_islands
+
+    Returns:
+        an urbs input dict restricted to sites
+    """
+    sites = list(sites)
+
+    def by_site(df, level='Site'):
+        return df[df.index.get_level_values(level).isin(sites)].copy()
+
+    def by_column_site(df):
+        if len(df.columns) == 0:
+            return df.copy()
+        return df.loc[:, df.columns.get_level_values(0).isin(sites)].copy()
+
+    tra = data['transmission']
+    island = dict(data)
+    island.update({
+        'commodity': by_site(data['commodity']),
+        'process': by_site(data['process']),
+        'transmission': tra[
+            tra.index.get_level_values('Site In').isin(sites) &
+            tra.index.get_level_values('Site Out').isin(sites)].copy(),
+        'storage': by_site(data['storage']),
+        'demand': by_column_site(data['demand']),
+        'supim': by_column_site(data['supim']),
+        'dsm': by_site(data['dsm'])})
+    return island
+
+
+def _solve_island(args):
+    """Build and solve the model of one island (worker of solve_islands).
+
+    Returns:
+        (status, values, duals) tuple with values and duals as dicts
+        {entity name: (list of index tuples, array of values)}
+    """
+    import pyomo.environ
+    from pyomo.opt.base import SolverFactory
+
+    island_data, timesteps, dt, dual, solver = args
+    prob = create_model(island_data, timesteps, dt=dt, dual=dual)
+    with trace_span('solve'):
+        result = SolverFactory(solver).solve(prob)
+    status = str(result.solver.termination_condition)
+
+    values = {}
+    for var in prob.component_objects(pyomo.Var, active=True):
+        values[var.name] = (list(var.keys()), _entity_values(prob, var))
+    duals = {}
+    if dual:
+        # missing duals (e.g. of an infeasible island) become NaN
+        for con in prob.component_objects(pyomo.Constraint, active=True):
+            duals[con.name] = (list(con.keys()), np.array(
+                [prob.dual.get(c) for c in con.values()], dtype=float))
+    return status, values, duals
+
+
+def solve_islands(data, timesteps=None, dt=1, dual=False, solver='glpk',
+                  processes=None):
+    """Solve independent network islands in parallel and merge the results.
+
+    Each island (see find_islands) is built and solved as a separate model in
+    a worker process. The solutions are then loaded into one model of the
+    complete input, which can be passed to report, result_figures etc. as if
+    it had been solved as a whole. Costs are summed over all islands. If an
+    island is not solved to optimality, RuntimeError is raised.
+
+    Args:
+        data: urbs input dict, as returned by read_excel
+        timesteps: optional list of timesteps, default: demand timeseries
+        dt: timestep duration in hours (default: 1)
+        dual: set True to retrieve dual values, too; default: False
+        solver: solver name for SolverFactory (default: 'glpk')
+        processes: number of worker processes; default: number of CPUs
+
+    Returns:
+        a urbs model instance of the complete input with loaded results
+    """
+    import multiprocessing
+
+    if not timesteps:
+        timesteps = data['demand'].index.tolist()
+    timesteps = list(timesteps)
+
+    islands = find_islands(data)
+    jobs = [(split_data(data, island), timesteps, dt, dual, solver)
+            for island in islands]
+    if len(jobs) > 1 and processes != 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_solve_island, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_solve_island(job) for job in jobs]
+
+    # a merged model with partial values would look like a valid solution
+    failed = ['{} ({})'.format(island, status)
+              for island, (status, _, _) in zip(islands, results)
+              if status != 'optimal']
+    if failed:
+        raise RuntimeError("solve_islands: islands not solved to optimality: "
+                           "{}".format(', '.join(failed)))
+
+    # merge the island solutions per entity; the costs of all islands are
+    # summed with math.fsum, which does not depend on the island order
+    values, duals, costs = {}, {}, {}
+    for _, island_values, island_duals in results:
+        for merged, entities in ((values, island_values),
+                                 (duals, island_duals)):
+            for name, (keys, array) in entities.items():
+                items = [(key, value) for key, value in
+                         zip(keys, array.tolist()) if not math.isnan(value)]
+                if name == 'costs' and merged is values:
+                    for cost_type, value in items:
+                        costs.setdefault(cost_type, []).append(value)
+                else:
+                    merged.setdefault(name, {}).update(items)
+
+    # the report and plot functions need a model instance with all sets,
+    # parameters and input data of the complete input, so it is still built
+    # (but not solved) and the merged solution is loaded into it
+    prob = create_model(data, timesteps, dt=dt, dual=dual)
+    for name, entity_values in values.items():
+        getattr(prob, name).set_values(entity_values)
+    prob.costs.set_values(dict(
+        (cost_type, math.fsum(costs.get(cost_type, [])))
+        for cost_type in prob.costs.keys()))
+    for name, entity_duals in duals.items():
+        con = getattr(prob, name)
+        for idx, value in entity_duals.items():
+            prob.dual[con[idx]] = value
+    return prob
+
+
+# Constraints
+
+# commodity
+
+# vertex equation: calculate balance for given commodity and site;
+# contains implicit constraints for process activity, import/export and
+# storage activity (calculated by function commodity_balance);
+# contains implicit constraint for stock commodity source term
+def res_vertex_rule(m, tm, sit, com, com_type):
+    # environmental or supim commodities don't have this constraint (yet)
+    if com in m.com_env:
+        return pyomo.Constraint.Skip
+    if com in m.com_supim:
+        return pyomo.Constraint.Skip
+
+    # helper function commodity_balance calculates balance from input to
+    # and output from processes, storage and transmission.
+    # if power_surplus > 0: production/storage/imports create net positive
+    #                       amount of commodity com
+    # if power_surplus < 0: production/storage/exports consume a net
+    #                       amount of the commodity com
+    power_surplus = - commodity_balance(m, tm, sit, com)
+
+    # if com is a stock commodity, the commodity source term e_co_stock
+    # can supply a possibly negative power_surplus
+    if com in m.com_stock:
+        power_surplus += m.e_co_stock[tm, sit, com, com_type]
+
+    # if com is a sell commodity, the commodity source term e_co_sell
+    # can supply a possibly positive power_surplus
+    if com in m.com_sell:
+        power_surplus -= m.e_co_sell[tm, sit, com, com_type]
+
+    # if com is a buy commodity, the commodity source term e_co_buy
+    # can supply a possibly negative power_surplus
+    if com in m.com_buy:
+        power_surplus += m.e_co_buy[tm, sit, com, com_type]
+
+    # if com is a demand commodity, the power_surplus is reduced by the
+    # demand value; no scaling by m.dt or m.weight is needed here, as this
+    # constraint is about power (MW), not energy (MWh)
+    if com in m.com_demand:
+        try:
+            power_surplus -= m.demand.loc[tm][sit,com]
+        except KeyError:
+            pass
+    # if sit com is a dsm tuple, the power surplus is decreased by the
+    # upshifted demand and increased by the downshifted demand.
+    if (sit, com) in m.dsm_site_tuples:
+        power_surplus -= m.dsm_up[tm,sit,com]
+        power_surplus += sum(m.dsm_down[t,tm,sit,com] 
+                             for t in dsm_time_tuples(
+                                 tm, m.timesteps[1:], 
+                                 m.dsm['delay'].loc[sit,com]))
+    return power_surplus == 0
+
+# demand side management constraints
+# DSMup == DSMdo * efficiency factor n
+def def_dsm_variables_rule(m, tm, sit, com):
+    dsm_down_sum = 0
+    for tt in dsm_time_tuples(tm, m.timesteps[1:], m.dsm['delay'].loc[sit,com]):
+        dsm_down_sum += m.dsm_down[tm,tt,sit,com]
+    return dsm_down_sum == m.dsm_up[tm,sit,com] * m.dsm.loc[sit,com]['eff']
+
+
+# DSMup <= Cup (threshold capacity of DSMup)		
+def res_dsm_upward_rule(m, tm, sit, com):
+    return m.dsm_up[tm,sit,com] <= m.dsm.loc[sit,com]['cap-max-up']
+
+# DSMdo <= Cdo (threshold capacity of DSMdo)
+
+def res_dsm_downward_rule(m, tm, sit, com):
+    dsm_down_sum = 0
+    for t in dsm_time_tuples(tm, m.timesteps[1:], m.dsm['delay'].loc[sit,com]):
+        dsm_down_sum += m.dsm_down[t,tm,sit,com]
+    return dsm_down_sum <= m.dsm.loc[sit,com]['cap-max-do']
+
+# DSMup + DSMdo <= max(Cup,Cdo)
+def res_dsm_maximum_rule(m, tm, sit, com):
+    dsm_down_sum = 0
+    for t in dsm_time_tuples(tm, m.timesteps[1:], m.dsm['delay'].loc[sit,com]):
+        dsm_down_sum += m.dsm_down[t,tm,sit,com]
+
+    max_dsm_limit = max(m.dsm.loc[sit,com]['cap-max-up'], 
+                          m.dsm.loc[sit,com]['cap-max-do'])
+    return m.dsm_up[tm,sit,com] + dsm_down_sum <= max_dsm_limit
+
+
+# DSMup(t, t + recovery time R) <= Cup * delay time L  
+def res_dsm_recovery_rule(m, tm, sit, com):
+    dsm_up_sum = 0
+    for t in range(tm, tm+m.dsm['recov'].loc[sit,com]):
+        dsm_up_sum += m.dsm_up[t,sit,com]
+    return dsm_up_sum <= m.dsm.loc[sit,com]['cap-max-up'] * m.dsm['delay'].loc[sit,com]
+
+# stock commodity purchase == commodity consumption, according to
+# commodity_balance of current (time step, site, commodity);
+# limit stock commodity use per time step
+def res_stock_step_rule(m, tm, sit, com, com_type):
+    if com not in m.com_stock:
+        return pyomo.Constraint.Skip
+    else:
+        return (m.e_co_stock[tm, sit, com, com_type] <=
+                m.commodity.loc[sit, com, com_type]['maxperstep'])
+
+# limit stock commodity use in total (scaled to annual consumption, thanks
+# to m.weight)
+def res_stock_total_rule(m, sit, com, com_type):
+    if com not in m.com_stock:
+        return pyomo.Constraint.Skip
+    else:
+        # calculate total consumption of commodity com
+        total_consumption = 0
+        for tm in m.tm:
+            total_consumption += (
+                m.e_co_stock[tm, sit, com, com_type] * m.dt)
+        total_consumption *= m.weight
+        return (total_consumption <=
+                m.commodity.loc[sit, com, com_type]['max'])
+
+# limit sell commodity use per time step
+def res_sell_step_rule(m, tm, sit, com, com_type):
+    if com not in m.com_sell:
+        return pyomo.Constraint.Skip
+    else:
+        return (m.e_co_sell[tm, sit, com, com_type] <=
+                   m.commodity.loc[sit, com, com_type]['maxperstep'])
+
+# limit sell commodity use in total (scaled to annual consumption, thanks
+# to m.weight)
+def res_sell_total_rule(m, sit, com, com_type):
+    if com not in m.com_sell:
+        return pyomo.Constraint.Skip
+    else:
+        # calculate total sale of commodity com
+        total_consumption = 0
+        for tm in m.tm:
+            total_consumption += (
+                m.e_co_sell[tm, sit, com, com_type] * m.dt)
+        total_consumption *= m.weight
+        return (total_consumption <=
+                  m.commodity.loc[sit, com, com_type]['max'])
+
+# limit buy commodity use per time step
+def res_buy_step_rule(m, tm, sit, com, com_type):
+    if com not in m.com_buy:
+        return pyomo.Constraint.Skip
+    else:
+        return (m.e_co_buy[tm, sit, com, com_type] <=
+                   m.commodity.loc[sit, com, com_type]['maxperstep'])
+
+# limit buy commodity use in total (scaled to annual consumption, thanks
+# to m.weight)
+def res_buy_total_rule(m, sit, com, com_type):
+    if com not in m.com_buy:
+        return pyomo.Constraint.Skip
+    else:
+        # calculate total sale of commodity com
+        total_consumption = 0
+        for tm in m.tm:
+            total_consumption += (
+                m.e_co_buy[tm, sit, com, com_type] * m.dt)
+        total_consumption *= m.weight
+        return (total_consumption <=
+                  m.commodity.loc[sit, com, com_type]['max'])
+
+# environmental commodity creation == - commodity_balance of that commodity
+# used for modelling emissions (e.g. CO2) or other end-of-pipe results of
+# any process activity;
+# limit environmental commodity output per time step
+def res_env_step_rule(m, tm, sit, com, com_type):
+    if com not in m.com_env:
+        return pyomo.Constraint.Skip
+    else:
+        environmental_output = - commodity_balance(m, tm, sit, com)
+        return (environmental_output <=
+                m.commodity.loc[sit, com, com_type]['maxperstep'])
+
+# limit environmental commodity output in total (scaled to annual
+# emissions, thanks to m.weight)
+def res_env_total_rule(m, sit, com, com_type):
+    if com not in m.com_env:
+        return pyomo.Constraint.Skip
+    else:
+        # calculate total creation of environmental commodity com
+        env_output_sum = 0
+        for tm in m.tm:
+            env_output_sum += (- commodity_balance(m, tm, sit, com) * m.dt)
+        env_output_sum *= m.weight
+        return (env_output_sum <=
+                m.commodity.loc[sit, com, com_type]['max'])
+
+# process
+# process capacity == new capacity + existing capacity
+def def_process_capacity_rule(m, sit, pro):
+    return (m.cap_pro[sit, pro] ==
+            m.cap_pro_new[sit, pro] +
+            m.process.loc[sit, pro]['inst-cap'])
+
+# process input power == process throughput * input ratio
+def def_process_input_rule(m, tm, sit, pro, co):
+    return (m.e_pro_in[tm, sit, pro, co] ==
+            m.tau_pro[tm, sit, pro] * m.r_in.loc[pro, co])
+
+# process output power = process throughput * output ratio
+def def_process_output_rule(m, tm, sit, pro, co):
+    return (m.e_pro_out[tm, sit, pro, co] ==
+            m.tau_pro[tm, sit, pro] * m.r_out.loc[pro, co])
+
+# process input (for supim commodity) = process capacity * timeseries
+def def_intermittent_supply_rule(m, tm, sit, pro, coin):
+    if coin in m.com_supim:
+        return (m.e_pro_in[tm, sit, pro, coin] <=
+                m.cap_pro[sit, pro] * m.supim.loc[tm][sit, coin])
+    else:
+        return pyomo.Constraint.Skip
+
+# process throughput <= process capacity
+def res_process_throughput_by_capacity_rule(m, tm, sit, pro):
+    return (m.tau_pro[tm, sit, pro] <= m.cap_pro[sit, pro])
+
+# absolute process throughput gradient <= maximal gradient
+def res_process_throughput_gradient_rule(m, t, sit, pro):
+# constraint only effectively restricting if max-grad < 1/dt
+    if m.process.loc[sit, pro]['max-grad'] < 1/m.dt.value:
+        if m.cap_pro[sit, pro].value is None:
+            return pyomo.Constraint.Skip
+        else:
+            return (m.tau_pro[t-1, sit, pro] - m.cap_pro[sit, pro] *
+                        m.process.loc[sit, pro]['max-grad'] * m.dt,
+                    m.tau_pro[t, sit, pro],
+                    m.tau_pro[t-1, sit, pro] + m.cap_pro[sit, pro] *
+                        m.process.loc[sit, pro]['max-grad'] * m.dt)
+    else:
+        return pyomo.Constraint.Skip
+
+
+def res_throughput_by_online_capacity_min_rule(m, tm, sit, pro):
+    return (m.tau_pro[tm, sit, pro] >= m.cap_online[tm, sit, pro] *
+                                       m.process.loc[sit, pro]['min-fraction'])
+
+def res_throughput_by_online_capacity_max_rule(m, tm, sit, pro):
+    return (m.tau_pro[tm, sit, pro] <= m.cap_online[tm, sit, pro])
+
+def def_partial_process_input_rule(m, tm, sit, pro, coin):
+    R = m.r_in.loc[pro, coin] # input ratio at maximum operation point
+    r = m.r_in_min_fraction[pro, coin]  # input ratio at lowest operation point
+    min_fraction = m.process.loc[sit, pro]['min-fraction']
+    
+    online_factor = min_fraction * (r - R) / (1 - min_fraction) 
+    throughput_factor =  (R - min_fraction * r) / (1 - min_fraction)
+    
+    return (m.e_pro_in[tm, sit, pro, coin] == 
+            m.cap_online[tm, sit, pro] * online_factor + 
+            m.tau_pro[tm, sit, pro] * throughput_factor)
+
+def res_cap_online_by_cap_pro_rule(m, tm, sit, pro):
+    return m.cap_online[tm, sit, pro] <= m.cap_pro[sit, pro]
+    
+def def_startup_capacity_rule(m, tm, sit, pro):
+    return (m.startup_pro[tm, sit, pro] >= m.cap_online[tm, sit, pro] -
+                                           m.cap_online[tm-1, sit, pro])
+                
+# lower bound <= process capacity <= upper bound
+def res_process_capacity_rule(m, sit, pro):
+    return (m.process.loc[sit, pro]['cap-lo'],
+            m.cap_pro[sit, pro],
+            m.process.loc[sit, pro]['cap-up'])
+
+# power connection capacity: Sell == Buy
+# (only for complementary buy and sell processes in the same site, as
+# enumerated in m.pro_sell_buy_tuples)
+def res_sell_buy_symmetry_rule(m, sit, buy_pro, sell_pro):
+    return m.cap_pro[sit, buy_pro] == m.cap_pro[sit, sell_pro]
+
+# transmission
+
+# transmission capacity == new capacity + existing capacity
+# (one capacity per undirected link, shared by both flow directions)
+def def_transmission_capacity_rule(m, sin, sout, tra, com):
+    return (m.cap_tra[sin, sout, tra, com] ==
+            m.cap_tra_new[sin, sout, tra, com] +
+            m.transmission_link.loc[sin, sout, tra, com]['inst-cap'])
+
+# transmission output == transmission input * efficiency
+def def_transmission_output_rule(m, tm, sin, sout, tra, com):
+    return (m.e_tra_out[tm, sin, sout, tra, com] ==
+            m.e_tra_in[tm, sin, sout, tra, com] *
+            m.transmission.loc[sin, sout, tra, com]['eff'])
+
+# transmission input <= transmission capacity (of the undirected link)
+def res_transmission_input_by_capacity_rule(m, tm, sin, sout, tra, com):
+    return (m.e_tra_in[tm, sin, sout, tra, com] <=
+            m.cap_tra[link_tuple(sin, sout, tra, com)])
+
+# lower bound <= transmission capacity <= upper bound
+def res_transmission_capacity_rule(m, sin, sout, tra, com):
+    return (m.transmission_link.loc[sin, sout, tra, com]['cap-lo'],
+            m.cap_tra[sin, sout, tra, com],
+            m.transmission_link.loc[sin, sout, tra, com]['cap-up'])
+
+# storage
+
+# storage content in timestep [t] == storage content[t-1]
+# + newly stored energy * input efficiency
+# - retrieved energy / output efficiency
+def def_storage_state_rule(m, t, sit, sto, com):
+    return (m.e_sto_con[t, sit, sto, com] ==
+            m.e_sto_con[t-1, sit, sto, com] +
+            m.e_sto_in[t, sit, sto, com] *
+            m.storage.loc[sit, sto, com]['eff-in'] * m.dt -
+            m.e_sto_out[t, sit, sto, com] /
+            m.storage.loc[sit, sto, com]['eff-out'] * m.dt)
+
+# storage power == new storage power + existing storage power
+def def_storage_power_rule(m, sit, sto, com):
+    return (m.cap_sto_p[sit, sto, com] ==
+            m.cap_sto_p_new[sit, sto, com] +
+            m.storage.loc[sit, sto, com]['inst-cap-p'])
+
+# storage capacity == new storage capacity + existing storage capacity
+def def_storage_capacity_rule(m, sit, sto, com):
+    return (m.cap_sto_c[sit, sto, com] ==
+            m.cap_sto_c_new[sit, sto, com] +
+            m.storage.loc[sit, sto, com]['inst-cap-c'])
+
+# storage input <= storage power
+def res_storage_input_by_power_rule(m, t, sit, sto, com):
+    return m.e_sto_in[t, sit, sto, com] <= m.cap_sto_p[sit, sto, com]
+
+# storage output <= storage power
+def res_storage_output_by_power_rule(m, t, sit, sto, co):
+    return m.e_sto_out[t, sit, sto, co] <= m.cap_sto_p[sit, sto, co]
+
+# storage content <= storage capacity
+def res_storage_state_by_capacity_rule(m, t, sit, sto, com):
+    return m.e_sto_con[t, sit, sto, com] <= m.cap_sto_c[sit, sto, com]
+
+# lower bound <= storage power <= upper bound
+def res_storage_power_rule(m, sit, sto, com):
+    return (m.storage.loc[sit, sto, com]['cap-lo-p'],
+            m.cap_sto_p[sit, sto, com],
+            m.storage.loc[sit, sto, com]['cap-up-p'])
+
+# lower bound <= storage capacity <= upper bound
+def res_storage_capacity_rule(m, sit, sto, com):
+    return (m.storage.loc[sit, sto, com]['cap-lo-c'],
+            m.cap_sto_c[sit, sto, com],
+            m.storage.loc[sit, sto, com]['cap-up-c'])
+
+# initialization of storage content in first timestep t[1]
+# forced minimun  storage content in final timestep t[len(m.t)]
+# content[t=1] == storage capacity * fraction <= content[t=final]
+def res_initial_and_final_storage_state_rule(m, t, sit, sto, com):
+    if t == m.t[1]:  # first timestep (Pyomo uses 1-based indexing)
+        return (m.e_sto_con[t, sit, sto, com] ==
+                m.cap_sto_c[sit, sto, com] *
+                m.storage.loc[sit, sto, com]['init'])
+    elif t == m.t[len(m.t)]:  # last timestep
+        return (m.e_sto_con[t, sit, sto, com] >=
+                m.cap_sto_c[sit, sto, com] *
+                m.storage.loc[sit, sto, com]['init'])
+    else:
+        return pyomo.Constraint.Skip
+
+# Objective
+def def_costs_rule(m, cost_type):
+    """Calculate total costs by cost type.
+
+    Sums up process activity and capacity expansions
+    and sums them in the cost types that are specified in the set
+    m.cost_type. To change or add cost types, add/change entries
+    there and modify the if/elif cases in this function accordingly.
+
+    Cost types are
+      - Investment costs for process power, storage power and
+        storage capacity. They are multiplied by the annuity
+        factors.
+      - Fixed costs for process power, storage power and storage
+        capacity.
+      - Variables costs for usage of processes, storage and transmission.
+      - Fuel costs for stock commodity purchase.
+
+    """
+    if cost_type == 'Inv':
+        return m.costs['Inv'] == \
+            sum(m.cap_pro_new[p] *
+                m.process.loc[p]['inv-cost'] *
+                m.process.loc[p]['annuity-factor']
+                for p in m.pro_tuples) + \
+            sum(m.cap_tra_new[link_tuple(*t)] *
+                m.transmission.loc[t]['inv-cost'] *
+                m.transmission.loc[t]['annuity-factor']
+                for t in m.tra_tuples) + \
+            sum(m.cap_sto_p_new[s] *
+                m.storage.loc[s]['inv-cost-p'] *
+                m.storage.loc[s]['annuity-factor'] +
+                m.cap_sto_c_new[s] *
+                m.storage.loc[s]['inv-cost-c'] *
+                m.storage.loc[s]['annuity-factor']
+                for s in m.sto_tuples)
+
+    elif cost_type == 'Fix':
+        return m.costs['Fix'] == \
+            sum(m.cap_pro[p] * m.process.loc[p]['fix-cost']
+                for p in m.pro_tuples) + \
+            sum(m.cap_tra[link_tuple(*t)] * m.transmission.loc[t]['fix-cost']
+                for t in m.tra_tuples) + \
+            sum(m.cap_sto_p[s] * m.storage.loc[s]['fix-cost-p'] +
+                m.cap_sto_c[s] * m.storage.loc[s]['fix-cost-c']
+                for s in m.sto_tuples)
+
+    elif cost_type == 'Var':
+        # coefficient vectors per tuple, scaled to annual costs per timestep
+        weight_dt = pyomo.value(m.weight) * pyomo.value(m.dt)
+        pro_tuples = list(m.pro_tuples)
+        tra_tuples = list(m.tra_tuples)
+        sto_tuples = list(m.sto_tuples)
+        pro_cost = cost_coefficients(m.process, pro_tuples, 'var-cost')
+        tra_cost = cost_coefficients(m.transmission, tra_tuples, 'var-cost')
+        sto_cost_c = cost_coefficients(m.storage, sto_tuples, 'var-cost-c')
+        sto_cost_p = cost_coefficients(m.storage, sto_tuples, 'var-cost-p')
+        pro_cost *= weight_dt
+        tra_cost *= weight_dt
+        sto_cost_c *= pyomo.value(m.weight)
+        sto_cost_p *= weight_dt
+
+        return m.costs['Var'] == linear_sum(chain(
+            ((pro_cost[k], m.tau_pro[(tm,) + p])
+             for tm in m.tm for k, p in enumerate(pro_tuples)),
+            ((tra_cost[k], m.e_tra_in[(tm,) + t])
+             for tm in m.tm for k, t in enumerate(tra_tuples)),
+            ((sto_cost_c[k], m.e_sto_con[(tm,) + s])
+             for tm in m.tm for k, s in enumerate(sto_tuples)),
+            ((sto_cost_p[k], m.e_sto_in[(tm,) + s])
+             for tm in m.tm for k, s in enumerate(sto_tuples)),
+            ((sto_cost_p[k], m.e_sto_out[(tm,) + s])
+             for tm in m.tm for k, s in enumerate(sto_tuples))))
+
+    elif cost_type == 'Fuel':
+        stock_tuples = [c for c in m.com_tuples if c[1] in m.com_stock]
+        fuel_cost = cost_coefficients(m.commodity, stock_tuples, 'price')
+        fuel_cost *= pyomo.value(m.weight) * pyomo.value(m.dt)
+
+        return m.costs['Fuel'] == linear_sum(
+            (fuel_cost[k], m.e_co_stock[(tm,) + c])
+            for tm in m.tm for k, c in enumerate(stock_tuples))
+
+    elif cost_type == 'Revenue':
+        sell_tuples = sorted(commodity_subset(m.com_tuples, m.com_sell))
+        revenue = price_coefficients(m, sell_tuples)
+
+        return m.costs['Revenue'] == -linear_sum(
+            (revenue[i, k], m.e_co_sell[(tm,) + c])
+            for i, tm in enumerate(m.tm)
+            for k, c in enumerate(sell_tuples))
+
+    elif cost_type == 'Purchase':
+        buy_tuples = sorted(commodity_subset(m.com_tuples, m.com_buy))
+        purchase = price_coefficients(m, buy_tuples)
+
+        return m.costs['Purchase'] == linear_sum(
+            (purchase[i, k], m.e_co_buy[(tm,) + c])
+            for i, tm in enumerate(m.tm)
+            for k, c in enumerate(buy_tuples))
+
+    elif cost_type == 'Startup':
+        partial_tuples = list(m.pro_partial_tuples)
+        startup_cost = cost_coefficients(
+            m.process, partial_tuples, 'startup-cost')
+        startup_cost *= pyomo.value(m.weight) * pyomo.value(m.dt)
+
+        return m.costs['Startup'] == linear_sum(
+            (startup_cost[k], m.startup_pro[(tm,) + p])
+            for tm in m.tm for k, p in enumerate(partial_tuples))
+
+    else:
+        raise NotImplementedError("Unknown cost type.")
+
+def obj_rule(m):
+    return pyomo.summation(m.costs)
+
+
+# constraint families of the form "flow[t, tuple] <= capacity[tuple]" that
+# can be generated lazily: name -> (flow variable, capacity variable, rule)
+LAZY_CONSTRAINTS = {
+    'res_process_throughput_by_capacity': (
+        'tau_pro', 'cap_pro', res_process_throughput_by_capacity_rule),
+    'res_transmission_input_by_capacity': (
+        'e_tra_in', 'cap_tra', res_transmission_input_by_capacity_rule),
+    'res_storage_input_by_power': (
+        'e_sto_in', 'cap_sto_p', res_storage_input_by_power_rule),
+    'res_storage_output_by_power': (
+        'e_sto_out', 'cap_sto_p', res_storage_output_by_power_rule),
+    'res_storage_state_by_capacity': (
+        'e_sto_con', 'cap_sto_c', res_storage_state_by_capacity_rule)}
+
+
+# Hacks
+
+def add_hacks(model, hacks):
+    """ add hackish features to model object
+
+    This function is reserved for corner cases/features that still lack a
+    satisfyingly general solution that could become part of create_model.
+    Use hack features sparingly and think about how to incorporate into main
+    model function before adding here. Otherwise, these features might become
+    a maintenance burden.
+
+    """
+
+    # Store hack data
+    model.hacks = hacks
+
+    # Global CO2 limit
+    try:
+        global_co2_limit = hacks.loc['Global CO2 limit', 'Value']
+    except KeyError:
+        global_co2_limit = float('inf')
+
+    # only add constraint if limit is finite
+    if not math.isinf(global_co2_limit):
+        model.res_global_co2_limit = pyomo.Constraint(
+            rule=res_global_co2_limit_rule,
+            doc='total co2 commodity output <= hacks.Glocal CO2 limit')
+
+    return model
+
+# total CO2 output <= Global CO2 limit
+def res_global_co2_limit_rule(m):
+    co2_output_sum = 0
+    for tm in m.tm:
+        for sit in m.sit:
+            # minus because negative commodity_balance represents creation of 
+            # that commodity.
+            co2_output_sum += (- commodity_balance(m, tm, sit, 'CO2') * m.dt)
+
+    # scaling to annual output (cf. definition of m.weight)
+    co2_output_sum *= m.weight
+    return (co2_output_sum <= m.hacks.loc['Global CO2 limit', 'Value'])
@@ -0,0 +1,471 @@
+"""urbs model helpers: index tuples, balances and cost coefficients
+
+Functions used by the constraint rules of create_model, e.g.
+commodity_balance or link_tuple.
+
+"""
+
+import numpy as np
+import pandas as pd
+import pyomo.core as pyomo
+
+
+def cost_coefficients(df, tuples, column):
+    """Return a float array of column values of df for the given tuples.
+
+    Args:
+        df: an input DataFrame, e.g. m.process
+        tuples: list of index tuples of df
+        column: column name, e.g. 'var-cost'
+
+    Returns:
+        a NumPy array with one coefficient per tuple
+    """
+    if not tuples:
+        return np.zeros(0)
+    return df[column].loc[tuples].values.astype(float)
+
+
+def price_coefficients(m, tuples):
+    """Return annual cost coefficients of buy/sell tuples per timestep.
+
+    Slices the cached commodity price matrix (see com_price_matrix) and
+    scales it by weight and timestep duration.
+
+    Args:
+        m: the model object
+        tuples: list of (site, commodity, type) buy or sell tuples
+
+    Returns:
+        a NumPy array with one row per modelled timestep and one column per
+        tuple
+    """
+    rows = [m.com_price_tm[tm] for tm in m.tm]
+    columns = [m.com_price_tuples[c] for c in tuples]
+    return (m.com_price[np.ix_(rows, columns)] *
+            pyomo.value(m.weight) * pyomo.value(m.dt))
+
+
+def linear_sum(terms):
+    """Build one flat linear expression from (coefficient, variable) pairs.
+
+    Unlike the builtin sum, which creates a nested binary expression tree,
+    Pyomo's quicksum with linear=True directly creates a single linear
+    expression. Terms with zero coefficient are dropped.
+
+    Args:
+        terms: iterable of (coefficient, variable) tuples
+
+    Returns:
+        a Pyomo linear expression (or 0 if no term remains)
+    """
+    return pyomo.quicksum(
+        (float(coef) * var for coef, var in terms if coef != 0), linear=True)
+
+
+def _unscale_factor(instance, entity):
+    """Return the factor that converts values of entity to original units.
+
+    Variables are in power units, except for the costs. The duals of all
+    constraints are costs per power unit, except for the cost definition.
+    """
+    scale = getattr(instance, 'scale', None)
+    if not scale or (scale['power'] == 1 and scale['cost'] == 1):
+        return 1
+    if isinstance(entity, pyomo.Var):
+        if entity.name == 'costs':
+            return scale['cost']
+        return scale['power']
+    if isinstance(entity, pyomo.Constraint):
+        if entity.name == 'def_costs':
+            return 1
+        return scale['cost'] / scale['power']
+    if isinstance(entity, pyomo.Objective):
+        return scale['cost']
+    return 1
+
+
+# Helper functions
+
+
+def annuity_factor(n, i):
+    """Annuity factor formula.
+
+    Evaluates the annuity factor formula for depreciation duration
+    and interest rate. Works also well for equally sized numpy arrays
+    of values for n and i.
+
+    Args:
+        n: depreciation period (years)
+        i: interest rate (e.g. 0.06 means 6 %)
+
+    Returns:
+        Value of the expression :math:`\\frac{(1+i)^n i}{(1+i)^n - 1}`
+
+    Example:
+        >>> round(annuity_factor(20, 0.07), 5)
+        0.09439
+
+    """
+    return (1+i)**n * i / ((1+i)**n - 1)
+
+
+def link_tuple(sin, sout, tra, com):
+    """Return the undirected link tuple of a directed transmission tuple.
+
+    Both directions of a transmission line map to the same link, whose two
+    sites are stored in sorted order.
+
+    Args:
+        sin: origin site
+        sout: destination site
+        tra: transmission technology
+        com: transported commodity
+
+    Returns:
+        a (site, site, transmission, commodity) tuple
+
+    Example:
+        >>> link_tuple('South', 'Mid', 'hvac', 'Elec')
+        ('Mid', 'South', 'hvac', 'Elec')
+    """
+    if sout < sin:
+        sin, sout = sout, sin
+    return (sin, sout, tra, com)
+
+
+def transmission_links(transmission):
+    """Derive undirected transmission links from directed transmission data.
+
+    Every line is given twice in the Transmission sheet (A->B and B->A). This
+    function merges both directions into one link, so that a single capacity
+    variable can be shared by both flow directions. Capacity bounds are
+    intersected, i.e. the tighter of both directions applies.
+
+    Args:
+        transmission: DataFrame indexed by (Site In, Site Out, Transmission,
+            Commodity), as returned by read_excel
+
+    Returns:
+        a DataFrame indexed by link tuples (see link_tuple) with the columns
+        'inst-cap', 'cap-lo' and 'cap-up'
+    """
+    columns = ['inst-cap', 'cap-lo', 'cap-up']
+    if transmission.empty:
+        return pd.DataFrame(columns=columns, index=transmission.index)
+
+    links = transmission[columns].copy()
+    links.index = pd.MultiIndex.from_tuples(
+        [link_tuple(*t) for t in transmission.index],
+        names=transmission.index.names)
+    links = links.groupby(level=list(range(links.index.nlevels))).agg(
+        {'inst-cap': 'max', 'cap-lo': 'max', 'cap-up': 'min'})
+    return links[columns].sort_index()
+
+
+def commodity_balance(m, tm, sit, com):
+    """Calculate commodity balance at given timestep.
+
+    For a given commodity co and timestep tm, calculate the balance of
+    consumed (to process/storage/transmission, counts positive) and provided
+    (from process/storage/transmission, counts negative) power. Used as helper
+    function in create_model for constraints on demand and stock commodities.
+
+    Args:
+        m: the model object
+        tm: the timestep
+        site: the site
+        com: the commodity
+
+    Returns
+        balance: net value of consumed (positive) or provided (negative) power
+
+    """
+    balance = 0
+    for site, process in m.pro_tuples:
+        if site == sit and com in m.r_in.loc[process].index:
+            # usage as input for process increases balance
+            balance += m.e_pro_in[(tm, site, process, com)]
+        if site == sit and com in m.r_out.loc[process].index:
+            # output from processes decreases balance
+            balance -= m.e_pro_out[(tm, site, process, com)]
+    for site_in, site_out, transmission, commodity in m.tra_tuples:
+        # exports increase balance
+        if site_in == sit and commodity == com:
+            balance += m.e_tra_in[(tm, site_in, site_out, transmission, com)]
+        # imports decrease balance
+        if site_out == sit and commodity == com:
+            balance -= m.e_tra_out[(tm, site_in, site_out, transmission, com)]
+    for site, storage, commodity in m.sto_tuples:
+        # usage as input for storage increases consumption
+        # output from storage decreases consumption
+        if site == sit and commodity == com:
+            balance += m.e_sto_in[(tm, site, storage, com)]
+            balance -= m.e_sto_out[(tm, site, storage, com)]
+    return balance
+    
+def dsm_down_time_tuples(time, sit_com_tuple, m):
+    """ Dictionary for the two time instances of DSM_down
+
+
+    Args:
+        time: list with time indices
+        sit_com_tuple: a list of (site, commodity) tuples
+        m: model instance
+
+    Returns:
+        A list of possible time tuples depending on site and commodity
+    """
+    
+    delay =  m.dsm.loc[:,:]['delay']
+    
+    ub = max(time)
+    lb = min(time)
+    
+    time_list = list()
+    
+    for (site, commodity) in sit_com_tuple:
+        for step1 in time:
+            for step2 in range(step1-delay[site,commodity], step1+delay[site,commodity]+1):
+                if step2 >= lb and step2 <= ub:
+                    time_list.append((step1,step2, site, commodity))
+    
+    return time_list
+    
+def dsm_time_tuples(timestep, time, delay):
+    """ Tuples for the two time instances of DSM_down
+
+    Args:
+        timestep: current timestep
+        time: list with time indices
+        delay: allowed dsm delay in particular site and commodity
+
+    Returns:
+        A list of possible time tuples of a current time step in a specific site and commodity
+    """
+        
+    ub = max(time)
+    lb = min(time)
+    
+    time_list = list()
+    
+    for step in range(timestep-delay, timestep+delay+1):
+        if step >= lb and step <= ub:
+            time_list.append(step)
+    
+    return time_list
+    
+
+def commodity_subset(com_tuples, type_name):
+    """ Unique list of commodity names for given type. 
+
+    Args:
+        com_tuples: a list of (site, commodity, commodity type) tuples
+        type_name: a commodity type or a ist of a commodity types
+
+    Returns:
+        The set (unique elements/list) of commodity names of the desired type
+    """
+    if type(type_name) is str:
+        # type_name: ('Stock', 'SupIm', 'Env' or 'Demand')
+        return set(com for sit, com, com_type in com_tuples
+                   if com_type == type_name)
+    else:
+        # type(type_name) is a class 'pyomo.base.sets.SimpleSet'
+        # type_name: ('Buy')=>('Elec buy', 'Heat buy')
+        return set((sit, com, com_type) for sit, com, com_type in com_tuples
+                   if com in type_name)
+
+def price_factor(price):
+    """ Return the factor of a timeseries-based commodity price.
+
+    Args:
+        price: a commodity price, either a number (fixed price) or a string
+            like '1.25xBuy' that refers to a Buy-Sell-Price timeseries
+
+    Returns:
+        the factor (1.25) for string prices, NaN for fixed prices
+    """
+    if isinstance(price, (float, int, np.number)):
+        return np.nan
+    return extract_number_str(price)
+
+
+def com_price_matrix(commodity, buy_sell_price, timesteps):
+    """ Calculate buy/sell commodity prices for each modelled timestep.
+
+    Commodity prices are either fixed (e.g. 0.15) or refer to a timeseries
+    of sheet Buy-Sell-Price, scaled by a price factor (e.g. '1.25xBuy').
+    The prices of all buy and sell commodity tuples are collected in one
+    matrix, so that price lookups in the cost function are plain array
+    accesses.
+
+    Args:
+        commodity: commodity DataFrame, as returned by read_excel
+        buy_sell_price: Buy-Sell-Price DataFrame, as returned by read_excel
+        timesteps: list of modelled timesteps
+
+    Returns:
+        (prices, tm_index, tuple_index) tuple of a NumPy array with one row
+        per timestep and one column per (site, commodity, type) tuple, and
+        two dicts that map timesteps and tuples to row and column numbers
+    """
+    buy_sell = set(c[1] for c in commodity.index if c[2] in ('Buy', 'Sell'))
+    tuples = sorted(c for c in commodity.index if c[1] in buy_sell)
+    timesteps = list(timesteps)
+    prices = np.zeros((len(timesteps), len(tuples)))
+
+    for k, c in enumerate(tuples):
+        price = commodity.loc[c]['price']
+        if isinstance(price, (float, int, np.number)):
+            # same commodity price for each hour
+            prices[:, k] = price
+        else:
+            # a different commodity price for each hour, scaled by a factor
+            # to realize a different commodity price for each site
+            try:
+                factor = commodity.loc[c]['price-factor']
+            except KeyError:
+                factor = price_factor(price)
+            prices[:, k] = factor * np.asarray(
+                buy_sell_price.loc[timesteps, c[1]], dtype=float).reshape(-1)
+
+    tm_index = dict((tm, k) for k, tm in enumerate(timesteps))
+    tuple_index = dict((c, k) for k, c in enumerate(tuples))
+    return prices, tm_index, tuple_index
+
+
+def get_com_price(instance, tuples):
+    """ Return commodity prices for each modelled timestep.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        tuples: a list of (site, commodity, commodity type) tuples
+
+    Returns:
+        a Pandas DataFrame with entities as columns and timesteps as index
+    """
+    tuples = list(tuples)
+    columns = [instance.com_price_tuples[c] for c in tuples]
+    rows = [instance.com_price_tm[tm] for tm in instance.tm]
+    com_price = pd.DataFrame(instance.com_price[np.ix_(rows, columns)],
+                             index=list(instance.tm))
+    com_price.columns = pd.MultiIndex.from_tuples(tuples) if tuples else []
+    return com_price
+
+def extract_number_str(str_in):
+    """ Extract first number from a given string and convert to a float number.
+
+    The function works with the following formats (,25), (.25), (2), (2,5), (2.5),
+    (1,000.25), (1.000,25) and  doesn't with (1e3), (1.5-0.4j) and negative numbers.
+
+    Args:
+        str_in: a string ('1,20BUY')
+
+    Returns:
+        A float number (1.20)
+    """
+    import re
+    # deletes all char starting after the number
+    start_char = re.search('[*:!%$&?a-zA-Z]',str_in).start()
+    str_num = str_in[:start_char]
+
+    if re.search('\d+',str_num) is None:
+        # no number in str_num
+        return 1.0
+    elif re.search('^(\d+|\d{1,3}(,\d{3})*)(\.\d+)?$',str_num) is not None:
+        #Commas required between powers of 1,000
+        #Can't start with "."
+        #Pass: (1,000,000), (0.001)
+        #Fail: (1000000), (1,00,00,00), (.001)
+        str_num = str_num.replace(',','')
+        return float(str_num)
+    elif re.search('^(\d+|\d{1,3}(.\d{3})*)(\,\d+)?$',str_num) is not None:
+        #Dots required between powers of 1.000
+        #Can't start with ","
+        #Pass: (1.000.000), (0,001)
+        #Fail: (1000000), (1.00.00,00), (,001)
+        str_num = str_num.replace('.','')
+        return float(str_num.replace(',','.'))
+    elif re.search('^\d*\.?\d+$',str_num) is not None:
+        #No commas allowed
+        #Pass: (1000.0), (001), (.001)
+        #Fail: (1,000.0)
+        return float(str_num)
+    elif re.search('^\d*\,?\d+$',str_num) is not None:
+        #No dots allowed
+        #Pass: (1000,0), (001), (,001)
+        #Fail: (1.000,0)
+        str_num = str_num.replace(',','.')
+        return float(str_num)
+
+def sell_buy_pairs(process, process_commodity, com_buy, com_sell):
+    """ Pair each buy process with its complementary sell process by site.
+
+    A buy process (input commodity in com_buy) and a sell process (output
+    commodity in com_sell) are complementary, if an output commodity of the
+    buy process is an input commodity of the sell process. The pairing is
+    computed once with hash joins over the process-commodity table instead
+    of scanning the process tuples for every buy process.
+
+    Args:
+        process: process DataFrame, indexed by (Site, Process)
+        process_commodity: process-commodity DataFrame, indexed by
+            (Process, Commodity, Direction)
+        com_buy: collection of buy commodity names
+        com_sell: collection of sell commodity names
+
+    Returns:
+        a sorted list of (site, buy process, sell process) tuples; for each
+        (site, buy process) only the first sell process is kept
+    """
+    pro_com = process_commodity.reset_index()[
+        ['Process', 'Commodity', 'Direction']]
+    inputs = pro_com[pro_com['Direction'] == 'In']
+    outputs = pro_com[pro_com['Direction'] == 'Out']
+
+    # outputs of buy processes and inputs of sell processes
+    buy_pro = inputs[inputs['Commodity'].isin(list(com_buy))]['Process']
+    sell_pro = outputs[outputs['Commodity'].isin(list(com_sell))]['Process']
+    buy_out = outputs[outputs['Process'].isin(buy_pro)]
+    sell_in = inputs[inputs['Process'].isin(sell_pro)]
+
+    # join: buy - commodity == commodity - sell
+    pairs = pd.merge(buy_out[['Process', 'Commodity']],
+                     sell_in[['Process', 'Commodity']],
+                     on='Commodity', suffixes=('', ' sell'))
+    pairs = pairs[pairs['Process'] != pairs['Process sell']]
+
+    # both processes must exist in the same site
+    sites = pd.DataFrame(list(process.index), columns=['Site', 'Process'])
+    pairs = pd.merge(sites, pairs, on='Process')
+    pairs = pd.merge(pairs, sites.rename(columns={'Process': 'Process sell'}),
+                     on=['Site', 'Process sell'])
+
+    pairs = (pairs[['Site', 'Process', 'Process sell']]
+             .drop_duplicates()
+             .sort_values(['Site', 'Process', 'Process sell'])
+             .drop_duplicates(['Site', 'Process']))
+    return [tuple(pair) for pair in pairs.values]
+
+
+def search_sell_buy_tuple(instance, sit_in, pro_in, coin):
+    """ Return the equivalent sell-process for a given buy-process.
+
+    Looks up the pairing precomputed by sell_buy_pairs in create_model.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        sit_in: a site
+        pro_in: a process
+        co_in: a commodity
+
+    Returns:
+        a process
+    """
+    if coin not in instance.com_buy:
+        return None
+    for (sit, buy_pro, sell_pro) in instance.pro_sell_buy_tuples:
+        if sit == sit_in and buy_pro == pro_in:
+            return sell_pro
+    return None
@@ -0,0 +1,601 @@
+"""urbs output: result tables of a solved model instance
+
+Constants (capacities, costs), timeseries, marginal costs and key
+performance indicators, as DataFrames.
+
+"""
+
+import numpy as np
+import pandas as pd
+import pyomo.core as pyomo
+
+from .tracing import _traced
+from .modelhelper import link_tuple
+from .result import Result
+from .pyomoio import get_entities, get_entity
+
+
+@_traced('get_constants')
+def get_constants(instance):
+    """Return summary DataFrames for important variables
+
+    Usage:
+        costs, cpro, ctra, csto = get_constants(instance)
+
+    Args:
+        instance: a urbs model instance
+
+    Returns:
+        (costs, cpro, ctra, csto) tuple
+
+    Example:
+        >>> import pyomo.environ
+        >>> from pyomo.opt.base import SolverFactory
+        >>> data = read_excel('mimo-example.xlsx')
+        >>> prob = create_model(data, range(1,25))
+        >>> optim = SolverFactory('glpk')
+        >>> result = optim.solve(prob)
+        >>> cap_pro = get_constants(prob)[1]['Total']
+        >>> cap_pro.xs('Wind park', level='Process').apply(int)
+        Site
+        Mid      13000
+        North    23258
+        South        0
+        Name: Total, dtype: int64
+    """
+    costs = get_entity(instance, 'costs')
+    cpro = get_entities(instance, ['cap_pro', 'cap_pro_new'])
+    ctra = get_entities(instance, ['cap_tra', 'cap_tra_new'])
+
+    # expand capacities of undirected links to both transmission directions
+    if not ctra.empty:
+        tra_tuples = list(instance.transmission.index)
+        ctra = ctra.loc[[link_tuple(*t) for t in tra_tuples]]
+        ctra.index = pd.MultiIndex.from_tuples(
+            tra_tuples,
+            names=['Site In', 'Site Out', 'Transmission', 'Commodity'])
+    csto = get_entities(instance, ['cap_sto_c', 'cap_sto_c_new',
+                                   'cap_sto_p', 'cap_sto_p_new'])
+
+    # better labels and index names and return sorted
+    if not cpro.empty:
+        cpro.index.names = ['Site', 'Process']
+        cpro.columns = ['Total', 'New']
+        cpro.sort_index(inplace=True)
+    if not ctra.empty:
+        ctra.index.names = ['Site In', 'Site Out', 'Transmission', 'Commodity']
+        ctra.columns = ['Total', 'New']
+        ctra.sort_index(inplace=True)
+    if not csto.empty:
+        csto.columns = ['C Total', 'C New', 'P Total', 'P New']
+        csto.sort_index(inplace=True)
+
+    return costs, cpro, ctra, csto
+
+
+@_traced('get_timeseries')
+def get_timeseries(instance, com, sit, timesteps=None):
+    """Return DataFrames of all timeseries referring to given commodity
+
+    Usage:
+        create, consume, store, imp, exp, der = get_timeseries(instance, co,
+                                                          sit, timesteps)
+
+    Args:
+        instance: a urbs model instance
+        com: a commodity
+        sit: a site
+        timesteps: optional list of timesteps, defaults: all modelled timesteps
+
+    Returns:
+        a (created, consumed, storage, imported, exported, derivative) tuple
+        of DataFrames timeseries. These are:
+
+        * created: timeseries of commodity creation, including stock source
+        * consumed: timeseries of commodity consumption, including demand
+        * storage: timeseries of commodity storage (level, stored, retrieved)
+        * imported: timeseries of commodity import (by site)
+        * exported: timeseries of commodity export (by site)
+    """
+    return get_timeseries_batch(instance, [com], [sit], timesteps)[(com, sit)]
+
+
+@_traced('get_timeseries_batch')
+def get_timeseries_batch(instance, commodities, sites, timesteps=None):
+    """Return timeseries DataFrames for all given commodities and sites
+
+    Like get_timeseries, but each model entity is extracted only once and
+    split by site and commodity with groupby, so that the runtime hardly
+    depends on the number of (commodity, site) combinations.
+
+    Usage:
+        timeseries = get_timeseries_batch(instance, commodities, sites)
+        created, consumed, ... = timeseries[(com, sit)]
+
+    Args:
+        instance: a urbs model instance
+        commodities: list of commodities
+        sites: list of sites
+        timesteps: optional list of timesteps, defaults: all modelled timesteps
+
+    Returns:
+        a dict {(commodity, site): tuple as returned by get_timeseries}
+    """
+    if timesteps is None:
+        # default to all simulated timesteps
+        timesteps = sorted(get_entity(instance, 'tm').index)
+
+    entities = _get_timeseries_entities(instance)
+    return dict(((com, sit), _get_timeseries(instance, entities, com, sit,
+                                             timesteps))
+                for com in commodities for sit in sites)
+
+
+def _group_by(df, levels):
+    """Split DataFrame df into a dict {key: group without levels}."""
+    if df.empty:
+        return {}
+    groups = {}
+    for key, group in df.groupby(level=levels):
+        groups[key] = group.reset_index(level=levels, drop=True)
+    return groups
+
+
+def _get_timeseries_entities(instance):
+    """Extract all entities needed by get_timeseries once, grouped by site
+    and commodity.
+
+    Args:
+        instance: a urbs model instance
+
+    Returns:
+        a dict of grouped entity values
+    """
+    entities = {}
+
+    # STOCK: timesteps x (site, commodity)
+    eco = get_entity(instance, 'e_co_stock')
+    try:
+        eco = eco.xs('Stock', level='com_type')
+        entities['stock'] = eco.unstack(level=['sit', 'com']).fillna(0)
+    except KeyError:
+        entities['stock'] = pd.DataFrame()
+
+    # DEMAND SIDE MANAGEMENT: upshift by tm, downshift summed over the first
+    # time step set, i.e. by the time step tt in which it is effective
+    dsmup = get_entity(instance, 'dsm_up')
+    dsmdo = get_entity(instance, 'dsm_down')
+    if dsmup.empty:
+        entities['dsmup'] = {}
+        entities['dsmdo'] = {}
+    else:
+        dsmdo = dsmdo.groupby(level=[1, 2, 3]).sum()
+        entities['dsmup'] = _group_by(dsmup.to_frame(), ['sit', 'com'])
+        entities['dsmdo'] = _group_by(dsmdo.to_frame(), ['sit', 'com'])
+
+    # PROCESS: (t, pro) frames by (site, commodity)
+    epro = get_entities(instance, ['e_pro_in', 'e_pro_out'])
+    entities['epro'] = _group_by(epro, ['sit', 'com'])
+
+    # TRANSMISSION: imports by (commodity, destination site), exports by
+    # (commodity, origin site)
+    etra = get_entities(instance, ['e_tra_in', 'e_tra_out'])
+    try:
+        etra.index.names = ['tm', 'sitin', 'sitout', 'tra', 'com']
+        etra = etra.groupby(level=['tm', 'sitin', 'sitout', 'com']).sum()
+        entities['imported'] = dict(
+            (key, group['e_tra_out'].unstack().fillna(0)) for key, group in
+            _group_by(etra, ['com', 'sitout']).items())
+        entities['exported'] = dict(
+            (key, group['e_tra_in'].unstack().fillna(0)) for key, group in
+            _group_by(etra, ['com', 'sitin']).items())
+    except (ValueError, KeyError):
+        entities['imported'] = {}
+        entities['exported'] = {}
+
+    # STORAGE: (t) frames by (site, commodity)
+    esto = get_entities(instance, ['e_sto_con', 'e_sto_in', 'e_sto_out'])
+    try:
+        esto = esto.groupby(level=['t', 'sit', 'com']).sum()
+        entities['esto'] = _group_by(esto, ['sit', 'com'])
+    except (KeyError, ValueError):
+        entities['esto'] = {}
+
+    # new process capacities, for standardizing derivatives
+    caps = get_entities(instance, ['cap_pro', 'cap_pro_new'])
+    entities['caps'] = caps.loc[:, 'cap_pro_new']
+    return entities
+
+
+def _get_timeseries(instance, entities, com, sit, timesteps):
+    """Return the get_timeseries tuple of one commodity and site.
+
+    Args:
+        instance: a urbs model instance
+        entities: dict of grouped entities from _get_timeseries_entities
+        com: a commodity
+        sit: a site
+        timesteps: list of timesteps
+
+    Returns:
+        see get_timeseries
+    """
+    # DEMAND
+    # default to zeros if commodity has no demand, get timeseries
+    try:
+        demand = instance.demand.loc[timesteps][sit, com]
+        # demand input of a scaled model is stored in scaled units
+        demand = demand * getattr(instance, 'scale', {}).get('power', 1)
+    except KeyError:
+        demand = pd.Series(0, index=timesteps)
+    demand.name = 'Demand'
+
+    # STOCK
+    try:
+        stock = entities['stock'].loc[timesteps][(sit, com)]
+    except KeyError:
+        stock = pd.Series(0, index=timesteps)
+    stock.name = 'Stock'
+
+    # DEMAND SIDE MANAGEMENT (load shifting)
+    if (sit, com) not in entities['dsmup']:
+        # if no DSM happened, the demand is not modified (demanddelta == 0)
+        demanddelta = pd.Series(0, index=timesteps)
+    else:
+        # DSM happened (dsmup implies that dsmdo must be non-zero, too)
+        # so the demand will be modified by the difference of DSM up and
+        # DSM down uses
+        dsmup = entities['dsmup'][(sit, com)].iloc[:, 0]
+        dsmdo = entities['dsmdo'][(sit, com)].iloc[:, 0]
+        dsmdo.index.names = ['t']
+
+        # derive secondary timeseries
+        demanddelta = dsmup - dsmdo
+
+    shifted = demand + demanddelta
+
+    # give sensible names to the derived timeseries
+    demanddelta.name = 'Delta of Demand to shifted Demand'
+    shifted.name = 'Shifted Demand'
+
+    # PROCESS
+    # select all entries of created and consumed desired commodity com and site
+    # sit. Keep only entries with non-zero values and unstack process column.
+    # Finally, slice to the desired timesteps.
+    epro = entities['epro'].get(
+        (sit, com), pd.DataFrame(columns=['e_pro_in', 'e_pro_out']))
+    try:
+        created = epro[epro['e_pro_out'] > 0]['e_pro_out'].unstack(level='pro')
+        created = created.loc[timesteps].fillna(0)
+    except KeyError:
+        created = pd.DataFrame(index=timesteps)
+
+    try:
+        consumed = epro[epro['e_pro_in'] > 0]['e_pro_in'].unstack(level='pro')
+        consumed = consumed.loc[timesteps].fillna(0)
+    except KeyError:
+        consumed = pd.DataFrame(index=timesteps)
+
+    # TRANSMISSION
+    try:
+        imported = entities['imported'][(com, sit)]
+    except KeyError:
+        imported = pd.DataFrame(index=timesteps)
+    try:
+        exported = entities['exported'][(com, sit)]
+    except KeyError:
+        exported = pd.DataFrame(index=timesteps)
+
+    # STORAGE
+    # group storage energies by commodity
+    # select all entries with desired commodity co
+    try:
+        stored = entities['esto'][(sit, com)]
+        stored = stored.loc[timesteps]
+        stored.columns = ['Level', 'Stored', 'Retrieved']
+    except KeyError:
+        stored = pd.DataFrame(0, index=timesteps,
+                              columns=['Level', 'Stored', 'Retrieved'])
+
+    # DERIVATIVE
+    # difference to the next timestep; the last timestep gets zeros
+    derivative = created.join(consumed)
+    if len(derivative.index):
+        values = np.vstack([np.diff(derivative.values, axis=0),
+                            np.zeros((1, len(derivative.columns)))])
+        index = list(derivative.index[:-1]) + [derivative.index[-1] + 1]
+        derivative = pd.DataFrame(values, index=index,
+                                  columns=derivative.columns)
+    # standardizing
+    caps = entities['caps'].reindex(
+        [(sit, col) for col in derivative.columns]).values
+    derivative = derivative / caps
+
+    # show stock as created
+    created = created.join(stock)
+
+    # show demand as consumed
+    consumed = consumed.join(shifted.rename('Demand'))
+    
+    # show dsm timeseries as dsm
+    dsm = pd.concat((demand.rename('Original Demand'), demanddelta), axis=1)
+
+    return created, consumed, stored, imported, exported, derivative, dsm
+
+
+# constraints whose duals are reported by get_marginal_costs as limits
+MARGINAL_COST_LIMITS = (
+    'res_env_total', 'res_global_co2_limit', 'res_process_capacity',
+    'res_transmission_capacity', 'res_storage_power', 'res_storage_capacity')
+
+
+def _has_dual(instance, name):
+    """True if instance holds duals of constraint name."""
+    if isinstance(instance, Result):
+        return name in instance.list_entities()
+    return hasattr(instance, 'dual') and hasattr(instance, name)
+
+
+def get_marginal_costs(instance):
+    """Return marginal costs of all commodities and shadow prices of limits.
+
+    The duals of the vertex rule (res_vertex) are the marginal costs of
+    supplying one more unit of a commodity in a site and timestep. For
+    environmental commodities, which have no vertex rule, the duals of the
+    step limit (res_env_step) are used. Duals are retrieved in bulk (see
+    get_entity) and reshaped at once, instead of slicing per commodity.
+    Requires a model created with dual=True (or a Result saved from one).
+
+    Args:
+        instance: a urbs model instance (or a Result)
+
+    Returns:
+        (prices, limits) tuple of a DataFrame with timesteps as index and
+        (site, commodity) as columns, and a DataFrame with columns
+        'constraint', 'index' ('.'-joined index tuple) and 'dual' for the
+        constraints in MARGINAL_COST_LIMITS; both are empty without duals
+
+    Example:
+        >>> prob = create_model(data, range(1, 25), dual=True)
+        >>> optim.solve(prob)
+        >>> prices, limits = get_marginal_costs(prob)
+        >>> prices['Mid', 'Elec']
+    """
+    # hourly duals of commodity balances and emission limits per step
+    duals = [get_entity(instance, name)
+             for name in ('res_vertex', 'res_env_step')
+             if _has_dual(instance, name)]
+    duals = [dual for dual in duals if not dual.empty]
+    if duals:
+        prices = pd.concat(duals)
+        prices.index = prices.index.droplevel('com_type')
+        prices = prices.unstack(['sit', 'com']).sortlevel(axis=1)
+        prices.index.name = 't'
+    else:
+        prices = pd.DataFrame()
+
+    # shadow prices of totals and capacity limits in long format
+    limits = []
+    for name in MARGINAL_COST_LIMITS:
+        if not _has_dual(instance, name):
+            continue
+        dual = get_entity(instance, name)
+        limits.append(pd.DataFrame({
+            'constraint': name,
+            'index': ['.'.join(str(i) for i in idx)
+                      if isinstance(idx, tuple) else str(idx)
+                      for idx in dual.index],
+            'dual': dual.values}, columns=['constraint', 'index', 'dual']))
+    if limits:
+        limits = pd.concat(limits, ignore_index=True)
+    else:
+        limits = pd.DataFrame(columns=['constraint', 'index', 'dual'])
+    return prices, limits
+
+
+# units of the indicators returned by get_kpis
+KPI_UNITS = {
+    'capacity': 'MW',
+    'energy': 'MWh/a',
+    'full-load hours': 'h/a',
+    'capacity factor': '1',
+    'curtailment': 'MWh/a',
+    'curtailment share': '1',
+    'storage capacity': 'MWh',
+    'cycles': '1/a',
+    'utilisation': '1',
+    'emissions': 't/a',
+    'levelised cost': 'EUR/MWh'}
+
+
+def _kpi_rows(kpi, kind, series, sit, name, com=None):
+    """Return a tidy KPI DataFrame for one indicator of one entity type.
+
+    Args:
+        kpi: indicator name (see KPI_UNITS)
+        kind: entity type, e.g. 'process'
+        series: values of the indicator
+        sit, name, com: index level positions of series for these columns;
+            None for an empty column
+
+    Returns:
+        a DataFrame with the columns of get_kpis
+    """
+    index = series.index
+
+    def level(position):
+        if position is None:
+            return np.nan
+        return index.get_level_values(position)
+
+    return pd.DataFrame({
+        'kpi': kpi, 'type': kind, 'sit': level(sit), 'name': level(name),
+        'com': level(com), 'value': series.values, 'unit': KPI_UNITS[kpi]},
+        columns=['kpi', 'type', 'sit', 'name', 'com', 'value', 'unit'])
+
+
+def _in_timesteps(series, timesteps):
+    """Return the rows of series whose first index level is in timesteps."""
+    return series[series.index.get_level_values(0).isin(timesteps)]
+
+
+def _divide(numerator, denominator):
+    """Return numerator / denominator, NaN where denominator is zero."""
+    return numerator / denominator.where(denominator > 0)
+
+
+def get_kpis(instance):
+    """Return key performance indicators of all processes, storages,
+    transmission lines and sites in one tidy table.
+
+    All indicators are computed from the entity Series (see get_entity)
+    with grouped, vectorised operations, so a Result (see load) works as
+    well as a model instance. Energies and emissions are annualised with the
+    model weight. Indicators:
+
+      - process: capacity, energy (throughput), full-load hours, capacity
+        factor, curtailment and curtailment share (of intermittent supply),
+        levelised cost (investment, fixed, variable and fuel costs per
+        throughput)
+      - storage: storage capacity, capacity (power), energy (output),
+        cycles (full cycles per year), levelised cost (per output)
+      - transmission: capacity, energy (input) and utilisation of each
+        direction of a link ('sit' is 'site in-site out')
+      - site: emissions of each environmental commodity
+
+    Args:
+        instance: a urbs model instance (or a Result)
+
+    Returns:
+        a DataFrame with columns 'kpi', 'type', 'sit', 'name' (process,
+        storage or transmission), 'com', 'value' and 'unit'
+
+    Example:
+        >>> kpis = get_kpis(prob)
+        >>> kpis[kpis['kpi'] == 'full-load hours']
+    """
+    timesteps = list(instance.tm)
+    dt = float(pyomo.value(instance.dt))
+    weight = float(pyomo.value(instance.weight))
+    hours = weight * dt
+    # cost coefficients of a scaled model to original units
+    scale = getattr(instance, 'scale', None) or {'power': 1.0, 'cost': 1.0}
+    cost_unit = float(scale['cost']) / scale['power']
+    tables = []
+
+    # process
+    cap = get_entity(instance, 'cap_pro')
+    if not cap.empty:
+        cap_new = get_entity(instance, 'cap_pro_new').reindex(cap.index)
+        tau = _in_timesteps(get_entity(instance, 'tau_pro'), timesteps)
+        energy = tau.groupby(level=[1, 2]).sum().reindex(
+            cap.index).fillna(0) * hours
+        flh = _divide(energy, cap)
+
+        # input commodities of processes, as (pro, com) pairs
+        pro_com = instance.process_commodity.xs('In', level='Direction')
+        e_pro_in = _in_timesteps(get_entity(instance, 'e_pro_in'), timesteps)
+        pairs = pd.MultiIndex.from_arrays(
+            [e_pro_in.index.get_level_values(2),
+             e_pro_in.index.get_level_values(3)])
+        e_pro_in = e_pro_in[pairs.isin(list(pro_com.index))]
+        e_sit = e_pro_in.index.get_level_values(1)
+        e_com = e_pro_in.index.get_level_values(3)
+
+        # curtailment: available minus used intermittent supply
+        supim = e_pro_in[e_com.isin(list(instance.com_supim))]
+        available = instance.supim.values[
+            instance.supim.index.get_indexer(supim.index.get_level_values(0)),
+            instance.supim.columns.get_indexer(
+                list(zip(supim.index.get_level_values(1),
+                         supim.index.get_level_values(3))))]
+        available = available * cap.reindex(list(zip(
+            supim.index.get_level_values(1),
+            supim.index.get_level_values(2)))).values
+        available = pd.Series(available, index=supim.index)
+        curtailment = (available - supim).groupby(level=[1, 2]).sum() * hours
+        available = available.groupby(level=[1, 2]).sum() * hours
+
+        # fuel costs of stock commodity inputs
+        stock = e_pro_in[e_com.isin(list(instance.com_stock))]
+        price = pd.to_numeric(
+            instance.commodity['price'].xs('Stock', level='Type'),
+            errors='coerce')
+        price = price.reindex(list(zip(stock.index.get_level_values(1),
+                                       stock.index.get_level_values(3))))
+        fuel = (stock * price.values).groupby(level=[1, 2]).sum().reindex(
+            cap.index).fillna(0) * hours * cost_unit
+
+        process = instance.process.reindex(cap.index)
+        costs = (cap_new * process['inv-cost'] * process['annuity-factor'] +
+                 cap * process['fix-cost'] +
+                 energy * process['var-cost']) * cost_unit + fuel
+
+        for kpi, values in (('capacity', cap), ('energy', energy),
+                            ('full-load hours', flh),
+                            ('capacity factor', flh / 8760),
+                            ('curtailment', curtailment),
+                            ('curtailment share',
+                             _divide(curtailment, available)),
+                            ('levelised cost', _divide(costs, energy))):
+            tables.append(_kpi_rows(kpi, 'process', values, 0, 1))
+
+    # storage
+    cap_c = get_entity(instance, 'cap_sto_c')
+    if not cap_c.empty:
+        entities = dict((name, get_entity(instance, name).reindex(cap_c.index))
+                        for name in ('cap_sto_p', 'cap_sto_c_new',
+                                     'cap_sto_p_new'))
+        flows = dict((name, _in_timesteps(get_entity(instance, name),
+                                          timesteps).groupby(
+                          level=[1, 2, 3]).sum().reindex(cap_c.index))
+                     for name in ('e_sto_in', 'e_sto_out', 'e_sto_con'))
+        energy = flows['e_sto_out'] * hours
+
+        storage = instance.storage.reindex(cap_c.index)
+        af = storage['annuity-factor']
+        costs = (entities['cap_sto_p_new'] * storage['inv-cost-p'] * af +
+                 entities['cap_sto_c_new'] * storage['inv-cost-c'] * af +
+                 entities['cap_sto_p'] * storage['fix-cost-p'] +
+                 cap_c * storage['fix-cost-c'] +
+                 flows['e_sto_con'] * storage['var-cost-c'] * weight +
+                 (flows['e_sto_in'] + flows['e_sto_out']) *
+                 storage['var-cost-p'] * hours) * cost_unit
+
+        for kpi, values in (('storage capacity', cap_c),
+                            ('capacity', entities['cap_sto_p']),
+                            ('energy', energy),
+                            ('cycles', _divide(energy, cap_c)),
+                            ('levelised cost', _divide(costs, energy))):
+            tables.append(_kpi_rows(kpi, 'storage', values, 0, 1, 2))
+
+    # transmission, per direction of each link
+    e_tra_in = _in_timesteps(get_entity(instance, 'e_tra_in'), timesteps)
+    if not e_tra_in.empty:
+        flow = e_tra_in.groupby(level=[1, 2, 3, 4]).sum()
+        cap = get_entity(instance, 'cap_tra').reindex(
+            [link_tuple(*t) for t in flow.index])
+        cap.index = flow.index
+        sit = ['{}-{}'.format(sin, sout) for sin, sout, _, _ in flow.index]
+        for kpi, values in (('capacity', cap), ('energy', flow * hours),
+                            ('utilisation',
+                             _divide(flow, cap * len(timesteps)))):
+            table = _kpi_rows(kpi, 'transmission', values, None, 2, 3)
+            table['sit'] = sit
+            tables.append(table)
+
+    # emissions: net output of environmental commodities by processes
+    env = list(instance.com_env)
+    if env:
+        emissions = []
+        for name, sign in (('e_pro_out', 1), ('e_pro_in', -1)):
+            flow = _in_timesteps(get_entity(instance, name), timesteps)
+            flow = flow[flow.index.get_level_values(3).isin(env)]
+            emissions.append(flow.groupby(level=[1, 3]).sum() * sign)
+        emissions = emissions[0].add(emissions[1], fill_value=0) * hours
+        tables.append(_kpi_rows('emissions', 'site', emissions, 0, None, 1))
+
+    if not tables:
+        return pd.DataFrame(
+            columns=['kpi', 'type', 'sit', 'name', 'com', 'value', 'unit'])
+    return pd.concat(tables, ignore_index=True)
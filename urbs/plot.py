@@ -0,0 +1,487 @@
+"""urbs plot: timeseries plots of commodity balances
+
+matplotlib is only imported when a plot is drawn, so that importing urbs
+stays fast in processes that only build and solve models.
+
+"""
+
+import numpy as np
+import os
+import pandas as pd
+from random import random
+
+from .tracing import _traced
+from .pyomoio import get_entity
+from .output import _get_timeseries, _get_timeseries_entities, get_constants
+
+
+COLORS = {
+    'Biomass plant': (0, 122, 55),
+    'Coal plant': (100, 100, 100),
+    'Gas plant': (237, 227, 0),
+    'Gud plant': (153, 153, 0),
+    'Hydro plant': (198, 188, 240),
+    'Lignite plant': (116, 66, 65),
+    'Photovoltaics': (243, 174, 0),
+    'Slack powerplant': (163, 74, 130),
+    'Wind park': (122, 179, 225),
+    'Decoration': (128, 128, 128),  # plot labels
+    'Original Demand': (130, 130, 130),  # thick demand line
+    'Demand': (25, 25, 25), # thick shifted demand line
+    'Demand delta': (130, 130, 130), # dashed demand delta
+    'Grid': (128, 128, 128),  # background grid
+    'Overproduction': (190, 0, 99),  # excess power
+    'Storage': (60, 36, 154),  # storage area
+    'Stock': (222, 222, 222),  # stock commodity power
+    'Purchase': (0, 153, 153),
+    'Feed-in': (255, 204, 153)}
+
+
+def sort_plot_elements(elements):
+    """Sort timeseries for plotting
+
+    Sorts the timeseries (created, consumed) ascending with variance.
+    It places base load at the bottom and peak load at the top.
+    This enhances clearity and readability of the plots.
+
+    Args:
+        elements: timeseries of created or consumed
+
+    Returns:
+        elements_sorted: sorted timeseries of created or consumed
+    """
+    # no need of sorting the columns if there's only one
+    if len(elements.columns) < 2:
+        return elements
+
+    # coefficient of variation (standard deviation / mean) of each column
+    values = elements.values.astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        quotient = np.nanstd(values, axis=0) / np.nanmean(values, axis=0)
+    # fill nan values (due to division by 0)
+    quotient[np.isnan(quotient)] = 0
+
+    # sort created/consumed ascencing with quotient i.e. base load first
+    return elements.iloc[:, np.argsort(quotient, kind='mergesort')]
+
+
+def downsample(elements, max_points):
+    """Aggregate timeseries to at most max_points buckets of timesteps
+
+    Splits the rows into max_points buckets of (nearly) equal length and
+    returns mean, minimum and maximum per bucket. Each bucket is labelled
+    with its first timestep.
+
+    Args:
+        elements: DataFrame or Series of timeseries
+        max_points: maximum number of buckets
+
+    Returns:
+        (mean, minimum, maximum) tuple, of the type of elements
+    """
+    is_series = isinstance(elements, pd.Series)
+    frame = elements.to_frame() if is_series else elements
+    values = frame.values.astype(float)
+    if len(values) <= max_points or not len(values):
+        return elements, elements, elements
+
+    starts = np.linspace(0, len(values), max_points, endpoint=False)
+    starts = np.unique(starts.astype(int))
+    counts = np.diff(np.append(starts, len(values)))
+    index = frame.index[starts]
+
+    results = []
+    for aggregate in (np.add.reduceat(values, starts, axis=0) /
+                      counts[:, np.newaxis],
+                      np.minimum.reduceat(values, starts, axis=0),
+                      np.maximum.reduceat(values, starts, axis=0)):
+        result = pd.DataFrame(aggregate, index=index, columns=frame.columns)
+        if is_series:
+            result = result.iloc[:, 0].rename(elements.name)
+        results.append(result)
+    return tuple(results)
+
+
+def plot(prob, com, sit, timesteps=None, power_unit='MW', energy_unit='MWh',
+         max_points=2000):
+    """Plot a stacked timeseries of commodity balance and storage.
+
+    Creates a stackplot of the energy balance of a given commodity, together
+    with stored energy in a second subplot.
+
+    Args:
+        prob: urbs model instance
+        com: commodity name to plot
+        sit: site name to plot
+        timesteps: optional list of  timesteps to plot; default: prob.tm
+        power_unit: optional string for unit; default: 'MW'
+        energy_unit: optional string for storage plot; default: 'MWh'
+        max_points: optional maximum number of plotted points per timeseries;
+            longer periods are aggregated (see plot_data); default: 2000
+
+    Returns:
+        fig: figure handle
+    """
+    data = get_plot_data(prob, com, sit, timesteps)
+    return plot_data(data, power_unit=power_unit, energy_unit=energy_unit,
+                     max_points=max_points)
+
+
+def get_plot_data(prob, com, sit, timesteps=None, entities=None, csto=None):
+    """Prepare the timeseries that plot shows for a commodity and site.
+
+    Args:
+        prob: urbs model instance
+        com: commodity name to plot
+        sit: site name to plot
+        timesteps: optional list of  timesteps to plot; default: prob.tm
+        entities: optional pre-extracted entities (from
+            _get_timeseries_entities), to share them among several plots
+        csto: optional storage capacities (from get_constants)
+
+    Returns:
+        a dict of DataFrames and Series that plot_data accepts
+    """
+    if timesteps is None:
+        # default to all simulated timesteps
+        timesteps = sorted(get_entity(prob, 'tm').index)
+    timesteps = list(timesteps)
+    if entities is None:
+        entities = _get_timeseries_entities(prob)
+    if csto is None:
+        costs, cpro, ctra, csto = get_constants(prob)
+
+    created, consumed, stored, imported, exported, derivative, dsm = \
+        _get_timeseries(prob, entities, com, sit, timesteps)
+
+    # move retrieved/stored storage timeseries to created/consumed and
+    # rename storage columns back to 'storage' for color mapping
+    created = created.join(stored['Retrieved'])
+    consumed = consumed.join(stored['Stored'])
+    created.rename(columns={'Retrieved': 'Storage'}, inplace=True)
+    consumed.rename(columns={'Stored': 'Storage'}, inplace=True)
+
+    # only keep storage content in storage timeseries
+    stored = stored['Level']
+
+    # add imported/exported timeseries
+    created = created.join(imported)
+    consumed = consumed.join(exported)
+
+    # move demand to its own plot
+    demand = consumed.pop('Demand')
+    original = dsm.pop('Original Demand')
+    deltademand = dsm.pop('Delta of Demand to shifted Demand')
+
+    # remove all columns from created which are all-zeros in both created and
+    # consumed (except the last one, to prevent a completely empty frame)
+    for col in created.columns:
+        if not created[col].any() and len(created.columns) > 1:
+            if col not in consumed.columns or not consumed[col].any():
+                created.pop(col)
+
+    # sorting plot elements
+    created = sort_plot_elements(created)
+    consumed = sort_plot_elements(consumed)
+
+    # storage capacity for the y-limit of the storage plot
+    try:
+        storage_capacity = csto.loc[sit, :, com]['C Total'].sum()
+    except KeyError:
+        storage_capacity = None
+
+    return {
+        'com': com,
+        'sit': sit,
+        'timesteps': timesteps,
+        'created': created,
+        'consumed': consumed,
+        'stored': stored,
+        'demand': demand,
+        'original': original,
+        'deltademand': deltademand,
+        'storage_capacity': storage_capacity}
+
+
+def plot_data(data, power_unit='MW', energy_unit='MWh', max_points=2000):
+    """Plot prepared timeseries (see get_plot_data) as in plot.
+
+    Periods with more than max_points timesteps are drawn at a lower level
+    of detail: all timeseries are aggregated to max_points buckets (see
+    downsample). Stacked areas show the bucket means, while the demand is
+    drawn as its mean together with its min/max envelope.
+
+    Args:
+        data: a dict as returned by get_plot_data
+        power_unit: optional string for unit; default: 'MW'
+        energy_unit: optional string for storage plot; default: 'MWh'
+        max_points: optional maximum number of plotted points per timeseries;
+            None disables aggregation; default: 2000
+
+    Returns:
+        fig: figure handle
+    """
+    import matplotlib.pyplot as plt
+    import matplotlib as mpl
+
+    com, sit = data['com'], data['sit']
+    timesteps = data['timesteps']
+    created = data['created']
+    consumed = data['consumed']
+    stored = data['stored']
+    demand = data['demand']
+    original = data['original']
+    deltademand = data['deltademand']
+
+    # level of detail: aggregate long periods
+    demand_envelope = None
+    if max_points and len(timesteps) > max_points:
+        created = downsample(created, max_points)[0]
+        consumed = downsample(consumed, max_points)[0]
+        stored = downsample(stored, max_points)[0]
+        original = downsample(original, max_points)[0]
+        deltademand = downsample(deltademand, max_points)[0]
+        demand, demand_min, demand_max = downsample(demand, max_points)
+        demand_envelope = (demand_min, demand_max)
+
+    # FIGURE
+    fig = plt.figure(figsize=(16, 12))
+    gs = mpl.gridspec.GridSpec(3, 1, height_ratios=[3,1,1])
+    #, height_ratios=[2, 1]
+
+    # STACKPLOT
+    ax0 = plt.subplot(gs[0])
+
+    # PLOT CONSUMED
+    sp00 = ax0.stackplot(consumed.index, -consumed.as_matrix().T, labels = tuple(consumed.columns),
+                         linewidth=0.15)
+                
+    
+    # color
+    for k, commodity in enumerate(consumed.columns):
+        commodity_color = to_color(commodity)
+
+        sp00[k].set_facecolor(commodity_color)
+        sp00[k].set_edgecolor((.5, .5, .5))
+    
+    # PLOT CREATED
+    sp0 = ax0.stackplot(created.index, created.as_matrix().T, labels = tuple(created.columns), linewidth=0.15)
+
+    for k, commodity in enumerate(created.columns):
+        commodity_color = to_color(commodity)
+
+        sp0[k].set_facecolor(commodity_color)
+        sp0[k].set_edgecolor(to_color('Decoration'))
+
+
+    # label
+    ax0.set_title('Energy balance of {} in {}'.format(com, sit))
+    ax0.set_ylabel('Power ({})'.format(power_unit))
+    
+
+    # legend
+    handles, labels = ax0.get_legend_handles_labels()
+
+    # add "only" consumed commodities to the legend
+    for item in consumed.columns[::-1]:
+        # if item not in created add to legend, except items
+        # from consumed which are all-zeros
+        if item in created.columns or consumed[item].any():
+            pass
+        else:
+            # remove item/commodity is not consumed
+            item_index = labels.index(item)
+            handles.pop(item_index)
+            labels.pop(item_index)
+
+    for item in labels:
+        if labels.count(item) > 1:
+            item_index = labels.index(item)
+            handles.pop(item_index)
+            labels.pop(item_index)
+    
+   
+    lg = ax0.legend(handles=handles[::-1],
+                    labels=labels[::-1],
+                    frameon=False,
+                    loc='upper right',
+                    bbox_to_anchor=(1.2, 1))
+    plt.setp(lg.get_patches(), edgecolor=to_color('Decoration'),
+             linewidth=0.15)
+    plt.setp(ax0.get_xticklabels(), visible=False)    
+    
+    # PLOT DEMAND
+    ax0.plot(original.index, original.values, linewidth=0.8,
+             color=to_color('Original Demand'))
+             
+    ax0.plot(demand.index, demand.values, linewidth=1.2,
+             color=to_color('Demand'))
+    if demand_envelope is not None:
+        ax0.fill_between(demand.index, demand_envelope[0].values,
+                         demand_envelope[1].values, linewidth=0,
+                         color=to_color('Demand'), alpha=0.3)
+
+    # PLOT STORAGE
+    ax1 = plt.subplot(gs[1], sharex=ax0)
+    sp1 = ax1.stackplot(stored.index, stored.values, linewidth=0.15)
+    plt.setp(ax1.get_xticklabels(), visible=False)
+    
+    # PLOT DEMAND SIDE MANAGEMENT
+    ax2 = plt.subplot(gs[2], sharex=ax1)
+    ax2.bar(deltademand.index, deltademand.values, 
+                  color=to_color('Demand delta'), edgecolor='none')
+
+    # color
+    sp1[0].set_facecolor(to_color('Storage'))
+    sp1[0].set_edgecolor(to_color('Decoration'))
+
+    # labels & y-limits
+    ax2.set_xlabel('Time in year (h)')
+    ax2.set_ylabel('Energy ({})'.format(energy_unit))
+    ax1.set_ylabel('Energy ({})'.format(energy_unit))
+    if data['storage_capacity'] is not None:
+        ax1.set_ylim((0, 0.5 + data['storage_capacity']))
+
+    # make xtick distance duration-dependent
+    if len(timesteps) > 26*168:
+        steps_between_ticks = 168*4
+    elif len(timesteps) > 3*168:
+        steps_between_ticks = 168
+    elif len(timesteps) > 2 * 24:
+        steps_between_ticks = 24
+    elif len(timesteps) > 24:
+        steps_between_ticks = 6
+    else:
+        steps_between_ticks = 3
+    xticks = timesteps[::steps_between_ticks]
+
+    # set limits and ticks for all axes
+    for ax in [ax0, ax1, ax2]:
+        ax.set_frame_on(False)
+        ax.set_xlim((timesteps[0], timesteps[-1]))
+        ax.set_xticks(xticks)
+        ax.xaxis.grid(True, 'major', color=to_color('Grid'),
+                      linestyle='-')
+        ax.yaxis.grid(True, 'major', color=to_color('Grid'),
+                      linestyle='-')
+        ax.xaxis.set_ticks_position('none')
+        ax.yaxis.set_ticks_position('none')
+
+        # group 1,000,000 with commas
+        group_thousands = mpl.ticker.FuncFormatter(
+            lambda x, pos: '{:0,d}'.format(int(x)))
+        ax.yaxis.set_major_formatter(group_thousands)
+
+    return fig
+
+
+def _use_agg_backend():
+    """Switch to the non-interactive Agg backend (in worker processes)."""
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+
+def _render_figure(job):
+    """Plot one figure and save it to files (worker of result_figures).
+
+    Args:
+        job: (data, title_prefix, basename, formats, colors, kwds) tuple
+    """
+    import matplotlib.pyplot as plt
+
+    data, plot_title_prefix, basename, formats, colors, kwds = job
+    # custom colors of the calling process (lost with non-fork workers)
+    COLORS.update(colors)
+
+    # do the plotting
+    fig = plot_data(data, **kwds)
+
+    # change the figure title
+    ax0 = fig.get_axes()[0]
+    new_figure_title = ax0.get_title().replace(
+        'Energy balance of ', '{}: '.format(plot_title_prefix))
+    ax0.set_title(new_figure_title)
+
+    # save plot to files
+    for ext in formats:
+        fig.savefig('{}.{}'.format(basename, ext), bbox_inches='tight')
+    plt.close(fig)
+
+
+@_traced('result_figures')
+def result_figures(prob, figure_basename, plot_title_prefix=None, periods={},
+                   formats=('png', 'pdf'), processes=None, **kwds):
+    """Create plot for each site and demand commodity and save to files.
+
+    The plot data is prepared once for all figures; the figures are then
+    rendered in parallel worker processes with the non-interactive Agg
+    backend.
+    
+    Args:
+        prob: urbs model instance
+        figure_basename: relative filename prefix that is shared
+        plot_title_prefix: (optional) plot title identifier
+        periods: (optional) dict of 'period name': timesteps_list items
+                 if omitted, one period 'all' with all timesteps is assumed
+        formats: (optional) list of file extensions; default: png and pdf
+        processes: (optional) number of worker processes; default: number
+                   of CPUs; 1 renders all figures in the calling process
+        **kwds: (optional) keyword arguments are forwarded to urbs.plot()
+    """
+    import multiprocessing
+
+    # default to all timesteps if no
+    if not periods:
+        periods = {'all': sorted(get_entity(prob, 'tm').index)}
+
+    # if no custom title prefix is specified, use the figure basename
+    if not plot_title_prefix:
+        plot_title_prefix = os.path.basename(figure_basename)
+
+    # prepare plot data once for all figures
+    entities = _get_timeseries_entities(prob)
+    costs, cpro, ctra, csto = get_constants(prob)
+
+    # one figure for each demand (site, commodity) timeseries and period
+    jobs = []
+    for sit, com in prob.demand.columns:
+        for period, timesteps in sorted(periods.items()):
+            data = get_plot_data(prob, com, sit, timesteps,
+                                 entities=entities, csto=csto)
+            basename = '{}-{}-{}-{}'.format(figure_basename, com, sit, period)
+            jobs.append((data, plot_title_prefix, basename, list(formats),
+                         dict(COLORS), kwds))
+
+    if len(jobs) > 1 and processes != 1:
+        pool = multiprocessing.Pool(processes, initializer=_use_agg_backend)
+        try:
+            pool.map(_render_figure, jobs)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for job in jobs:
+            _render_figure(job)
+
+
+def to_color(obj=None):
+    """Assign a deterministic pseudo-random color to argument.
+
+    If COLORS[obj] is set, return that. Otherwise, create a random color from
+    the hash(obj) representation string. For strings, this value depends only
+    on the string content, so that same strings always yield the same color.
+
+    Args:
+        obj: any hashable object
+
+    Returns:
+        a (r, g, b) color tuple if COLORS[obj] is set, otherwise a hexstring
+    """
+    if obj is None:
+        obj = random()
+    try:
+        color = tuple(rgb/255.0 for rgb in COLORS[obj])
+    except KeyError:
+        # random deterministic color
+        color = "#{:06x}".format(abs(hash(obj)))[:7]
+    return color
@@ -0,0 +1,376 @@
+"""urbs Pyomo access: retrieve entity values from model instances
+
+"""
+
+import numpy as np
+import pandas as pd
+import pyomo.core as pyomo
+
+from .modelhelper import _unscale_factor
+from .result import Result
+
+
+def get_entity(instance, name):
+    """ Retrieve values (or duals) for an entity in a model instance.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        name: name of a Set, Param, Var, Constraint or Objective
+
+    Returns:
+        a Pandas Series with domain as index and values (or 1's, for sets) of 
+        entity name. For constraints, it retrieves the dual values
+    """
+
+    # results loaded from an archive (see load)
+    if isinstance(instance, Result):
+        return instance.get_entity(name)
+
+    # retrieve entity, its type and its onset names
+    entity = instance.__getattribute__(name)
+    labels = _get_onset_names(entity)
+
+    # extract values
+    if isinstance(entity, pyomo.Set):
+        # Pyomo sets don't have values, only elements
+        results = pd.DataFrame([(v, 1) for v in entity.value])
+
+        # for unconstrained sets, the column label is identical to their index
+        # hence, make index equal to entity name and append underscore to name
+        # (=the later column title) to preserve identical index names for both
+        # unconstrained supersets
+        if not labels:
+            labels = [name]
+            name = name+'_'
+
+    elif isinstance(entity, pyomo.Param):
+        if entity.dim() > 1:
+            results = pd.DataFrame([v[0]+(v[1],) for v in entity.iteritems()])
+        else:
+            results = pd.DataFrame(entity.iteritems())
+
+    elif isinstance(entity, (pyomo.Var, pyomo.Constraint)):
+        # bulk extraction of values (or duals) and index tuples
+        return _get_entity_values(instance, entity, labels, name)
+
+    else:
+        # create DataFrame
+        if entity.dim() > 1:
+            # concatenate index tuples with value if entity has
+            # multidimensional indices v[0]
+            results = pd.DataFrame(
+                [v[0]+(v[1].value,) for v in entity.iteritems()])
+        elif entity.dim() == 1:
+            # otherwise, create tuple from scalar index v[0]
+            results = pd.DataFrame(
+                [(v[0], v[1].value) for v in entity.iteritems()])
+        else:
+            # assert(entity.dim() == 0)
+            results = pd.DataFrame(
+                [(v[0], v[1].value) for v in entity.iteritems()])
+            labels = ['None']
+
+    # check for duplicate onset names and append one to several "_" to make
+    # them unique, e.g. ['sit', 'sit', 'com'] becomes ['sit', 'sit_', 'com']
+    for k, label in enumerate(labels):
+        if label in labels[:k]:
+            labels[k] = labels[k] + "_"
+
+    if not results.empty:
+        # name columns according to labels + entity name
+        results.columns = labels + [name]
+        results.set_index(labels, inplace=True)
+        
+        # convert to Series
+        results = results[name]
+
+        # convert values of a scaled model back to original units
+        factor = _unscale_factor(instance, entity)
+        if factor != 1:
+            results = results * factor
+    else:
+        # return empty Series
+        results = pd.Series(name=name)
+    return results
+
+
+def _get_entity_values(instance, entity, labels, name):
+    """ Retrieve values (or duals) of a Var or Constraint as a Series.
+
+    Values are taken in bulk from the solution arrays of the last solve if
+    they were loaded into the instance (see _entity_values), and the index is
+    built level by level with MultiIndex.from_arrays, instead of
+    concatenating index tuples and values element by element.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        entity: a Var or Constraint of instance
+        labels: list of domain set names, as returned by _get_onset_names
+        name: name of the entity
+
+    Returns:
+        a Pandas Series like get_entity
+    """
+    if not len(entity):
+        return pd.Series(name=name)
+
+    values = _entity_values(instance, entity)
+
+    # convert values of a scaled model back to original units
+    values *= _unscale_factor(instance, entity)
+    return pd.Series(values, index=_entity_index(entity, labels), name=name)
+
+
+def _entity_index(entity, labels):
+    """ Return the index of a Var or Constraint like get_entity does.
+
+    Args:
+        entity: a non-empty Var or Constraint
+        labels: list of domain set names, as returned by _get_onset_names
+
+    Returns:
+        a Pandas Index (or MultiIndex) in the order of entity.keys()
+    """
+    keys = list(entity.keys())
+
+    # unique index names, e.g. ['sit', 'sit', 'com'] -> ['sit', 'sit_', 'com']
+    labels = list(labels)
+    for k, label in enumerate(labels):
+        if label in labels[:k]:
+            labels[k] = labels[k] + "_"
+
+    if entity.dim() > 1:
+        return pd.MultiIndex.from_arrays(
+            [list(level) for level in zip(*keys)], names=labels)
+    elif entity.dim() == 1:
+        return pd.Index(keys, name=labels[0])
+    else:
+        return pd.Index(keys, name='None')
+
+
+def _solution_positions(instance, entity):
+    """ Return positions of the members of entity in the solution arrays.
+
+    Only solution arrays that the last solve loaded into the instance (see
+    HighsDirect) are used. Positions refer to the columns (Var) or rows
+    (Constraint) of instance.solution_arrays and are -1 for members missing
+    in the model matrix. They are cached in the solution arrays, which are
+    replaced by each solve.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        entity: a Var or Constraint of instance
+
+    Returns:
+        an integer array in the order of entity.values(), or None if no
+        loaded solution arrays are present
+    """
+    solution = getattr(instance, 'solution_arrays', None)
+    if not solution or not solution.get('loaded'):
+        return None
+    if 'lookup' not in solution:
+        lookup = {}
+        for members in (solution['variables'], solution['constraints']):
+            for position, member in enumerate(members):
+                lookup[id(member)] = position
+        solution['lookup'] = lookup
+        solution['positions'] = {}
+    cached = solution['positions'].get(entity.name)
+    if cached is None or len(cached) != len(entity):
+        lookup = solution['lookup']
+        cached = np.array([lookup.get(id(member), -1)
+                           for member in entity.values()], dtype=int)
+        solution['positions'][entity.name] = cached
+    return cached
+
+
+def _entity_values(instance, entity):
+    """ Return the values (or duals) of a Var or Constraint as an array.
+
+    Values are taken from the loaded solution arrays of the last solve if
+    present, otherwise from the variables and the dual suffix. Unset values
+    become NaN; like instance.dual[...], a missing dual raises KeyError.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        entity: a Var or Constraint of instance
+
+    Returns:
+        a float array in the order of entity.values(), in model units
+    """
+    is_constraint = isinstance(entity, pyomo.Constraint)
+    if is_constraint:
+        dual = instance.dual
+    positions = _solution_positions(instance, entity)
+    if positions is None:
+        if is_constraint:
+            values = [dual[c] for c in entity.values()]
+        else:
+            values = [v.value for v in entity.values()]
+        return np.array(values, dtype=float)
+
+    source = instance.solution_arrays['dual' if is_constraint else 'primal']
+    values = np.full(len(positions), np.nan)
+    found = positions >= 0
+    values[found] = source[positions[found]]
+    if not found.all():
+        # members that are not part of the model matrix
+        members = list(entity.values())
+        for k in np.flatnonzero(~found):
+            if is_constraint:
+                values[k] = dual[members[k]]
+            elif members[k].value is not None:
+                values[k] = members[k].value
+    return values
+
+
+def get_entities(instance, names):
+    """ Return one DataFrame with entities in columns and a common index.
+
+    Works only on entities that share a common domain (set or set_tuple), which
+    is used as index of the returned DataFrame.
+
+    Args:
+        instance: a Pyomo ConcreteModel instance
+        names: list of entity names (as returned by list_entities)
+
+    Returns:
+        a Pandas DataFrame with entities as columns and domains as index
+    """
+
+    df = pd.DataFrame()
+    for name in names:
+        other = get_entity(instance, name)
+
+        if df.empty:
+            df = other.to_frame()
+        else:
+            index_names_before = df.index.names
+
+            df = df.join(other, how='outer')
+
+            if index_names_before != df.index.names:
+                df.index.names = index_names_before
+
+    return df
+
+
+def list_entities(instance, entity_type):
+    """ Return list of sets, params, variables, constraints or objectives
+
+    Args:
+        instance: a Pyomo ConcreteModel object
+        entity_type: "set", "par", "var", "con" or "obj"
+
+    Returns:
+        DataFrame of entities
+
+    Example:
+        >>> data = read_excel('mimo-example.xlsx')
+        >>> model = create_model(data, range(1,25))
+        >>> list_entities(model, 'obj')  #doctest: +NORMALIZE_WHITESPACE
+                                         Description Domain
+        Name
+        obj   minimize(cost = sum of all cost types)     []
+
+    """
+
+    # helper function to discern entities by type
+    def filter_by_type(entity, entity_type):
+        if entity_type == 'set':
+            return isinstance(entity, pyomo.Set) and not entity.virtual
+        elif entity_type == 'par':
+            return isinstance(entity, pyomo.Param)
+        elif entity_type == 'var':
+            return isinstance(entity, pyomo.Var)
+        elif entity_type == 'con':
+            return isinstance(entity, pyomo.Constraint)
+        elif entity_type == 'obj':
+            return isinstance(entity, pyomo.Objective)
+        else:
+            raise ValueError("Unknown entity_type '{}'".format(entity_type))
+
+    # create entity iterator, using a python 2 and 3 compatible idiom:
+    # http://python3porting.com/differences.html#index-6
+    try:
+        iter_entities = instance.__dict__.iteritems()  # Python 2 compat
+    except AttributeError:
+        iter_entities = instance.__dict__.items()  # Python way
+
+    # now iterate over all entties and keep only those whose type matches
+    entities = sorted(
+        (name, entity.doc, _get_onset_names(entity))
+        for (name, entity) in iter_entities
+        if filter_by_type(entity, entity_type))
+
+    # if something was found, wrap tuples in DataFrame, otherwise return empty
+    if entities:
+        entities = pd.DataFrame(entities,
+                                columns=['Name', 'Description', 'Domain'])
+        entities.set_index('Name', inplace=True)
+    else:
+        entities = pd.DataFrame()
+    return entities
+
+
+def _get_onset_names(entity):
+    """ Return a list of domain set names for a given model entity
+    
+    Args:
+        entity: a member entity (i.e. a Set, Param, Var, Objective, Constraint)
+                of a Pyomo ConcreteModel object
+                
+    Returns:
+        list of domain set names for that entity
+        
+    Example:
+        >>> data = read_excel('mimo-example.xlsx')
+        >>> model = create_model(data, range(1,25))
+        >>> _get_onset_names(model.e_co_stock)
+        ['t', 'sit', 'com', 'com_type']
+    """
+    # get column titles for entities from domain set names
+    labels = []
+
+    if isinstance(entity, pyomo.Set):
+        if entity.dimen > 1:
+            # N-dimensional set tuples, possibly with nested set tuples within
+            if entity.domain:
+                # retreive list of domain sets, which itself could be nested
+                domains = entity.domain.set_tuple
+            else:
+                try:
+                    # if no domain attribute exists, some 
+                    domains = entity.set_tuple
+                except AttributeError:
+                    # if that fails, too, a constructed (union, difference, 
+                    # intersection, ...) set exists. In that case, the
+                    # attribute _setA holds the domain for the base set
+                    domains = entity._setA.domain.set_tuple
+
+            for domain_set in domains:
+                labels.extend(_get_onset_names(domain_set))
+
+        elif entity.dimen == 1:
+            if entity.domain:
+                # 1D subset; add domain name
+                labels.append(entity.domain.name)
+            else:
+                # unrestricted set; add entity name
+                labels.append(entity.name)
+        else:
+            # no domain, so no labels needed
+            pass
+
+    elif isinstance(entity, (pyomo.Param, pyomo.Var, pyomo.Constraint,
+                    pyomo.Objective)):
+        if entity.dim() > 0 and entity._index:
+            labels = _get_onset_names(entity._index)
+        else:
+            # zero dimensions, so no onset labels
+            pass
+
+    else:
+        raise ValueError("Unknown entity type!")
+
+    return labels
@@ -0,0 +1,300 @@
+"""urbs report: write result tables to spreadsheets and columnar files
+
+"""
+
+import os
+import pandas as pd
+import shutil
+import warnings
+
+from .tracing import _traced
+from .output import get_constants, get_marginal_costs, get_timeseries_batch
+
+
+def get_report_tables(instance, commodities=None, sites=None):
+    """Return all result tables that report writes
+
+    Args:
+        instance: a urbs model instance
+        commodities: optional list of commodities for which to collect
+            timeseries; default: all demand commodities
+        sites: optional list of sites for which to collect timeseries;
+            default: all sites
+
+    Returns:
+        (costs, cpro, ctra, csto, energy, timeseries) tuple of the constants
+        (see get_constants), the DataFrame of commodity sums (columns
+        'commodity.site') and a dict {(commodity, site): timeseries tableau}
+    """
+    if commodities is None:
+        commodities = sorted(instance.com_demand)
+    if sites is None:
+        sites = sorted(instance.sit)
+
+    # get the data
+    costs, cpro, ctra, csto = get_constants(instance)
+
+    # initialize timeseries tableaus
+    energies = []
+    timeseries = {}
+
+    # collect timeseries data, extracting each model entity only once
+    all_timeseries = get_timeseries_batch(instance, commodities, sites)
+    for co in commodities:
+        for sit in sites:
+            created, consumed, stored, imported, exported, derivative, dsm = all_timeseries[
+                (co, sit)]
+
+            overprod = pd.DataFrame(
+                columns=['Overproduction'],
+                data=created.sum(axis=1) - consumed.sum(axis=1) +
+                imported.sum(axis=1) - exported.sum(axis=1) +
+                stored['Retrieved'] - stored['Stored'])
+
+            tableau = pd.concat(
+                [created, consumed, stored, imported, exported, overprod, derivative, dsm],
+                axis=1,
+                keys=['Created', 'Consumed', 'Storage', 'Import from',
+                      'Export to', 'Balance', 'Derivative', 'DSM'])
+            timeseries[(co, sit)] = tableau
+
+            # timeseries sums
+            sums = pd.concat([created.sum(),
+                              consumed.sum(),
+                              stored.sum().drop('Level'),
+                              imported.sum(),
+                              exported.sum(),
+                              overprod.sum(),
+                              dsm.sum()], axis=0,
+                             keys=['Created', 'Consumed', 'Storage',
+                             'Import', 'Export', 'Balance', 'DSM'])
+            energies.append(sums.to_frame("{}.{}".format(co, sit)))
+
+    # concatenate Commodity sums
+    if energies:
+        energy = pd.concat(energies, axis=1).fillna(0)
+    else:
+        energy = pd.DataFrame()
+    return costs, cpro, ctra, csto, energy, timeseries
+
+
+@_traced('report')
+def report(instance, filename, commodities=None, sites=None,
+           max_timesteps=None):
+    """Write result summary to a spreadsheet file
+
+    Args:
+        instance: a urbs model instance
+        filename: Excel spreadsheet filename, will be overwritten if exists
+        commodities: optional list of commodities for which to write timeseries
+        sites: optional list of sites for which to write timeseries
+        max_timesteps: optional maximum number of timesteps per timeseries
+            and marginal costs sheet, longer timeseries are cut off;
+            default: no limit. Use
+            report_store for complete timeseries of long runs.
+
+    Returns:
+        Nothing
+    """
+    costs, cpro, ctra, csto, energy, timeseries = get_report_tables(
+        instance, commodities, sites)
+
+    # create spreadsheet writer object
+    with pd.ExcelWriter(filename) as writer:
+
+        # write constants to spreadsheet
+        costs.to_frame().to_excel(writer, 'Costs')
+        cpro.to_excel(writer, 'Process caps')
+        ctra.to_excel(writer, 'Transmission caps')
+        csto.to_excel(writer, 'Storage caps')
+
+        # write marginal costs (if the model has duals)
+        prices, limits = get_marginal_costs(instance)
+        if not prices.empty:
+            if max_timesteps is not None and len(prices) > max_timesteps:
+                warnings.warn("report: marginal costs cut off after {} "
+                              "timesteps".format(max_timesteps))
+                prices = prices.iloc[:max_timesteps]
+            prices.to_excel(writer, 'Marginal costs')
+        if not limits.empty:
+            limits.to_excel(writer, 'Shadow prices', index=False)
+
+        # write timeseries data (if any)
+        if timeseries:
+            energy.to_excel(writer, 'Commodity sums')
+    
+            # write timeseries to individual sheets
+            for (co, sit), tableau in sorted(timeseries.items()):
+                if max_timesteps is not None and len(tableau) > max_timesteps:
+                    warnings.warn("report: timeseries {}.{} cut off after {} "
+                                  "timesteps".format(co, sit, max_timesteps))
+                    tableau = tableau.iloc[:max_timesteps]
+                # sheet names cannot be longer than 31 characters...
+                sheet_name = "{}.{} timeseries".format(co, sit)[:31]
+                tableau.to_excel(writer, sheet_name)
+
+
+def _tidy_timeseries(timeseries):
+    """Convert a dict of timeseries tableaus to one long-format DataFrame.
+
+    Returns:
+        DataFrame with columns 'com', 'sit', 't', 'group', 'name', 'value'
+    """
+    frames = []
+    for (co, sit), tableau in sorted(timeseries.items()):
+        if tableau.empty:
+            continue
+        tidy = tableau.copy()
+        tidy.index.name = 't'
+        tidy.columns = pd.MultiIndex.from_tuples(
+            [(str(group), str(name)) for group, name in tidy.columns],
+            names=['group', 'name'])
+        tidy = tidy.stack(['group', 'name']).rename('value').reset_index()
+        tidy['com'] = co
+        tidy['sit'] = sit
+        frames.append(tidy)
+    if not frames:
+        return pd.DataFrame(
+            columns=['com', 'sit', 't', 'group', 'name', 'value'])
+    tidy = pd.concat(frames, ignore_index=True)
+    return tidy[['com', 'sit', 't', 'group', 'name', 'value']]
+
+
+def _write_table(df, path, fmt, partition_cols=None):
+    """Write DataFrame df (with a default index) to a columnar file.
+
+    For fmt 'parquet', partitioning is done by pandas/pyarrow. For fmt
+    'feather', which has no partitioning, one file per partition is written
+    to the equivalent directory structure, e.g. path/com=Elec/sit=Mid.
+    """
+    if fmt == 'parquet':
+        if partition_cols:
+            df.to_parquet(path, partition_cols=partition_cols, index=False)
+        else:
+            df.to_parquet(path + '.parquet', index=False)
+    elif fmt == 'feather':
+        if partition_cols:
+            for key, part in df.groupby(partition_cols):
+                if not isinstance(key, tuple):
+                    key = (key,)
+                part_dir = os.path.join(path, *['{}={}'.format(col, val)
+                    for col, val in zip(partition_cols, key)])
+                if not os.path.exists(part_dir):
+                    os.makedirs(part_dir)
+                part.drop(partition_cols, axis=1).reset_index(drop=True) \
+                    .to_feather(os.path.join(part_dir, 'data.feather'))
+        else:
+            df.reset_index(drop=True).to_feather(path + '.feather')
+    else:
+        raise ValueError("Unknown format '{}'".format(fmt))
+
+
+@_traced('report_store')
+def report_store(instance, directory, commodities=None, sites=None,
+                 fmt='parquet'):
+    """Write result summary to a directory of columnar binary files
+
+    Writes the same costs, capacities, marginal costs, commodity sums and
+    timeseries as report, but as one table per file in a columnar format (Parquet or
+    Feather, requires pyarrow). Timeseries of all commodities and sites are
+    stored in one long-format dataset, partitioned by commodity and site.
+    This is much faster and more compact than Excel for long timeseries.
+
+    Args:
+        instance: a urbs model instance
+        directory: output directory, is replaced if it exists
+        commodities: optional list of commodities for which to write timeseries
+        sites: optional list of sites for which to write timeseries
+        fmt: 'parquet' (default) or 'feather'
+
+    Returns:
+        Nothing
+    """
+    costs, cpro, ctra, csto, energy, timeseries = get_report_tables(
+        instance, commodities, sites)
+
+    def tidy_constant(df):
+        df = df.reset_index()
+        df.columns = [str(col) for col in df.columns]
+        return df
+
+    tables = [('costs', tidy_constant(costs.to_frame())),
+              ('process_caps', tidy_constant(cpro)),
+              ('transmission_caps', tidy_constant(ctra)),
+              ('storage_caps', tidy_constant(csto))]
+
+    # commodity sums in long format: group, name, com, sit, value
+    if not energy.empty:
+        energy = energy.copy()
+        energy.columns = pd.MultiIndex.from_tuples(
+            [tuple(col.split('.', 1)) for col in energy.columns],
+            names=['com', 'sit'])
+        energy.index.names = ['group', 'name']
+        energy = energy.stack(['com', 'sit']).rename('value').reset_index()
+        energy['name'] = energy['name'].astype(str)
+        tables.append(('commodity_sums', energy))
+
+    # marginal costs in long format: t, sit, com, value
+    prices, limits = get_marginal_costs(instance)
+    if not prices.empty:
+        prices = prices.stack(['sit', 'com']).rename('value').reset_index()
+        tables.append(('marginal_costs', prices))
+    if not limits.empty:
+        tables.append(('shadow_prices', limits))
+
+    # write to a temporary directory first and move it into place, so that a
+    # rerun replaces an earlier (possibly partial) store instead of adding
+    # files to it, e.g. further parts of the partitioned timeseries; the
+    # leading dot hides it from globs like the one in comp.py
+    parent, base = os.path.split(os.path.normpath(directory))
+    temp_dir = os.path.join(parent, '.{}.tmp'.format(base))
+    if os.path.exists(temp_dir):
+        shutil.rmtree(temp_dir)
+    os.makedirs(temp_dir)
+    try:
+        for table, df in tables:
+            _write_table(df, os.path.join(temp_dir, table), fmt)
+        _write_table(_tidy_timeseries(timeseries),
+                     os.path.join(temp_dir, 'timeseries'), fmt,
+                     partition_cols=['com', 'sit'])
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.rename(temp_dir, directory)
+
+
+def read_store_table(directory, table):
+    """Read one table of a result store written by report_store
+
+    Args:
+        directory: result store directory
+        table: table name, e.g. 'costs', 'commodity_sums' or 'timeseries'
+
+    Returns:
+        a DataFrame in long format, as written by report_store
+    """
+    path = os.path.join(directory, table)
+    if os.path.exists(path + '.parquet'):
+        return pd.read_parquet(path + '.parquet')
+    if os.path.exists(path + '.feather'):
+        return pd.read_feather(path + '.feather')
+    if os.path.isdir(path):
+        # partitioned dataset, e.g. path/com=Elec/sit=Mid; Feather partitions
+        # are read one by one and the partition columns are rebuilt from the
+        # directory names, as pyarrow does for Parquet
+        parts = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            if 'data.feather' not in files:
+                continue
+            part = pd.read_feather(os.path.join(root, 'data.feather'))
+            for level in os.path.relpath(root, path).split(os.sep):
+                col, val = level.split('=', 1)
+                part[col] = val
+            parts.append(part)
+        if parts:
+            return pd.concat(parts, ignore_index=True)
+        return pd.read_parquet(path)
+    raise IOError("No table '{}' in result store {}".format(table, directory))
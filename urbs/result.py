@@ -0,0 +1,127 @@
+"""urbs result: a solved model instance without the Pyomo model
+
+Result reads input DataFrames and entity values from arrays written by
+save (or built by solution_result).
+
+"""
+
+import json
+import numpy as np
+import pandas as pd
+
+
+class Result(object):
+    """Solution of a urbs model instance, without the Pyomo model.
+
+    A lightweight stand-in for a solved model instance, as returned by load.
+    Input DataFrames (e.g. demand or transmission) and set elements (e.g.
+    sit or com_demand) are attributes like on the model instance. The values
+    of sets, variables, objective and constraint duals are read from the
+    archive on first access with get_entity. get_entities, get_constants,
+    get_timeseries, report, plot and result_figures accept a Result in place
+    of a model instance.
+
+    Args:
+        archive: a dict-like of arrays written by save (e.g. a NpzFile)
+    """
+
+    def __init__(self, archive):
+        self._archive = archive
+        meta = json.loads(archive['meta'].item())
+        self._meta = meta
+        self._series = {}
+        self._sets = {}
+        self.name = meta['name']
+        self.created = meta['created']
+        self.scale = meta['scale']
+        for frame in meta['frames']:
+            setattr(self, frame, _arrays_to_frame(
+                archive, 'frame.' + frame, meta['frames'][frame]))
+        # timestep length and annualisation factor m.weight of the model;
+        # old archives lack them, so weight is derived like in create_model
+        self.dt = meta.get('dt', 1.0)
+        self.weight = meta.get('weight')
+        if self.weight is None:
+            self.weight = float(8760) / (len(self.tm) * self.dt)
+
+    def __getattr__(self, name):
+        # set elements, loaded on first access
+        if name.startswith('_') or name not in self._meta['sets']:
+            raise AttributeError(name)
+        if name not in self._sets:
+            index = self.get_entity(name).index
+            if isinstance(index, pd.MultiIndex):
+                self._sets[name] = list(index)
+            else:
+                self._sets[name] = index.tolist()
+        return self._sets[name]
+
+    def list_entities(self):
+        """Return the names of all entities in the archive."""
+        return sorted(self._meta['entities'])
+
+    def get_entity(self, name):
+        """Return the values of an entity like get_entity."""
+        if name not in self._series:
+            try:
+                meta = self._meta['entities'][name]
+            except KeyError:
+                raise KeyError("Entity '{}' is not in the archive".format(
+                    name))
+            self._series[name] = _arrays_to_series(
+                self._archive, 'entity.' + name, meta)
+        return self._series[name].copy()
+
+
+def _from_array(array, kind):
+    """Convert an array from _to_array back to a list of values."""
+    if kind == 'json':
+        return [json.loads(v) for v in array.tolist()]
+    return array.tolist()
+
+
+def _arrays_to_series(archive, key, meta):
+    """Decode a Series encoded by _series_to_arrays."""
+    values = archive[key + '.values']
+    if meta['sparse']:
+        dense = np.zeros(meta['length'])
+        dense[archive[key + '.nonzero']] = values
+        values = dense
+
+    levels = []
+    for k, kind in enumerate(meta['levels']):
+        uniques = np.empty(len(archive['{}.uniques{}'.format(key, k)]),
+                           dtype=object)
+        uniques[:] = _from_array(archive['{}.uniques{}'.format(key, k)],
+                                 kind)
+        levels.append(uniques[archive['{}.codes{}'.format(key, k)]])
+
+    if not meta['length']:
+        return pd.Series(name=meta['name'])
+    if len(levels) > 1:
+        index = pd.MultiIndex.from_arrays(levels, names=meta['names'])
+    else:
+        index = pd.Index(levels[0].tolist(), name=meta['names'][0])
+    return pd.Series(values, index=index, name=meta['name'])
+
+
+def _arrays_to_frame(archive, key, meta):
+    """Decode a DataFrame encoded by _frame_to_arrays."""
+    levels = [_from_array(archive['{}.index{}'.format(key, k)], kind)
+              for k, kind in enumerate(meta['index'])]
+    if len(levels) > 1:
+        index = pd.MultiIndex.from_arrays(levels, names=meta['index_names'])
+    else:
+        index = pd.Index(levels[0], name=meta['index_names'][0])
+
+    columns = [tuple(c) if isinstance(c, list) else c
+               for c, kind in meta['columns']]
+    data = [_from_array(archive['{}.column{}'.format(key, k)], kind)
+            for k, (c, kind) in enumerate(meta['columns'])]
+    df = pd.DataFrame(dict(zip(range(len(data)), data)), index=index)
+    if len(meta['column_names']) > 1:
+        df.columns = pd.MultiIndex.from_tuples(
+            columns, names=meta['column_names'])
+    else:
+        df.columns = pd.Index(columns, name=meta['column_names'][0])
+    return df
@@ -0,0 +1,323 @@
+"""urbs save and load: compact result archives
+
+save stores input DataFrames and entity values as compressed arrays, load
+returns them as a Result.
+
+"""
+
+import json
+import numbers
+import numpy as np
+import os
+import pandas as pd
+import pyomo.core as pyomo
+from itertools import chain
+
+from .tracing import _traced
+from .modelhelper import _unscale_factor
+from .result import Result
+from .pyomoio import (get_entity, list_entities, _entity_index,
+                      _get_onset_names)
+
+
+# input DataFrames that are attached to a model instance and stored in result
+# archives (see save); hacks is only present if the input has a Hacks sheet
+_INPUT_FRAMES = ('commodity', 'process', 'process_commodity', 'transmission',
+                 'storage', 'demand', 'supim', 'buy_sell_price', 'dsm',
+                 'hacks')
+
+
+def _to_array(values):
+    """Convert a list of values to a NumPy array without object dtype.
+
+    Only values of one kind (all strings, all booleans or all numbers) are
+    stored as a plain array. Mixed columns, e.g. commodity prices that mix
+    numbers with strings like '1.25xBuy', are JSON encoded per value, as
+    NumPy would otherwise convert all of them to strings.
+
+    Returns:
+        (array, kind) tuple; kind 'json' marks JSON encoded values of mixed
+        or non-numeric types
+    """
+    kinds = set(_value_kind(v) for v in values)
+    if len(kinds) <= 1 and 'other' not in kinds:
+        return np.asarray(values), 'array'
+    return np.array([json.dumps(_to_python(v)) for v in values]), 'json'
+
+
+def _value_kind(value):
+    """Return 'str', 'bool', 'number' or 'other' for a single value."""
+    if isinstance(value, (str, np.str_)):
+        return 'str'
+    if isinstance(value, (bool, np.bool_)):
+        return 'bool'
+    if isinstance(value, (numbers.Number, np.number)):
+        return 'number'
+    return 'other'
+
+
+def _to_python(value):
+    """Convert NumPy scalars to Python scalars for JSON encoding."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _series_to_arrays(series, key):
+    """Encode a Series as a dict of compact arrays and metadata.
+
+    Each index level is stored as its unique values and integer codes. If
+    most values are zero, only positions and values of non-zeros are stored.
+
+    Args:
+        series: a Series as returned by get_entity
+        key: prefix for the array names
+
+    Returns:
+        (arrays, meta) tuple of a dict of arrays and a JSON-able dict
+    """
+    arrays = {}
+    meta = {'name': series.name, 'length': len(series), 'levels': [],
+            'names': list(series.index.names)}
+    for k in range(series.index.nlevels):
+        codes, uniques = pd.factorize(series.index.get_level_values(k))
+        uniques = list(uniques)
+        if (codes < 0).any():
+            # missing labels (e.g. the index of scalar entities) become None
+            codes = np.where(codes < 0, len(uniques), codes)
+            uniques.append(None)
+        uniques, kind = _to_array(uniques)
+        arrays['{}.codes{}'.format(key, k)] = codes.astype(
+            np.min_scalar_type(max(len(uniques), 1)))
+        arrays['{}.uniques{}'.format(key, k)] = uniques
+        meta['levels'].append(kind)
+
+    values = series.values.astype(float)
+    nonzero = np.flatnonzero(values)
+    meta['sparse'] = len(nonzero) < len(values) / 2
+    if meta['sparse']:
+        arrays[key + '.nonzero'] = nonzero.astype(
+            np.min_scalar_type(max(len(values), 1)))
+        values = values[nonzero]
+    arrays[key + '.values'] = values
+    return arrays, meta
+
+
+def _frame_to_arrays(df, key):
+    """Encode an input DataFrame as a dict of column arrays and metadata."""
+    arrays = {}
+    meta = {'index': [], 'index_names': list(df.index.names),
+            'columns': [], 'column_names': list(df.columns.names)}
+    for k in range(df.index.nlevels):
+        values, kind = _to_array(list(df.index.get_level_values(k)))
+        arrays['{}.index{}'.format(key, k)] = values
+        meta['index'].append(kind)
+    for k, column in enumerate(df.columns):
+        values, kind = _to_array(list(df[column]))
+        arrays['{}.column{}'.format(key, k)] = values
+        meta['columns'].append([_to_python(column), kind])
+    return arrays, meta
+
+
+@_traced('encode_result')
+def _result_arrays(prob, names):
+    """Encode input DataFrames and entities as arrays for a Result.
+
+    Args:
+        prob: a urbs model instance (or a Result)
+        names: names of the entities to encode
+
+    Returns:
+        (arrays, meta) tuple of a dict of arrays and a JSON-able dict
+    """
+    arrays = {}
+    meta = {'version': 1, 'name': prob.name, 'created': prob.created,
+            'scale': getattr(prob, 'scale', None) or
+            {'power': 1.0, 'cost': 1.0},
+            'dt': float(pyomo.value(prob.dt)),
+            'weight': float(pyomo.value(prob.weight)),
+            'frames': {}, 'entities': {}, 'sets': []}
+    for frame in _INPUT_FRAMES:
+        df = getattr(prob, frame, None)
+        if df is None:
+            continue
+        frame_arrays, meta['frames'][frame] = _frame_to_arrays(
+            df, 'frame.' + frame)
+        arrays.update(frame_arrays)
+    for name in names:
+        entity_arrays, meta['entities'][name] = _series_to_arrays(
+            get_entity(prob, name), 'entity.' + name)
+        arrays.update(entity_arrays)
+        if isinstance(prob, Result):
+            if name in prob._meta['sets']:
+                meta['sets'].append(name)
+        elif isinstance(getattr(prob, name), pyomo.Set):
+            meta['sets'].append(name)
+    return arrays, meta
+
+
+def solution_index(instance):
+    """Precompute the index arrays of all variable and constraint families.
+
+    For each family, the index is encoded like in save (unique values and
+    integer codes per level), together with the positions of its members in
+    the columns (variables) or rows (constraints) of instance.solution_arrays
+    (-1 for members missing in the model matrix). The result is cached on the
+    instance, so that repeated solves of the same model reuse it.
+
+    Args:
+        instance: a urbs model instance with solution_arrays (see
+            HighsDirect)
+
+    Returns:
+        a dict {name: (arrays, meta, positions, source, factor)} with source
+        'primal' or 'dual' and the factor to original units
+    """
+    solution = instance.solution_arrays
+    shape = (len(solution['variables']), len(solution['constraints']))
+    cached = getattr(instance, '_solution_index', None)
+    if cached is not None and cached[0] == shape:
+        return cached[1]
+
+    positions = {}
+    for members in (solution['variables'], solution['constraints']):
+        for position, member in enumerate(members):
+            positions[id(member)] = position
+
+    families = [(entity, 'primal') for entity in
+                instance.component_objects(pyomo.Var, active=True)]
+    if hasattr(instance, 'dual'):
+        families.extend((entity, 'dual') for entity in
+                        instance.component_objects(pyomo.Constraint,
+                                                   active=True))
+    index = {}
+    for entity, source in families:
+        # the index is built once like in get_entity, without values
+        key = 'entity.' + entity.name
+        if len(entity):
+            series = pd.Series(
+                0.0, name=entity.name,
+                index=_entity_index(entity, _get_onset_names(entity)))
+        else:
+            series = pd.Series(name=entity.name)
+        arrays, meta = _series_to_arrays(series, key)
+        del arrays[key + '.values']
+        arrays.pop(key + '.nonzero', None)
+        meta['sparse'] = False
+        index[entity.name] = (
+            arrays, meta,
+            np.array([positions.get(id(member), -1)
+                      for member in entity.values()], dtype=int),
+            source, _unscale_factor(instance, entity))
+
+    instance._solution_index = (shape, index)
+    return index
+
+
+def solution_result(instance):
+    """Return a Result of the solution arrays attached to a model instance.
+
+    Values of all variables (and duals, if the instance has a dual suffix)
+    are taken from instance.solution_arrays (see HighsDirect with
+    load_solutions=False) using the cached index arrays of solution_index,
+    without reading or writing the Pyomo variables. The Result can be passed
+    to get_timeseries, report, plot etc. in place of the instance.
+
+    Args:
+        instance: a urbs model instance with solution_arrays
+
+    Returns:
+        a Result object
+
+    Example:
+        >>> optim = HighsDirect()
+        >>> result = optim.solve(prob, load_solutions=False)
+        >>> report(solution_result(prob), 'report.xlsx', ...)
+    """
+    solution = instance.solution_arrays
+    arrays, meta = _result_arrays(
+        instance, list(list_entities(instance, 'set').index))
+
+    for name, (index_arrays, index_meta, positions, source, factor) in \
+            solution_index(instance).items():
+        values = np.full(len(positions), np.nan)
+        found = positions >= 0
+        values[found] = solution[source][positions[found]]
+        arrays.update(index_arrays)
+        arrays['entity.{}.values'.format(name)] = values * factor
+        meta['entities'][name] = index_meta
+
+    objective = next(instance.component_objects(pyomo.Objective,
+                                                active=True))
+    obj_arrays, meta['entities'][objective.name] = _series_to_arrays(
+        pd.Series([solution.get('objective', np.nan)],
+                  index=pd.Index([None], name='None'), name=objective.name) *
+        _unscale_factor(instance, objective),
+        'entity.' + objective.name)
+    arrays.update(obj_arrays)
+
+    arrays['meta'] = np.array(json.dumps(meta))
+    return Result(arrays)
+
+
+@_traced('save')
+def save(prob, filename):
+    """Save the input data and results of a urbs model instance to a file.
+
+    Instead of pickling the whole Pyomo model, only the input DataFrames, the
+    elements of all sets and the values of all variables, the objective and
+    (if present) the constraint duals are stored, as compressed NumPy arrays
+    in a zip archive (see numpy.savez_compressed). Index levels are stored as
+    integer codes of their unique values; mostly-zero values are stored
+    sparsely. Use load to read the file into a lightweight Result object.
+
+    Args:
+        prob: a urbs model instance (or a Result)
+        filename: archive file to be written
+
+    Returns:
+        Nothing
+    """
+    if isinstance(prob, Result):
+        names = prob.list_entities()
+    else:
+        names = list(chain(*(list_entities(prob, entity_type).index
+                             for entity_type in ('set', 'var', 'obj'))))
+        if hasattr(prob, 'dual'):
+            names.extend(list_entities(prob, 'con').index)
+
+    arrays, meta = _result_arrays(prob, names)
+    arrays['meta'] = np.array(json.dumps(meta))
+
+    # write to a temporary file first, so that an interrupted save never
+    # leaves a partial archive behind; a file handle keeps numpy from
+    # appending the extension .npz
+    with open(filename + '.tmp', 'wb') as file_handle:
+        np.savez_compressed(file_handle, **arrays)
+    replace = getattr(os, 'replace', os.rename)  # Python 2 compat
+    replace(filename + '.tmp', filename)
+
+
+def load(filename):
+    """Load the results of a urbs model instance from a file written by save
+
+    Entities are read from the file on first access. Files written by
+    earlier versions of save (gzip'ed pickles of the whole model instance)
+    are loaded as model instance.
+
+    Args:
+        filename: archive file
+
+    Returns:
+        prob: a Result object (or the unpickled urbs model instance)
+    """
+    import zipfile
+    if zipfile.is_zipfile(filename):
+        return Result(np.load(filename))
+
+    import gzip
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    with gzip.GzipFile(filename, 'r') as file_handle:
+        prob = pickle.load(file_handle)
+    return prob
@@ -0,0 +1,451 @@
+"""urbs solver interface: solver metrics and in-memory HiGHS
+
+solve collects solver statistics from the Pyomo result and the solver log;
+HighsDirect passes the model matrix (see model_matrix) to HiGHS directly.
+
+"""
+
+import numpy as np
+import os
+import pandas as pd
+import pyomo.core as pyomo
+import time
+
+from .tracing import trace_span
+
+
+# Solver metrics
+
+# patterns of solver log lines: solver -> list of (metric, regex, type); for
+# metrics matched several times (e.g. iteration counters), the last match
+# counts. Regexes with several groups yield one metric per group.
+_SOLVER_LOG_PATTERNS = {
+    'glpk': [
+        (('rows', 'columns', 'nonzeros'),
+         r'^Reading problem data from .*\n(\d+) rows, (\d+) columns, '
+         r'(\d+) non-zeros', int),
+        (('presolved_rows', 'presolved_columns', 'presolved_nonzeros'),
+         r'^Preprocessing\.\.\.\n\s*(\d+) rows, (\d+) columns, '
+         r'(\d+) non-zeros', int),
+        ('iterations', r'^[*+ ]\s*(\d+): ', int),
+        ('objective', r'^[* ]\s*\d+: obj =\s*(\S+)', float),
+        ('status', r'^((?:INTEGER )?OPTIMAL.*FOUND|PROBLEM HAS NO .*|'
+                   r'.*UNBOUNDED.*|TIME LIMIT EXCEEDED.*)$', str),
+        ('gap', r'^\+\s*\d+: mip = .* (\d+\.?\d*)% \(', float),
+        ('solve_time', r'^Time used:\s*(\S+) secs', float)],
+    'cbc': [
+        (('presolved_rows', 'presolved_columns', 'presolved_nonzeros'),
+         r'^Presolve (\d+) \([-\d]+\) rows, (\d+) \([-\d]+\) columns '
+         r'and (\d+) \([-\d]+\) elements', int),
+        ('iterations', r'(?:^Total iterations:\s*|- )(\d+) ?(?:iterations)?$',
+         int),
+        ('objective', r'^Objective value:\s*(\S+)', float),
+        ('status', r'^Result - (.*)$', str),
+        ('gap', r'^Gap:\s*(\S+)', float),
+        ('solve_time', r'^Time \(Wallclock seconds\):\s*(\S+)', float)],
+    'highs': [
+        (('rows', 'columns', 'nonzeros'),
+         r'^\w+\s+has (\d+) rows; (\d+) cols; (\d+) (?:matrix )?nonzeros',
+         int),
+        (('presolved_rows', 'presolved_columns', 'presolved_nonzeros'),
+         r'^Presolve : Reductions: rows (\d+)\(-?\d+\); columns '
+         r'(\d+)\(-?\d+\); elements (\d+)\(-?\d+\)', int),
+        ('iterations', r'^Simplex\s+iterations:\s*(\d+)', int),
+        ('ipm_iterations', r'^IPM\s+iterations:\s*(\d+)', int),
+        ('objective', r'^Objective value\s*:\s*(\S+)', float),
+        ('status', r'^Model\s+status\s*:\s*(.*)$', str),
+        ('gap', r'^\s*Gap\s*:\s*(\S+)%', float),
+        ('solve_time', r'^HiGHS run time\s*:\s*(\S+)', float)]}
+
+
+def _solver_family(name):
+    """Return the key of _SOLVER_LOG_PATTERNS for a solver name, or None."""
+    for family in _SOLVER_LOG_PATTERNS:
+        if family in (name or '').lower():
+            return family
+    return None
+
+
+def parse_solver_log(text, solver):
+    """Extract solver statistics from the log output of a solver.
+
+    Args:
+        text: solver log as string
+        solver: solver name, e.g. 'glpk', 'cbc' or 'highs'
+
+    Returns:
+        a dict with (some of) the keys rows, columns, nonzeros,
+        presolved_rows, presolved_columns, presolved_nonzeros, iterations,
+        objective, status, gap and solve_time; empty for unknown solvers
+    """
+    import re
+
+    metrics = {}
+    for keys, pattern, convert in _SOLVER_LOG_PATTERNS.get(
+            _solver_family(solver), []):
+        matches = re.findall(pattern, text, re.MULTILINE)
+        if not matches:
+            continue
+        values = matches[-1]
+        if isinstance(keys, str):
+            keys, values = (keys,), (values,)
+        for key, value in zip(keys, values):
+            try:
+                metrics[key] = convert(value.strip())
+            except ValueError:
+                pass
+    return metrics
+
+
+def _result_value(container, key):
+    """Return a value of a Pyomo results container, None if undefined."""
+    try:
+        value = getattr(container, key)
+    except (AttributeError, KeyError):
+        return None
+    if value is None or str(value) == '<undefined>':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def solver_metrics(result):
+    """Extract solver statistics from a Pyomo results object.
+
+    Args:
+        result: the return value of optim.solve
+
+    Returns:
+        a dict with the keys solver_status, termination, lower_bound,
+        upper_bound, rows, columns, nonzeros and solver_time (None where the
+        solver interface does not report a value)
+    """
+    problem = result.problem[0] if len(result.problem) else None
+    metrics = {
+        'solver_status': _result_value(result.solver, 'status'),
+        'termination': _result_value(result.solver, 'termination_condition'),
+        'solver_time': _result_value(result.solver, 'time')}
+    for key, name in (('lower_bound', 'lower_bound'),
+                      ('upper_bound', 'upper_bound'),
+                      ('rows', 'number_of_constraints'),
+                      ('columns', 'number_of_variables'),
+                      ('nonzeros', 'number_of_nonzeros')):
+        metrics[key] = _result_value(problem, name) if problem else None
+    return metrics
+
+
+def solve(instance, optim, logfile=None, **kwds):
+    """Solve a model instance and collect solver metrics.
+
+    The solver output is written to logfile, which is parsed for solver
+    statistics (see parse_solver_log) after the solve. Together with the
+    statistics of the Pyomo results object (see solver_metrics) and the
+    measured wall time, they form one flat metrics record.
+
+    Args:
+        instance: a urbs model instance
+        optim: a Pyomo solver object, e.g. SolverFactory('glpk')
+        logfile: optional solver log file; default: a temporary file
+        **kwds: keyword arguments are forwarded to optim.solve
+
+    Returns:
+        (result, metrics) tuple of the solver result and a dict of metrics
+    """
+    import tempfile
+
+    temporary = logfile is None
+    if temporary:
+        handle, logfile = tempfile.mkstemp(suffix='.log')
+        os.close(handle)
+
+    # solution arrays of an earlier HighsDirect solve become outdated
+    if hasattr(instance, 'solution_arrays'):
+        instance.solution_arrays['loaded'] = False
+
+    wall = time.time()
+    try:
+        with trace_span('solve'):
+            result = optim.solve(instance, logfile=logfile, **kwds)
+        try:
+            with open(logfile) as file_handle:
+                log = file_handle.read()
+        except (IOError, OSError):
+            log = ''
+    finally:
+        if temporary:
+            os.remove(logfile)
+
+    metrics = {'solver': optim.name, 'wall': time.time() - wall}
+    metrics.update(solver_metrics(result))
+    # values parsed from the log take precedence over unset ones
+    for key, value in parse_solver_log(log, optim.name).items():
+        if metrics.get(key) is None:
+            metrics[key] = value
+    if not temporary:
+        metrics['log'] = logfile
+    return result, metrics
+
+
+def solver_metrics_table(records):
+    """Aggregate solver metrics of several solves into one DataFrame.
+
+    Args:
+        records: dict {scenario name: metrics dict, as returned by solve}
+
+    Returns:
+        a DataFrame with one row per scenario and one column per metric,
+        sorted by descending wall time
+    """
+    table = pd.DataFrame.from_dict(records, orient='index')
+    table.index.name = 'scenario'
+    if 'wall' in table.columns:
+        table = table.sort_values('wall', ascending=False)
+    return table
+
+
+# Direct HiGHS interface
+
+def model_matrix(instance):
+    """Return the LP of a model instance as sparse row-wise arrays.
+
+    Args:
+        instance: a urbs model instance
+
+    Returns:
+        a dict with the lists 'variables' and 'constraints' of Pyomo
+        component data (in column and row order), the arrays 'cost',
+        'col_lower', 'col_upper', 'row_lower', 'row_upper' and the
+        row-wise sparse matrix 'start', 'index', 'value', the objective
+        'offset' and 'sense' (1: minimize, -1: maximize)
+    """
+    from pyomo.repn import generate_standard_repn
+
+    columns = {}
+    variables = []
+
+    def column_indices(linear_vars):
+        indices = []
+        for var in linear_vars:
+            if id(var) not in columns:
+                columns[id(var)] = len(variables)
+                variables.append(var)
+            indices.append(columns[id(var)])
+        return indices
+
+    constraints, start, index, value = [], [0], [], []
+    row_lower, row_upper = [], []
+    for con in instance.component_data_objects(pyomo.Constraint,
+                                               active=True):
+        repn = generate_standard_repn(con.body)
+        if repn.nonlinear_expr is not None or repn.quadratic_vars:
+            raise ValueError("Constraint {} is not linear".format(con.name))
+        constant = pyomo.value(repn.constant)
+        index.extend(column_indices(repn.linear_vars))
+        value.extend(pyomo.value(c) for c in repn.linear_coefs)
+        start.append(len(index))
+        row_lower.append(-np.inf if con.lower is None
+                         else pyomo.value(con.lower) - constant)
+        row_upper.append(np.inf if con.upper is None
+                         else pyomo.value(con.upper) - constant)
+        constraints.append(con)
+
+    objective = next(instance.component_data_objects(pyomo.Objective,
+                                                     active=True))
+    repn = generate_standard_repn(objective.expr)
+    objective_columns = column_indices(repn.linear_vars)
+    cost = np.zeros(len(variables))
+    np.add.at(cost, objective_columns,
+              [pyomo.value(c) for c in repn.linear_coefs])
+
+    col_lower = np.array([-np.inf if v.lb is None else v.lb
+                          for v in variables], dtype=float)
+    col_upper = np.array([np.inf if v.ub is None else v.ub
+                          for v in variables], dtype=float)
+    fixed = np.array([v.fixed for v in variables], dtype=bool)
+    if fixed.any():
+        fixed_values = [v.value for v, f in zip(variables, fixed) if f]
+        col_lower[fixed] = fixed_values
+        col_upper[fixed] = fixed_values
+
+    return {
+        'variables': variables, 'constraints': constraints,
+        'cost': cost, 'col_lower': col_lower, 'col_upper': col_upper,
+        'row_lower': np.array(row_lower, dtype=float),
+        'row_upper': np.array(row_upper, dtype=float),
+        'start': np.array(start, dtype=np.int32),
+        'index': np.array(index, dtype=np.int32),
+        'value': np.array(value, dtype=float),
+        'offset': pyomo.value(repn.constant),
+        'sense': 1 if objective.sense == pyomo.minimize else -1}
+
+
+class HighsDirect(object):
+    """Solve model instances with HiGHS in memory, without an LP file.
+
+    The model matrix (see model_matrix) is passed to HiGHS via highspy. The
+    primal and dual values are read back as NumPy arrays and attached to the
+    instance as instance.solution_arrays (a dict with keys 'primal', 'dual',
+    'objective', 'variables', 'constraints' and 'loaded'), and loaded into
+    the variables and (if present) the dual suffix. While 'loaded' is set,
+    get_entity reads the values in bulk from these arrays; solve resets it
+    when another solver is used. Usable like a Pyomo solver
+    object, e.g. with solve or solve_lazy. With load_solutions=False, the
+    variables are left untouched; solution_result then returns the solution
+    as a Result.
+
+    Usage:
+        optim = HighsDirect()
+        optim.set_options('threads=4')
+        result = optim.solve(prob)
+    """
+
+    name = 'highs_direct'
+
+    def __init__(self, **options):
+        self.options = dict(options)
+
+    def set_options(self, option):
+        """Set a HiGHS option from a string 'name=value'."""
+        key, value = option.split('=', 1)
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                pass
+        self.options[key.strip()] = value
+
+    def available(self, exception_flag=False):
+        try:
+            import highspy
+        except ImportError:
+            if exception_flag:
+                raise
+            return False
+        return True
+
+    def solve(self, instance, tee=False, logfile=None, load_solutions=True,
+              **kwds):
+        """Solve instance and return a Pyomo SolverResults object.
+
+        Args:
+            instance: a urbs model instance
+            tee: show the solver output
+            logfile: optional file for the solver log
+            load_solutions: load values into the variables and duals
+            **kwds: ignored (for compatibility with Pyomo solvers)
+        """
+        import highspy
+        from pyomo.opt import SolverResults, SolverStatus, \
+            TerminationCondition
+
+        wall = time.time()
+        lp_data = model_matrix(instance)
+        lp = highspy.HighsLp()
+        lp.num_col_ = len(lp_data['variables'])
+        lp.num_row_ = len(lp_data['constraints'])
+        lp.col_cost_ = lp_data['cost']
+        lp.col_lower_ = np.maximum(lp_data['col_lower'], -highspy.kHighsInf)
+        lp.col_upper_ = np.minimum(lp_data['col_upper'], highspy.kHighsInf)
+        lp.row_lower_ = np.maximum(lp_data['row_lower'], -highspy.kHighsInf)
+        lp.row_upper_ = np.minimum(lp_data['row_upper'], highspy.kHighsInf)
+        lp.offset_ = lp_data['offset']
+        if lp_data['sense'] < 0:
+            lp.sense_ = highspy.ObjSense.kMaximize
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = lp_data['start']
+        lp.a_matrix_.index_ = lp_data['index']
+        lp.a_matrix_.value_ = lp_data['value']
+
+        highs = highspy.Highs()
+        highs.setOptionValue('log_to_console', bool(tee))
+        if logfile:
+            highs.setOptionValue('log_file', logfile)
+        for key, value in self.options.items():
+            highs.setOptionValue(key, value)
+        highs.passModel(lp)
+        highs.run()
+
+        status = highs.modelStatusToString(highs.getModelStatus())
+        solution = highs.getSolution()
+        info = highs.getInfo()
+        primal = np.array(solution.col_value, dtype=float)
+        dual = np.array(solution.row_dual, dtype=float)
+        optimal = status == 'Optimal'
+        instance.solution_arrays = {
+            'primal': primal, 'dual': dual,
+            'objective': info.objective_function_value,
+            'variables': lp_data['variables'],
+            'constraints': lp_data['constraints'],
+            'loaded': bool(load_solutions and optimal)}
+
+        if load_solutions and optimal:
+            for var, value in zip(lp_data['variables'], primal):
+                var.value = value
+            if hasattr(instance, 'dual'):
+                for con, value in zip(lp_data['constraints'], dual):
+                    instance.dual[con] = value
+
+        result = SolverResults()
+        result.solver.name = self.name
+        result.solver.status = SolverStatus.ok if optimal \
+            else SolverStatus.warning
+        result.solver.termination_condition = {
+            'Optimal': TerminationCondition.optimal,
+            'Infeasible': TerminationCondition.infeasible,
+            'Unbounded': TerminationCondition.unbounded,
+            'Time limit reached': TerminationCondition.maxTimeLimit,
+            'Iteration limit reached': TerminationCondition.maxIterations
+            }.get(status, TerminationCondition.other)
+        result.solver.message = status
+        result.solver.time = time.time() - wall
+        result.problem.number_of_constraints = lp.num_row_
+        result.problem.number_of_variables = lp.num_col_
+        result.problem.number_of_nonzeros = len(lp_data['value'])
+        if optimal:
+            result.problem.lower_bound = info.objective_function_value
+            result.problem.upper_bound = info.objective_function_value
+        return result
+
+
+def coefficient_ranges(instance):
+    """Summarise the ranges of coefficients of a model instance.
+
+    Solvers suffer from coefficients that span many orders of magnitude. This
+    summary of the smallest and largest absolute non-zero values of the
+    constraint matrix, right hand sides, variable bounds and objective helps
+    to judge whether scaling (see create_model) is needed.
+
+    Args:
+        instance: a urbs model instance
+
+    Returns:
+        a DataFrame with rows 'Matrix', 'RHS', 'Bounds' and 'Objective' and
+        columns 'min' and 'max'
+    """
+    from pyomo.repn import generate_standard_repn
+
+    values = {'Matrix': [], 'RHS': [], 'Bounds': [], 'Objective': []}
+    for con in instance.component_data_objects(pyomo.Constraint, active=True):
+        repn = generate_standard_repn(con.body)
+        values['Matrix'].extend(pyomo.value(c) for c in repn.linear_coefs)
+        for bound in (con.lower, con.upper):
+            if bound is not None:
+                values['RHS'].append(
+                    pyomo.value(bound) - pyomo.value(repn.constant))
+    for var in instance.component_data_objects(pyomo.Var):
+        values['Bounds'].extend(b for b in var.bounds if b is not None)
+    for obj in instance.component_data_objects(pyomo.Objective, active=True):
+        repn = generate_standard_repn(obj.expr)
+        values['Objective'].extend(pyomo.value(c) for c in repn.linear_coefs)
+
+    ranges = pd.DataFrame(index=['Matrix', 'RHS', 'Bounds', 'Objective'],
+                          columns=['min', 'max'], dtype=float)
+    for key, vals in values.items():
+        vals = np.abs(np.asarray(vals, dtype=float))
+        vals = vals[np.isfinite(vals) & (vals > 0)]
+        if len(vals):
+            ranges.loc[key] = [vals.min(), vals.max()]
+    return ranges
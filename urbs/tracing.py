@@ -0,0 +1,186 @@
+"""urbs tracing: wall time, CPU time and peak memory of pipeline stages
+
+Stages are measured as nested spans (see trace_span) while tracing is
+enabled, and can be exported as JSON or in the Chrome trace event format.
+
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+
+# Tracing
+# =======
+# Spans measure wall time, CPU time and peak resident set size (RSS) of the
+# pipeline stages read_excel, create_model, solve, get_constants,
+# get_timeseries, report, result_figures and save. They are recorded while
+# tracing is started (see start_tracing) and passed to trace callbacks.
+
+_TRACE = {'enabled': False, 'spans': [], 'stack': [], 'callbacks': [],
+          'next_id': 0}
+
+# CPU time of this process, python 2 and 3 compatible
+_process_time = getattr(time, 'process_time', None) or time.clock
+
+
+def start_tracing():
+    """Clear all recorded spans and start recording new ones."""
+    _TRACE['spans'] = []
+    _TRACE['enabled'] = True
+
+
+def stop_tracing():
+    """Stop recording spans.
+
+    Returns:
+        list of recorded spans (see trace_span)
+    """
+    _TRACE['enabled'] = False
+    return list(_TRACE['spans'])
+
+
+def add_trace_callback(callback):
+    """Register a function that is called with each finished span.
+
+    Spans are measured while tracing is started or callbacks are registered.
+
+    Args:
+        callback: a function taking a span dict (see trace_span)
+    """
+    _TRACE['callbacks'].append(callback)
+
+
+def remove_trace_callback(callback):
+    """Unregister a function registered with add_trace_callback."""
+    _TRACE['callbacks'].remove(callback)
+
+
+def _peak_rss():
+    """Return the peak RSS in MB since the last _reset_peak_rss.
+
+    Uses VmHWM of /proc/self/status on Linux; elsewhere, the peak RSS of the
+    whole process lifetime is returned (None if unavailable).
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except (IOError, OSError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024.0 ** (2 if sys.platform == 'darwin' else 1)
+
+
+def _reset_peak_rss():
+    """Reset the peak RSS to the current RSS (Linux only)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except (IOError, OSError):
+        pass
+
+
+def _max_rss(*values):
+    """Return the maximum of the given peak RSS values, ignoring None."""
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+@contextmanager
+def trace_span(name, **attrs):
+    """Measure a block of code as span, if tracing is active.
+
+    Spans can be nested; the peak RSS of an enclosing span includes that of
+    its children. A span is a dict with the keys name, id, parent (id or
+    None), pid, start (seconds since the epoch), wall and cpu (seconds),
+    peak_rss (MB) and attrs.
+
+    Usage:
+        with trace_span('solve', scenario='base'):
+            optim.solve(prob)
+
+    Args:
+        name: span name
+        **attrs: further JSON-able attributes of the span
+    """
+    if not (_TRACE['enabled'] or _TRACE['callbacks']):
+        yield None
+        return
+
+    stack = _TRACE['stack']
+    span = {'name': name, 'id': _TRACE['next_id'],
+            'parent': stack[-1]['id'] if stack else None,
+            'pid': os.getpid(), 'attrs': attrs, 'peak_rss': None}
+    _TRACE['next_id'] += 1
+    if stack:
+        # keep the peak of the enclosing span before resetting it
+        stack[-1]['peak_rss'] = _max_rss(stack[-1]['peak_rss'], _peak_rss())
+    stack.append(span)
+    _reset_peak_rss()
+    span['start'] = time.time()
+    cpu = _process_time()
+    try:
+        yield span
+    finally:
+        span['wall'] = time.time() - span['start']
+        span['cpu'] = _process_time() - cpu
+        span['peak_rss'] = _max_rss(span['peak_rss'], _peak_rss())
+        stack.pop()
+        if stack:
+            stack[-1]['peak_rss'] = _max_rss(stack[-1]['peak_rss'],
+                                             span['peak_rss'])
+        if _TRACE['enabled']:
+            _TRACE['spans'].append(span)
+        for callback in _TRACE['callbacks']:
+            callback(span)
+
+
+def _traced(name):
+    """Decorator that measures each call of a function as span name."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_trace(spans, filename, fmt='json'):
+    """Write spans to a file.
+
+    Args:
+        spans: list of spans, e.g. from stop_tracing
+        filename: output file
+        fmt: 'json' for a list of span dicts, or 'chrome' for the Chrome
+            trace event format (chrome://tracing, Perfetto)
+
+    Returns:
+        Nothing
+    """
+    if fmt == 'json':
+        trace = spans
+    elif fmt == 'chrome':
+        trace = {
+            'displayTimeUnit': 'ms',
+            'traceEvents': [{
+                'name': span['name'], 'ph': 'X', 'pid': span['pid'],
+                'tid': 0, 'ts': span['start'] * 1e6,
+                'dur': span['wall'] * 1e6,
+                'args': dict(span['attrs'], cpu=span['cpu'],
+                             peak_rss=span['peak_rss'])}
+                for span in spans]}
+    else:
+        raise ValueError("Unknown trace format '{}'".format(fmt))
+    with open(filename, 'w') as file_handle:
+        json.dump(trace, file_handle, indent=1)